@@ -0,0 +1,61 @@
+"""
+Check that importing the package stays fast and does not pull in the heavy optional dependencies
+
+Every measurement is done in a fresh interpreter, the best of the repeats is compared to the budget.
+
+    python benchmarks/import_time.py --budget 0.3
+
+exit code is 1 if the import is over budget or matplotlib/scipy get imported
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# seconds, also enforced by tests/test_import_time.py
+BUDGET = 0.3
+MEASURE = ("import sys, time\n"
+           "start = time.perf_counter()\n"
+           "import t19_ice_loss\n"
+           "elapsed = time.perf_counter() - start\n"
+           "heavy = [name for name in ('matplotlib', 'scipy') if name in sys.modules]\n"
+           "print(elapsed, ','.join(heavy))\n")
+
+
+def measure_import_time(repeats=5):
+    """
+    :param repeats: number of fresh interpreters started
+    :return: best import time in seconds, list of heavy modules imported by the package
+    """
+    times = []
+    heavy = []
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, '-c', MEASURE], cwd=REPO_ROOT, universal_newlines=True)
+        tokens = output.split()
+        times.append(float(tokens[0]))
+        if len(tokens) > 1:
+            heavy = tokens[1].split(',')
+    return min(times), heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='import time regression check for t19_ice_loss')
+    parser.add_argument('--budget', type=float, default=BUDGET, help='maximum import time in seconds')
+    parser.add_argument('--repeats', type=int, default=5, help='number of measurements')
+    args = parser.parse_args()
+    best, heavy = measure_import_time(args.repeats)
+    print("import t19_ice_loss: {0:.3f} s (budget {1:.3f} s)".format(best, args.budget))
+    failed = False
+    if heavy:
+        print("heavy modules imported at package import: {0}".format(', '.join(heavy)))
+        failed = True
+    if best > args.budget:
+        print("import time over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
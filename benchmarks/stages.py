@@ -0,0 +1,199 @@
+"""
+Throughput and memory benchmark of every processing stage and result file writer
+
+The example dataset (one year of 10 minute data) is repeated with shifted timestamps into datasets of the
+requested lengths, then a full run with all outputs on is profiled stage by stage with the StageProfiler.
+The times come from a run without memory tracing, the peak memory of each stage from a second run with it,
+as tracing slows numpy heavy stages down many times over.
+Stages map to the AEPcounter methods as listed in t19_ice_loss.pipeline, e.g. 'data' is CSVimporter.read_data,
+'corrected data' the air density correction, 'initial power curve' count_power_curves and 'alarm timings'
+power_loss_during_alarm.
+
+    python benchmarks/stages.py --years 1,5,20 --save-baseline
+    python benchmarks/stages.py --years 1,5,20 --threshold 0.25
+
+exit code is 1 if the wall time or peak memory of any stage is over its baseline value by more than the threshold.
+Stages faster than --min-time or smaller than --min-memory are not compared, their variation is mostly noise.
+"""
+
+import argparse
+import configparser
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from t19_ice_loss import RunConfig  # noqa: E402
+from t19_ice_loss import analyse_file  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'stages_baseline.json')
+SOURCE_YEAR = '2003'
+
+
+def make_dataset(filename, years):
+    """
+    write the example data repeated for years, each copy shifted by one year
+
+    :param filename: output .csv filename
+    :param years: number of years in the dataset
+    :return: number of data rows written
+    """
+    with open(os.path.join(REPO_ROOT, 'fake_data2.csv')) as source:
+        header = source.readline()
+        lines = source.readlines()
+    rows = 0
+    with open(filename, 'w') as target:
+        target.write(header)
+        for year in range(years):
+            new_year = '.{0} '.format(int(SOURCE_YEAR) + year)
+            # the source year 2003 is not a leap year, so the shifted dates are always valid
+            target.writelines(line.replace('.' + SOURCE_YEAR + ' ', new_year, 1) for line in lines)
+            rows += len(lines)
+    return rows
+
+
+def benchmark_config(data_filename, result_dir, years):
+    """
+    settings of example.ini with every output switched on
+
+    :return: RunConfig
+    """
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(os.path.join(REPO_ROOT, 'example.ini'))
+    options = {section: dict(config.items(section)) for section in config.sections()}
+    options['Source file']['id'] = 'bench_{0}y'.format(years)
+    options['Source file']['filename'] = data_filename
+    options['Output'].update({'result directory': result_dir + os.sep, 'summary': True, 'plot': True, 'alarm time series': True,
+                              'filtered raw data': True, 'icing events': True, 'power curve': True, 'daily stats': True,
+                              'weekly stats': True, 'seasonal stats': True, 'event index': True, 'output workers': 1})
+    return RunConfig.from_dict(options, 'benchmark settings')
+
+
+def profile_run(data_filename, result_dir, years, memory):
+    """
+    profile a full run with all outputs
+
+    :param memory: if True, trace the peak memory of the stages
+    :return: list of stage records of the StageProfiler
+    """
+    result = analyse_file(benchmark_config(data_filename, result_dir, years))
+    result.enable_profile(memory)
+    result.write()
+    result.profile.stop()
+    return result.profile.records
+
+
+def run_size(workdir, years):
+    """
+    profile a full run of a dataset of years, times and memory from separate runs
+
+    :return: dictionary of stage name: measurements
+    """
+    result_dir = os.path.join(workdir, 'results_{0}y'.format(years))
+    os.makedirs(result_dir)
+    data_filename = os.path.join(workdir, 'bench_{0}y.csv'.format(years))
+    make_dataset(data_filename, years)
+    records = profile_run(data_filename, result_dir, years, False)
+    peak_memory = dict((record['stage'], record['peak_memory']) for record in profile_run(data_filename, result_dir, years, True))
+    stages = {}
+    for record in records:
+        measurement = dict(record)
+        measurement['peak_memory'] = peak_memory.get(record['stage'], 0)
+        rows = record['rows_in'] if record['rows_in'] is not None else record['rows_out']
+        measurement['throughput'] = rows / record['wall_time'] if (rows and record['wall_time'] > 0) else None
+        stages[record['stage']] = measurement
+    return stages
+
+
+def compare(results, baseline, threshold, min_time, min_memory):
+    """
+    :return: list of regression messages, empty if nothing regressed
+    """
+    regressions = []
+    for size, stages in results.items():
+        if size not in baseline:
+            print("no baseline for {0} years, not compared".format(size))
+            continue
+        for stage, measurement in stages.items():
+            reference = baseline[size].get(stage)
+            if reference is None:
+                continue
+            if max(measurement['wall_time'], reference['wall_time']) >= min_time and \
+                    measurement['wall_time'] > reference['wall_time'] * (1.0 + threshold):
+                regressions.append("{0} years, {1}: wall time {2:.3f} s, baseline {3:.3f} s".format(
+                    size, stage, measurement['wall_time'], reference['wall_time']))
+            if max(measurement['peak_memory'], reference['peak_memory']) >= min_memory and \
+                    measurement['peak_memory'] > reference['peak_memory'] * (1.0 + threshold):
+                regressions.append("{0} years, {1}: peak memory {2:.1f} MiB, baseline {3:.1f} MiB".format(
+                    size, stage, measurement['peak_memory'] / 2.0 ** 20, reference['peak_memory'] / 2.0 ** 20))
+    return regressions
+
+
+def print_table(size, stages):
+    print("{0} years".format(size))
+    print("  {0:<26s} {1:>10s} {2:>10s} {3:>10s} {4:>14s} {5:>12s}".format('stage', 'wall [s]', 'cpu [s]', 'rows in', 'rows/s', 'peak [MiB]'))
+    for stage, measurement in stages.items():
+        print("  {0:<26s} {1:>10.3f} {2:>10.3f} {3:>10s} {4:>14s} {5:>12.1f}".format(
+            stage, measurement['wall_time'], measurement['cpu_time'],
+            '-' if measurement['rows_in'] is None else str(measurement['rows_in']),
+            '-' if measurement['throughput'] is None else '{0:.0f}'.format(measurement['throughput']),
+            measurement['peak_memory'] / 2.0 ** 20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='stage throughput and memory benchmark for t19_ice_loss')
+    parser.add_argument('--years', default='1,5,20', help='comma separated dataset lengths in years')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline .json file')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown or memory growth of a stage')
+    parser.add_argument('--min-time', type=float, default=0.05, help='stages faster than this in seconds are not compared')
+    parser.add_argument('--min-memory', type=float, default=1.0, help='stages with smaller peak memory in MiB are not compared')
+    parser.add_argument('--output', default='', help='also save the results into this .json file')
+    parser.add_argument('--workdir', default='', help='directory for the generated data and results, a temporary one by default')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='t19_bench_')
+    results = {}
+    try:
+        for years in [int(value) for value in args.years.split(',')]:
+            start = time.perf_counter()
+            results[str(years)] = run_size(os.path.join(workdir, str(years)), years)
+            print_table(years, results[str(years)])
+            print("  total {0:.1f} s".format(time.perf_counter() - start))
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print("baseline saved into {0}".format(args.baseline))
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print("baseline {0} not found, run with --save-baseline first".format(args.baseline))
+        sys.exit(1)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_time, args.min_memory * 2.0 ** 20)
+    for message in regressions:
+        print("REGRESSION " + message)
+    if not regressions:
+        print("no regressions over {0:.0%}".format(args.threshold))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
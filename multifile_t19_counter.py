@@ -1,9 +1,59 @@
+"""
+Run t19_counter for every turbine .ini file of a farm in parallel and combine the summary files
+
+    python multifile_t19_counter.py --input-dir ./data/siteconfigs/ --result-dir ./results/ --workers 16 --timeout 3600 --retries 1
+
+The largest data files are started first so that the slowest turbines do not finish last. A turbine that fails
+or runs over the timeout is recorded into _farm_run.csv in the result directory, the other turbines are run
+normally. exit code is 1 if any turbine failed.
+
+The workers send the summary values back, they are appended into _combined_summary.jsonl as the turbines finish
+and written side by side into _combined_summary.csv at the end. --combine-only builds _combined_summary.csv from
+the summary files already in the result directory.
+
+Turbines whose data file, .ini file and code have not changed since their last successful run, and whose result
+files still exist, are skipped, see t19_ice_loss.manifest. --force runs them all.
+
+To use several hosts that share a file system, the turbines are put into a work queue directory and any number of
+workers on any host process them, see t19_ice_loss.work_queue ::
+
+    python multifile_t19_counter.py --input-dir ./data/siteconfigs/ --result-dir ./results/ --queue /shared/queue --enqueue
+    python multifile_t19_counter.py --queue /shared/queue --work --workers 16          (on every host)
+    python multifile_t19_counter.py --result-dir ./results/ --queue /shared/queue --collect
+"""
+
+import argparse
+import csv
+import json
+import math
+import multiprocessing
+import multiprocessing.connection
 import os
+import signal
+import sys
+import time
+import traceback
+import datetime as dt
 import t19_counter
 import collections
 import fileinput
 import configparser
-from multiprocessing import Pool
+import numpy as np
+from t19_ice_loss.farm import share_farm_file
+from t19_ice_loss.manifest import RunManifest
+from t19_ice_loss.work_queue import FileQueue, Heartbeat
+from t19_ice_loss.run_config import RunConfig
+
+# thread count variables of the numerical libraries, each worker should use a single core
+BLAS_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS')
+RUN_LOG_FIELDS = ['configfile', 'status', 'attempts', 'duration', 'input size', 'error']
+COMBINED_SUMMARY = '_combined_summary.csv'
+SUMMARY_STREAM = '_combined_summary.jsonl'
+MANIFEST = '_farm_manifest.json'
+# summary fields whose values are text even when they look like numbers, e.g. a dataset named 0042
+TEXT_SUMMARY_FIELDS = {'Dataset name', 'Data start time', 'Data stop time', 'Reference data start time', 'Reference data stop time'}
+# seconds a worker gets after the time limit of a turbine to report the timeout itself before it is terminated
+TIMEOUT_GRACE = 30.0
 
 
 def find_value_by_tag(filename, option):
@@ -31,91 +81,694 @@ def find_value_by_tag(filename, option):
     return final_value
 
 
-def parse_summary_file_into_dict(filename):
+def read_summary_file(filename):
+    """
+    read a summary file written by t19_counter back into a summary record, used to combine results of earlier runs
+
+    the whole file is split at once, the values are converted back to numbers where possible, except for the
+    fields of TEXT_SUMMARY_FIELDS
+
+    :return: list of (field, value, unit) in the order of the file
     """
-    reads everyline of the summary file into a dictionary
+    table = np.genfromtxt(filename, dtype=str, delimiter='\t', skip_header=1, autostrip=True, usecols=(0, 1, 2), ndmin=2,
+                          comments=None, invalid_raise=False)
+    table = table[table[:, 0] != '']
+    return [(field, value if field in TEXT_SUMMARY_FIELDS else _summary_number(value), unit) for field, value, unit in table.tolist()]
+
+
+def _summary_number(text):
+    for number_type in (int, float):
+        try:
+            return number_type(text)
+        except ValueError:
+            pass
+    return text
+
+
+def _plain_value(value):
+    # numpy scalars into python ones so that the records can be saved as json
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    return value
+
+
+def summary_record(result):
     """
-    done = False
-    # results = {}
-    results = collections.OrderedDict()
-    with open(filename, 'r') as result_file:
-        while not done:
+    summary values of a turbine as a list of (field, value, unit), None if the summary is not written
+
+    :param result: RunResult of the turbine
+    """
+    if not result.run_config.summaryfile_write:
+        return None
+    return [(field, _plain_value(value), unit) for field, (value, unit) in result.summary_with_units.items()]
+
+
+def format_summary_value(value):
+    """
+    value formatted as in the summary file
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, np.integer)):
+        return '{0:d}'.format(value)
+    return '{0:.1f}'.format(value)
+
+
+def write_combined_summary(filename, summaries, separator='\t'):
+    """
+    write the summaries of the turbines side by side, one field per line and one turbine per column
+
+    fields are matched by name, so summaries with fields in a different order or missing fields can be combined.
+    Fields are listed in the order they first appear
+
+    :param filename: name of the combined file
+    :param summaries: list of summary records, see summary_record
+    """
+    fields = collections.OrderedDict()
+    columns = []
+    for summary in summaries:
+        values = {}
+        for field, value, unit in summary:
+            fields.setdefault(field, None)
+            values[field] = format_summary_value(value)
+        columns.append(values)
+    with open(filename, 'w', newline='') as outfile:
+        writer = csv.writer(outfile, delimiter=separator, lineterminator='\n')
+        for field in fields:
+            writer.writerow([field] + [values.get(field, '') for values in columns])
+
+
+class SummaryStream:
+    """
+    append the summary of every turbine into a json lines file as soon as the turbine is done
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'w')
+
+    def add(self, record):
+        """
+        :param record: run record with the summary of the turbine, see run_turbine
+        """
+        line = collections.OrderedDict([('configfile', record['configfile']),
+                                        ('summary', collections.OrderedDict((field, value) for field, value, unit in record['summary'])),
+                                        ('units', collections.OrderedDict((field, unit) for field, value, unit in record['summary']))])
+        self.file.write(json.dumps(line) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def combined_summary(result_directory):
+    """
+    combine the summary files found in a directory, for results of runs that did not collect the summaries
+    """
+    filenames = sorted(os.path.join(result_directory, f) for f in os.listdir(result_directory) if f.endswith('_summary.txt'))
+    write_combined_summary(os.path.join(result_directory, COMBINED_SUMMARY), [read_summary_file(f) for f in filenames])
+
+
+class JobTimeout(BaseException):
+    """
+    raised inside a worker when a turbine runs over its time limit
+
+    not an Exception, so that the handlers for failing stages and writers do not catch it
+    """
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def find_turbine_configs(source_directory):
+    """
+    list the turbine .ini files of a directory, files with blank in the name are templates and skipped
+    """
+    return [os.path.join(source_directory, filename) for filename in sorted(os.listdir(source_directory))
+            if filename.endswith('.ini') and ('blank' not in filename)]
+
+
+def input_size(configfile):
+    """
+    size of the data file of a turbine in bytes, 0 if the .ini file or the data file can't be read
+    """
+    try:
+        return os.path.getsize(RunConfig.from_file(configfile).filename)
+    except (Exception, SystemExit):
+        return 0
+
+
+def largest_first(configfiles):
+    """
+    order the turbines by the size of their data files, largest first
+
+    :return: list of (configfile, input size)
+    """
+    return sorted(((configfile, input_size(configfile)) for configfile in configfiles), key=lambda job: job[1], reverse=True)
+
+
+def pin_blas_threads(threads):
+    """
+    limit the threads of the numerical libraries in processes started from now on
+
+    has to be set before the libraries are loaded, so the workers are started with the spawn method
+    """
+    for variable in BLAS_THREAD_VARIABLES:
+        os.environ[variable] = str(threads)
+
+
+def new_record(configfile, size):
+    """
+    :return: run record of a turbine that has not been run yet, see run_turbine
+    """
+    return {'configfile': configfile, 'status': 'failed', 'attempts': 0, 'duration': 0.0, 'input size': size, 'error': '', 'summary': None,
+            'outputs': []}
+
+
+def run_turbine(job):
+    """
+    process one turbine, errors are caught and returned instead of raised
+
+    a turbine that fails is tried again up to retries times, within the time limit of the turbine. A turbine that
+    runs over the time limit is not tried again. The time limit needs SIGALRM and is not used on Windows, see
+    TurbineWorkers for the limit enforced from outside of the worker
+
+    :param job: tuple of (configfile, input size, result directory or None, timeout in seconds or None, retries,
+                SharedFarm holding the data of the turbine or None to read the data file)
+    :return: dict with the fields of RUN_LOG_FIELDS, the summary record of the turbine, see summary_record, and the
+             result files written
+    """
+    configfile, size, result_directory, timeout, retries, farm = job
+    use_alarm = bool(timeout) and hasattr(signal, 'SIGALRM')
+    start = time.time()
+    record = new_record(configfile, size)
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(int(math.ceil(timeout)))
+    try:
+        while record['attempts'] <= retries:
+            record['attempts'] += 1
             try:
-                line = next(result_file)
-                tokens = line.split('\t')
-                tag = tokens[0].strip()
-                value = tokens[1].strip()
-                if tag != ' ' or tag != '':
-                    results[tag] = value
-                else:
-                    break
-            except StopIteration:
+                run_config = RunConfig.from_file(configfile)
+                if result_directory is not None:
+                    # result filenames are appended to the directory name
+                    run_config.result_dir = os.path.join(result_directory, '')
+                print("{0} : Processing dataset {1}".format(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), run_config.id))
+                result = t19_counter.analyse_turbine(run_config, farm=farm)
+                written, failed = t19_counter.write_result(result)
+                if failed:
+                    # the turbine is not complete, so it is run again instead of being taken as up to date
+                    raise OSError("could not write {0}".format(', '.join(failed)))
+                record['outputs'] = written
+                # the summary values are already calculated for the summary file, only sent back to the main process here
+                record['summary'] = summary_record(result)
+                record['status'] = 'ok'
+                record['error'] = ''
                 break
-    return results
+            except (Exception, SystemExit) as e:
+                record['status'] = 'failed'
+                record['error'] = '{0}: {1}'.format(type(e).__name__, e)
+                print("{0} failed on attempt {1}:\n{2}".format(configfile, record['attempts'], traceback.format_exc()))
+    except JobTimeout:
+        record['status'] = 'timeout'
+        record['error'] = 'no result in {0} s'.format(timeout)
+        record['outputs'] = []
+        record['summary'] = None
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+    record['duration'] = time.time() - start
+    return record
+
 
+def _worker_loop(connection):
+    # runs the jobs sent by TurbineWorkers until None is sent
+    while True:
+        job = connection.recv()
+        if job is None:
+            break
+        connection.send(run_turbine(job))
 
-def clean_results_for_printing(results):
+
+class TurbineWorkers:
     """
-    creates a column for final output file
+    worker processes that run turbines with run_turbine, with the time limit of each turbine enforced from here
+
+    The time limit inside a worker can't interrupt everything, e.g. waiting for the writer threads of a turbine, so a
+    worker that has not answered TIMEOUT_GRACE seconds after the time limit is terminated and the turbine is recorded
+    as a timeout. A worker whose turbine timed out is replaced as well, as its writers may still be running ::
+
+        with TurbineWorkers(4) as workers:
+            workers.submit(job)
+            records = workers.wait(1.0)
     """
-    output = []
-    for k, v in results.items():
-        if k != 'Field':
-            output.append(v)
-    return output
+    def __init__(self, size):
+        """
+        :param size: maximum number of worker processes, they are started with the spawn method when needed
+        """
+        self.size = size
+        self.context = multiprocessing.get_context('spawn')
+        self.idle = []
+        # connection of a busy worker: (process, job, start time, deadline or None)
+        self.busy = {}
 
+    def _start(self):
+        connection, child_connection = self.context.Pipe()
+        process = self.context.Process(target=_worker_loop, args=(child_connection,), daemon=True)
+        process.start()
+        child_connection.close()
+        return process, connection
 
-def get_keys_for_printing(results):
-    output = []
-    for k in results.keys():
-        if k != 'Field':
-            output.append(k)
-    return output
+    def _stop(self, process, connection):
+        # killed rather than terminated, a stopped or hung process may not act on SIGTERM
+        process.kill()
+        process.join()
+        connection.close()
 
+    def free(self):
+        """
+        :return: number of jobs that can be submitted now
+        """
+        return self.size - len(self.busy)
 
-def results_to_file(filename, results, separator='\t'):
-    keys = get_keys_for_printing(results[0])
-    with open(filename, 'w') as outfile:
-        for key in keys:
-            line = key
-            for summary in results:
-                line += separator
-                line += summary[key]
-            line += '\n'
-            outfile.write(line)
+    def submit(self, job):
+        """
+        start a job of run_turbine on an idle worker, there has to be a free worker
+        """
+        process, connection = self.idle.pop() if self.idle else self._start()
+        connection.send(job)
+        timeout = job[3]
+        start = time.time()
+        self.busy[connection] = (process, job, start, start + timeout + TIMEOUT_GRACE if timeout else None)
 
+    def wait(self, timeout):
+        """
+        wait up to timeout seconds for jobs to finish
 
+        :return: run records of the finished jobs and of the jobs stopped for running over their time limit
+        """
+        records = []
+        for connection in multiprocessing.connection.wait(list(self.busy), timeout):
+            process, job, start, deadline = self.busy.pop(connection)
+            try:
+                record = connection.recv()
+            except (EOFError, OSError):
+                # the worker died, e.g. killed for running out of memory
+                self._stop(process, connection)
+                record = new_record(job[0], job[1])
+                record['attempts'] = 1
+                record['error'] = 'worker process exited with code {0}'.format(process.exitcode)
+                record['duration'] = time.time() - start
+            else:
+                if record['status'] == 'timeout':
+                    self._stop(process, connection)
+                else:
+                    self.idle.append((process, connection))
+            records.append(record)
+        now = time.time()
+        for connection, (process, job, start, deadline) in list(self.busy.items()):
+            if (deadline is not None) and (now > deadline):
+                del self.busy[connection]
+                self._stop(process, connection)
+                record = new_record(job[0], job[1])
+                record.update({'status': 'timeout', 'attempts': 1, 'duration': now - start,
+                               'error': 'no result in {0} s, worker terminated'.format(job[3])})
+                records.append(record)
+        return records
 
-def combined_summary(result_directory):
-    results = []
-    for f in [result_directory + f for f in os.listdir(result_directory) if 'summary.txt' in f]:
-        results.append(parse_summary_file_into_dict(f))
-    output_filename = os.path.join(result_directory,'_combined_summary.csv')
-    results_to_file(output_filename,results)
+    def close(self):
+        """
+        stop the idle workers and terminate the busy ones
+        """
+        for process, connection in self.idle:
+            connection.send(None)
+            process.join()
+            connection.close()
+        for connection, (process, job, start, deadline) in self.busy.items():
+            self._stop(process, connection)
+        self.idle = []
+        self.busy = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def _format_duration(seconds):
+    return str(dt.timedelta(seconds=int(round(seconds))))
+
+
+def share_farm_files(configfiles):
+    """
+    read the wide farm files used by the turbines into shared memory, each file once
+
+    turbines whose .ini file can't be read, or whose farm file can't be read, are left out and read their own
+    data file, where they fail with the error
+
+    :param configfiles: list of turbine .ini files
+    :return: dict of configfile: SharedFarm for the turbines that use a farm file
+    """
+    groups = collections.OrderedDict()
+    for configfile in configfiles:
+        try:
+            run_config = RunConfig.from_file(configfile)
+        except SystemExit:
+            continue
+        if run_config.farm_columns is not None:
+            groups.setdefault(os.path.abspath(run_config.filename), []).append((configfile, run_config))
+    farms = {}
+    for filename, group in groups.items():
+        try:
+            farm = share_farm_file([run_config for configfile, run_config in group])
+        except (Exception, SystemExit) as e:
+            print("Error {0} while reading farm file {1}".format(e, filename))
+            continue
+        for configfile, run_config in group:
+            farms[configfile] = farm
+    return farms
+
+
+def skip_current(configfiles, manifest, result_directory=None, force=False, fingerprints=None):
+    """
+    leave out the turbines whose data, .ini file and code have not changed since their last successful run
+
+    :param configfiles: list of turbine .ini files
+    :param manifest: RunManifest of the earlier runs
+    :param result_directory: result directory replacing the one of the .ini files, part of the configuration
+    :param force: if True, nothing is skipped
+    :param fingerprints: dict filled with configfile: fingerprint of the turbines to run, for updating the manifest
+    :return: .ini files of the turbines to run, run records of the skipped turbines with their stored summaries
+    """
+    to_run = []
+    skipped = []
+    for configfile in configfiles:
+        fingerprint = manifest.fingerprint(configfile, result_directory)
+        if (not force) and manifest.is_current(configfile, fingerprint):
+            skipped.append({'configfile': configfile, 'status': 'skipped', 'attempts': 0, 'duration': 0.0,
+                            'input size': fingerprint['input']['size'], 'error': '', 'summary': manifest.summary(configfile), 'outputs': []})
+            continue
+        if fingerprints is not None:
+            fingerprints[configfile] = fingerprint
+        to_run.append(configfile)
+    if skipped:
+        print("{0} : {1} of {2} turbines are up to date and skipped".format(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), len(skipped),
+                                                                          len(configfiles)))
+    return to_run, skipped
 
 
-def main():
+def run_farm(configfiles, workers=None, result_directory=None, timeout=None, retries=0, blas_threads=1, summary_file=None, manifest=None,
+             force=False):
+    """
+    process the turbines in parallel, largest data file first, and print the progress as turbines finish
+
+    :param configfiles: list of turbine .ini files
+    :param workers: number of worker processes, number of cores by default
+    :param result_directory: replaces the result directory of the .ini files if given
+    :param timeout: time limit of one turbine in seconds, None for no limit
+    :param retries: number of times a failed turbine is tried again
+    :param blas_threads: threads used by the numerical libraries in each worker
+    :param summary_file: json lines file the summaries are written into as the turbines finish, None to not write it
+    :param manifest: RunManifest, turbines whose inputs have not changed since their last run are skipped. None to run all
+    :param force: if True, run all the turbines even if they are up to date in the manifest
+    :return: list of run records, see run_turbine, in the order the turbines finished. Skipped turbines come first
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    summary_stream = SummaryStream(summary_file) if summary_file is not None else None
+    records = []
+    fingerprints = {}
+    if manifest is not None:
+        configfiles, records = skip_current(configfiles, manifest, result_directory, force, fingerprints)
+        if summary_stream is not None:
+            for record in records:
+                if record['summary'] is not None:
+                    summary_stream.add(record)
+    farms = share_farm_files(configfiles)
+    jobs = [(configfile, size, result_directory, timeout, retries, farms.get(configfile)) for configfile, size in largest_first(configfiles)]
+    total_size = sum(job[1] for job in jobs)
+    if (timeout is not None) and not hasattr(signal, 'SIGALRM'):
+        print("Timeouts are only enforced by terminating the worker on this platform, {0} s after the limit".format(TIMEOUT_GRACE))
+    pin_blas_threads(blas_threads)
+    done_size = 0
+    finished = 0
+    start = time.time()
+    pending = collections.deque(jobs)
+    try:
+        with TurbineWorkers(min(workers, max(len(jobs), 1))) as turbine_workers:
+            while pending or turbine_workers.busy:
+                while pending and turbine_workers.free() > 0:
+                    turbine_workers.submit(pending.popleft())
+                for record in turbine_workers.wait(1.0):
+                    finished += 1
+                    records.append(record)
+                    if (summary_stream is not None) and (record['summary'] is not None):
+                        summary_stream.add(record)
+                    if manifest is not None:
+                        if record['status'] == 'ok':
+                            manifest.record(record['configfile'], fingerprints.get(record['configfile']), record['outputs'], record['summary'])
+                        else:
+                            manifest.forget(record['configfile'])
+                    done_size += record['input size']
+                    elapsed = time.time() - start
+                    # the turbines are started largest first, so the data processed so far is a fair measure of the progress
+                    if total_size > 0:
+                        done_share = done_size / float(total_size)
+                    else:
+                        done_share = finished / float(len(jobs))
+                    if done_share > 0:
+                        eta = _format_duration(elapsed * (1.0 - done_share) / done_share)
+                    else:
+                        eta = '-'
+                    print("{0} : [{1}/{2}] {3} {4} in {5:.1f} s, elapsed {6}, ETA {7}".format(
+                        dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), finished, len(jobs), record['configfile'], record['status'],
+                        record['duration'], _format_duration(elapsed), eta))
+    finally:
+        if summary_stream is not None:
+            summary_stream.close()
+        for farm in set(farms.values()):
+            farm.unlink()
+    return records
+
+
+def enqueue_farm(queue_directory, configfiles, result_directory=None, timeout=None, retries=0, manifest=None, force=False):
+    """
+    put the turbines into a work queue, largest data file first, see t19_ice_loss.work_queue
+
+    turbines that are up to date in the manifest are marked done right away with their stored summary
+
+    :param queue_directory: shared queue directory, must not have unfinished jobs. Results of earlier rounds are removed
+    :param configfiles: list of turbine .ini files
+    :param result_directory: replaces the result directory of the .ini files if given
+    :param timeout: time limit of one turbine in seconds, None for no limit
+    :param retries: number of times a failed turbine is tried again
+    :param manifest: RunManifest, None to queue all the turbines
+    :param force: if True, queue all the turbines even if they are up to date in the manifest
+    :return: FileQueue
+    """
+    queue = FileQueue(queue_directory)
+    pending, claimed, done = queue.counts()
+    if pending or claimed:
+        raise ValueError("queue {0} still has {1} pending and {2} claimed jobs".format(queue_directory, pending, claimed))
+    queue.clear_results()
+    fingerprints = {}
+    skipped = []
+    if manifest is not None:
+        configfiles, skipped = skip_current(configfiles, manifest, result_directory, force, fingerprints)
+    # the worker machines see the files through the same paths only if they are absolute
+    if result_directory is not None:
+        result_directory = os.path.abspath(result_directory)
+    for number, (configfile, size) in enumerate(largest_first(configfiles)):
+        job_id = '{0:05d}-{1}'.format(number, os.path.splitext(os.path.basename(configfile))[0])
+        queue.put(job_id, {'configfile': os.path.abspath(configfile), 'size': size, 'result_directory': result_directory, 'timeout': timeout,
+                           'retries': retries, 'fingerprint': fingerprints.get(configfile)})
+    for record in skipped:
+        queue.skip('skipped-' + os.path.splitext(os.path.basename(record['configfile']))[0], record)
+    print("{0} : {1} turbines queued into {2}".format(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), len(configfiles), queue_directory))
+    return queue
+
+
+def queue_worker(queue_directory, stale_after=600, heartbeat=30, poll_interval=10):
+    """
+    process turbines from a work queue until it is empty, several workers can run on any host at the same time
+
+    the worker stays until no job is pending or claimed, and takes over the jobs of workers that have stopped
+    heartbeating for stale_after seconds
+
+    :param queue_directory: shared queue directory made with enqueue_farm
+    :param stale_after: seconds without a heartbeat after which a claimed job is run again
+    :param heartbeat: seconds between heartbeats of the job being processed
+    :param poll_interval: seconds to wait for the jobs of other workers to finish or become stale
+    :return: number of turbines processed
+    """
+    queue = FileQueue(queue_directory)
+    processed = 0
+    # the turbines run in a child process, so that one over its time limit can be terminated
+    with TurbineWorkers(1) as turbine_workers:
+        while True:
+            job = queue.claim()
+            if job is None:
+                for job_id in queue.recover_stale(stale_after):
+                    print("{0} : {1} took job {2} back from a stalled worker".format(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), queue.worker,
+                                                                                  job_id))
+                pending, claimed, done = queue.counts()
+                if not (pending or claimed):
+                    break
+                if not pending:
+                    time.sleep(poll_interval)
+                continue
+            job_id, payload = job
+            records = []
+            with Heartbeat(queue, job_id, heartbeat) as beat:
+                # a farm file is read for the turbine alone, other hosts can't share the memory
+                farms = share_farm_files([payload['configfile']])
+                try:
+                    turbine_workers.submit((payload['configfile'], payload['size'], payload['result_directory'], payload['timeout'],
+                                            payload['retries'], farms.get(payload['configfile'])))
+                    while not (records or beat.lost.is_set()):
+                        records = turbine_workers.wait(min(poll_interval, heartbeat))
+                    if not records:
+                        # taken for stale and given to another worker, which runs the turbine again
+                        turbine_workers.close()
+                finally:
+                    for farm in farms.values():
+                        farm.unlink()
+            record = records[0] if records else None
+            if record is not None:
+                record['worker'] = queue.worker
+                record['fingerprint'] = payload['fingerprint']
+            if (record is None) or not queue.complete(job_id, record):
+                print("{0} : {1} lost job {2} to another worker, its result is not recorded".format(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                                                                                 queue.worker, job_id))
+                continue
+            processed += 1
+            print("{0} : {1} {2} {3} in {4:.1f} s".format(dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), queue.worker, record['configfile'],
+                                                          record['status'], record['duration']))
+    return processed
+
+
+def run_queue_workers(queue_directory, workers=None, blas_threads=1, stale_after=600, heartbeat=30, poll_interval=10):
+    """
+    run queue_worker in several processes of this host and wait for them to finish
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    pin_blas_threads(blas_threads)
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=queue_worker, args=(queue_directory, stale_after, heartbeat, poll_interval)) for worker in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def collect_queue(queue_directory, result_directory, manifest=None):
+    """
+    gather the result markers of a work queue into the run log, the combined summaries and the manifest
+
+    :param queue_directory: shared queue directory
+    :param result_directory: directory of the combined files
+    :param manifest: RunManifest updated with the finished turbines, None to not update it
+    :return: list of run records, one per finished turbine
+    """
+    queue = FileQueue(queue_directory)
+    records = [record for job_id, record in queue.results()]
+    pending, claimed, done = queue.counts()
+    if pending or claimed:
+        print("{0} jobs still pending and {1} being processed in {2}".format(pending, claimed, queue_directory))
+    summary_stream = SummaryStream(os.path.join(result_directory, SUMMARY_STREAM))
+    try:
+        for record in sorted(records, key=lambda record: record['configfile']):
+            if record['summary'] is not None:
+                summary_stream.add(record)
+            if (manifest is not None) and (record['status'] != 'skipped'):
+                if record['status'] == 'ok':
+                    manifest.record(record['configfile'], record.get('fingerprint'), record['outputs'], record['summary'])
+                else:
+                    manifest.forget(record['configfile'])
+    finally:
+        summary_stream.close()
+    return records
+
+
+def write_run_log(filename, records):
+    """
+    write the status of every turbine of a farm run into a .csv file
+    """
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RUN_LOG_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count icing losses of every turbine of a farm')
     # directory containing all .ini files for individual turbines
-    source_directory = './data/siteconfigs/'
-
-    # result_directory, needs to be defined in .ini files as well
-    result_directory = './results/'
-    
-    #get list of .ini files
-    
-    turbines = [source_directory + filename for filename in os.listdir(source_directory) if ('.ini' in filename) and ('blank') not in filename]
-    
-    ## run the script sequentially
-    # for turb in turbines:
-    #     t19_counter.main(turb)
-    ## use all 4 cores
-    with Pool(4) as p:
-        p.map(t19_counter.main,turbines)
-
-    # combine summaryfiles into one large set
-    combined_summary(result_directory)
-    
+    parser.add_argument('--input-dir', default='./data/siteconfigs/', help='directory of the turbine .ini files')
+    parser.add_argument('--result-dir', default=None,
+                        help='result directory, replaces the one in the .ini files. By default the .ini files define it and the combined files go into ./results/')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of turbines processed in parallel, number of cores by default')
+    parser.add_argument('--timeout', type=float, default=None, help='time limit of one turbine in seconds')
+    parser.add_argument('--retries', type=int, default=0, help='number of times a failed turbine is tried again')
+    parser.add_argument('--blas-threads', type=int, default=1, help='threads of the numerical libraries in each worker')
+    parser.add_argument('--combine-only', action='store_true',
+                        help='only combine the summary files already in the result directory, nothing is processed')
+    parser.add_argument('--force', action='store_true', help='run all the turbines, also the ones whose results are up to date')
+    parser.add_argument('--queue', default=None, help='shared work queue directory, for running the farm on several hosts')
+    queue_action = parser.add_mutually_exclusive_group()
+    queue_action.add_argument('--enqueue', action='store_true', help='put the turbines into the queue')
+    queue_action.add_argument('--work', action='store_true', help='process turbines from the queue with --workers processes until it is empty')
+    queue_action.add_argument('--collect', action='store_true', help='combine the results of the queue into the result directory')
+    parser.add_argument('--stale-after', type=float, default=600, help='seconds without a heartbeat after which a claimed turbine is run again')
+    parser.add_argument('--heartbeat', type=float, default=30, help='seconds between the heartbeats of a queue worker')
+    args = parser.parse_args(argv)
+    if (args.queue is None) != (not (args.enqueue or args.work or args.collect)):
+        parser.error('--queue needs one of --enqueue, --work or --collect, and they need --queue')
+
+    # result_directory, needs to be defined in .ini files as well unless given here
+    result_directory = args.result_dir if args.result_dir is not None else './results/'
+    if args.combine_only:
+        combined_summary(result_directory)
+        return []
+    if args.work:
+        run_queue_workers(args.queue, args.workers, args.blas_threads, args.stale_after, args.heartbeat, min(10.0, args.heartbeat))
+        return []
+    if not os.path.exists(result_directory):
+        os.makedirs(result_directory)
+    manifest = RunManifest(os.path.join(result_directory, MANIFEST))
+    if args.enqueue:
+        enqueue_farm(args.queue, find_turbine_configs(args.input_dir), args.result_dir, args.timeout, args.retries, manifest, args.force)
+        return []
+    if args.collect:
+        # the results are in the queue, the .ini files are not needed
+        records = collect_queue(args.queue, result_directory, manifest)
+    else:
+        records = run_farm(find_turbine_configs(args.input_dir), args.workers, args.result_dir, args.timeout, args.retries, args.blas_threads,
+                           os.path.join(result_directory, SUMMARY_STREAM), manifest, args.force)
+
+    write_run_log(os.path.join(result_directory, '_farm_run.csv'), records)
+    failed = [record for record in records if record['status'] not in ('ok', 'skipped')]
+    skipped = [record for record in records if record['status'] == 'skipped']
+    for record in failed:
+        print("{0} {1}: {2}".format(record['configfile'], record['status'], record['error']))
+    print("{0} of {1} turbines processed, {2} skipped as up to date, {3} failed".format(len(records) - len(failed) - len(skipped), len(records),
+                                                                                      len(skipped), len(failed)))
+
+    # combine the summaries sent back by the workers and the stored summaries of skipped turbines into one large set,
+    # in the order of the .ini files
+    summaries = [record['summary'] for record in sorted(records, key=lambda record: record['configfile']) if record['summary'] is not None]
+    if summaries:
+        write_combined_summary(os.path.join(result_directory, COMBINED_SUMMARY), summaries)
+    return records
 
 
 if __name__ == '__main__':
-    main()
+    records = main()
+    if any(record['status'] not in ('ok', 'skipped') for record in records):
+        sys.exit(1)
@@ -1,3 +1,8 @@
 from .data_file_handler import CSVimporter
 from .data_file_handler import Result_file_writer
 from .aep_counter import AEPcounter
+from .event_index import EventIndex
+from .run_config import RunConfig
+from .run import RunResult
+from .run import analyse
+from .run import analyse_file
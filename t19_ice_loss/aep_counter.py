@@ -2,11 +2,15 @@
 
 """
 
+import collections
 import datetime
+import hashlib
 import numpy as np
-import scipy.stats as ss
-import configparser
 import sys
+import warnings
+
+from .event_index import EventIndex
+from .run_config import RunConfig
 
 class TimingError(Exception):
     def __init__(self, starttime, stoptime, index):
@@ -68,6 +72,10 @@ class AEPcounter:
         self.heating_power_index = 0
         self.replace_faults = False
         self.fault_columns = []
+        self.reference_power_cache = {} # theoretical_output_power results keyed by data fingerprint
+        self.lookup_table_resolution = 0.0 # wind speed step of the power curve lookup tables, 0 uses np.interp directly
+        self.power_curve_tables = None # compiled lookup tables, see compile_power_curve_tables
+        self.reference_iterations = 0 # maximum number of reference dataset refinement rounds, 0 to disable
         # TODO:
         # fix icing and stoptime to be actual minutes instead of sample count
 
@@ -78,102 +86,54 @@ class AEPcounter:
         :param config_var:
         :return: fallback value
         """
-        # so far all config var names are unique, no need to split this by section yet, do it anyway
-        if section == 'Source file':
-            sf_fallbacks = {'delimiter': ',',
-                            'quotechar': 'NONE',
-                            'datetime format': '%Y-%m-%d %H:%M:%S',
-                            'datetime extra char': '0',
-                            'replace fault codes': 'False'}
-            return sf_fallbacks[config_var]
-        elif section == 'Output':
-            o_fallbacks = {'result directory': '.',
-                           'summary': 'True',
-                           'plot': 'True',
-                           'alarm time series': 'True',
-                           'filtered raw data': 'True',
-                           'icing events': 'False','power curve': 'True'}
-            return o_fallbacks[config_var]
-        elif section == 'Data Structure':
-            # these are all mandatory, except this one, it needs a fallback to maintain compatibility with old inifiles
-            # need to define this anyway
-            ds_fallbacks = {"status code stop value": '0',
-                            "status index": '-1'}
-            return ds_fallbacks[config_var]
-        elif section == 'Icing':
+        if section == 'Icing':
             # icing is not mandatory anyway
-            i_fallbacks = {}
             return None
-        elif section == 'Binning':
-            b_fallbacks = {'minimum wind speed': '0',
-                           'maximum wind speed': '20',
-                           'wind speed bin size': '1',
-                           'wind direction bin size': '360'}
-            return b_fallbacks[config_var]
-        elif section == 'Filtering':
-            f_fallbacks = {'power drop limit': '10',
-                           'overproduction limit': '90',
-                           'power level filter': '0.01',
-                           'temperature filter': '1',
-                           'reference temperature': '3',
-                           'icing time': '3',
-                           'stop filter type': '0',
-                           'stop limit multiplier': '0.005',
-                           'stop time filter': '6',
-                           'statefilter type': '1',
-                           'min bin size': '36',
-                           'distance filter': 'True',
-                           'start time': 'None',
-                           'stop time': 'None'}
-            return f_fallbacks[config_var]
+        elif section in RunConfig.fallbacks:
+            return RunConfig.fallbacks[section][config_var]
         else:
             print('section "{0}" does not exist in config file'.format(section))
             sys.exit(1)
 
+    def set_data_options_from_config(self, run_config):
+        """
+        set the data structure options from a parsed configuration
+
+        :param run_config: RunConfig
+        """
+        self.ts_index = run_config.ts_index
+        self.ws_index = run_config.ws_index
+        self.wd_index = run_config.wd_index
+        self.temp_index = run_config.temp_index
+        self.pow_index = run_config.pow_index
+        self.rated_power = run_config.rated_power
+        self.state_index = list(run_config.state_index)
+        self.site_elevation = run_config.site_elevation
+        # normal state can be given as text or as a list of codes, all cases need to be sorted
+        self.replace_faults = run_config.replace_faults
+        if self.replace_faults: # fault codes as text
+            self.normal_state = [self.replace_faultcode(codestring) for codestring in run_config.normal_state]
+            self.stopcodes = [self.replace_faultcode(stop_code_string) for stop_code_string in run_config.stopcodes]
+        else:
+            self.normal_state = list(run_config.normal_state)
+            self.stopcodes = list(run_config.stopcodes)
+        self.id = run_config.id
+        self.result_dir = run_config.result_dir
+        self.status_stop_index = list(run_config.status_stop_index)
+        self.fault_columns = list(run_config.fault_columns)
 
     def set_data_options_from_file(self,filename):
         """
         read in configuration settings from a config file
         """
-        config = configparser.ConfigParser()
-        config.read(filename)
-        try:
-            self.ts_index = int(config.get('Data Structure','timestamp index'))
-            self.ws_index = int(config.get('Data Structure','wind speed index'))
-            self.wd_index  = int(config.get('Data Structure','wind direction index'))
-            self.temp_index = int(config.get('Data Structure','temperature index'))
-            self.pow_index = int(config.get('Data Structure','power index'))
-            self.rated_power = float(config.get('Data Structure','rated power'))
-            state_index_raw = config.get('Data Structure','state index')
-            self.state_index = [int(column_index) for column_index in state_index_raw.split(',')]
-            self.site_elevation = float(config.get('Data Structure','site elevation'))
-            stop_codes_raw = config.get('Data Structure', 'status code stop value', fallback=self.get_fallback_value('Data Structure', 'status code stop value'))
-            normal_state_raw = config.get('Data Structure','normal state')
-            # normal state can be given as text or as a list of codes, all cases need to be sorted
-            self.replace_faults = config.getboolean('Source file','replace fault codes')
-            if self.replace_faults: # fault codes as text
-                fault_codes = [self.replace_faultcode(codestring) for codestring in normal_state_raw.split(',')]
-                stop_code_values = [self.replace_faultcode(stop_code_string) for stop_code_string in stop_codes_raw.split(',')]
-            else:
-                fault_codes = [int(code) for code in normal_state_raw.split(',')]
-                stop_code_values = [int(stop_code) for stop_code in stop_codes_raw.split(',')]
-            self.normal_state = fault_codes
-            self.stopcodes = stop_code_values
-            self.id = config.get('Source file','id')
-            self.result_dir = config.get('Output', 'result directory', fallback=self.get_fallback_value('Output','result directory'))
-            status_stops_raw = config.get('Data Structure', 'status index', fallback=self.get_fallback_value('Data Structure', 'status index'))
-            self.status_stop_index = [int(code) for code in status_stops_raw.split(',')]
-            fault_column_string = config.get('Source file','fault columns')
-            self.fault_columns = [int(column_index) for column_index in fault_column_string.split(',')]
-        except configparser.NoOptionError as missing_value:
-            print("missing config option in {0}: {1}".format(filename, missing_value))
-            sys.exit(1)
-        except configparser.NoSectionError as missing_section:
-            print("missing config section in {0}: {1}".format(filename, missing_section))
-            sys.exit(1)
-        except ValueError as wrong_value:
-            print("Wrong type of value in {0}: {1}".format(filename, wrong_value))
-            sys.exit(1)
+        self.set_data_options_from_config(RunConfig.from_file(filename))
+
+    def __getstate__(self):
+        # the caches are left out when the counter is sent to another process, e.g. for rendering the plots,
+        # they hold arrays as long as the data and are rebuilt when needed
+        state = self.__dict__.copy()
+        state['reference_power_cache'] = {}
+        return state
 
     def replace_faultcode(self, code):
         """
@@ -187,105 +147,99 @@ class AEPcounter:
         if code in self.fault_dict:
             return self.fault_dict[code]
         else:
-            self.fault_dict[code] = max(self.fault_dict.values()) + 1
+            self.fault_dict[code] = max(self.fault_dict.values(), default=-1) + 1
             return self.fault_dict[code]
 
-    def set_binning_options_from_file(self, filename):
+    def set_binning_options_from_config(self, run_config):
         """
-        set bin division based on a config file
+        set bin division based on a parsed configuration
+
+        :param run_config: RunConfig
         """
-        config = configparser.ConfigParser()
-        config.read(filename)
-        if config.has_section('Binning'):
-            try:
-                min_windbin = float(config.get('Binning', 'minimum wind speed', fallback=self.get_fallback_value('Binning', 'minimum wind speed')))
-                max_windbin = float(config.get('Binning', 'maximum wind speed', fallback=self.get_fallback_value('Binning', 'maximum wind speed')))
-                windbin_width = float(config.get('Binning', 'wind speed bin size', fallback=self.get_fallback_value('Binning', 'wind speed bin size')))
-                directionbin_width = float(config.get('Binning', 'wind direction bin size', fallback=self.get_fallback_value('Binning', 'wind direction bin size')))
-                self.wind_bins = np.arange(min_windbin, max_windbin, windbin_width)
-                self.direction_bins = np.arange(0,360,directionbin_width)
-            except configparser.NoOptionError as missing_value:
-                print("missing config option in {0}: {1}".format(filename, missing_value))
-                sys.exit(1)
-            except ValueError as wrong_value:
-                print("Wrong type of value in {0}: {1}".format(filename, wrong_value))
-                sys.exit(1)
+        if run_config.has_binning:
+            self.lookup_table_resolution = run_config.lookup_table_resolution
+            self.wind_bins = np.arange(run_config.min_windbin, run_config.max_windbin, run_config.windbin_width)
+            self.direction_bins = np.arange(0, 360, run_config.directionbin_width)
         else:
             print("No binning options set, using defaults")
 
+    def set_binning_options_from_file(self, filename):
+        """
+        set bin division based on a config file
+        """
+        self.set_binning_options_from_config(RunConfig.from_file(filename))
+
+    def set_filtering_options_from_config(self, run_config):
+        """
+        set filtering options based on a parsed configuration
+
+        :param run_config: RunConfig
+        """
+        if run_config.has_filtering:
+            self.pc_low_limit = run_config.pc_low_limit
+            self.pc_high_limit = run_config.pc_high_limit
+            self.icing_time = run_config.icing_time
+            self.stop_level = run_config.stop_level
+            self.stop_time = run_config.stop_time
+            self.state_filter_type = run_config.state_filter_type
+            self.pc_binsize = run_config.pc_binsize
+            self.pc_dist_filter = run_config.pc_dist_filter
+            self.power_level_filter_limit = run_config.power_level_filter_limit
+            self.icing_temperature_limit = run_config.icing_temperature_limit
+            self.reference_temperature_limit = run_config.reference_temperature_limit
+            self.stop_filter_type = run_config.stop_filter_type
+            self.reference_iterations = run_config.reference_iterations
+            self.starttimestamp = run_config.starttimestamp
+            self.stoptimestamp = run_config.stoptimestamp
+
     def set_filtering_options_from_file(self, filename):
         """
         set filtering options based on a config file
         """
-        config = configparser.ConfigParser()
-        config.read(filename)
-        if config.has_section('Filtering'):
-            try:
-                self.pc_low_limit = int(config.get('Filtering', 'power drop limit', fallback=self.get_fallback_value('Filtering', 'power drop limit')))
-                self.pc_high_limit = int(config.get('Filtering', 'overproduction limit', fallback=self.get_fallback_value('Filtering', 'overproduction limit')))
-                self.icing_time = int(config.get('Filtering', 'icing time', fallback=self.get_fallback_value('Filtering', 'icing time')))
-                self.stop_level = float(config.get('Filtering', 'stop limit multiplier', fallback=self.get_fallback_value('Filtering',  'stop limit multiplier')))
-                self.stop_time = int(config.get('Filtering', 'stop time filter', fallback=self.get_fallback_value('Filtering',  'stop time filter')))
-                self.state_filter_type = int(config.get('Filtering', 'statefilter type', fallback=self.get_fallback_value('Filtering',  'statefilter type')))
-                self.pc_binsize = int(config.get('Filtering', 'min bin size', fallback=self.get_fallback_value('Filtering',  'min bin size')))
-                self.pc_dist_filter = config.getboolean('Filtering', 'distance filter', fallback=self.get_fallback_value('Filtering',  'distance filter'))
-                self.power_level_filter_limit = float(config.get('Filtering', 'power level filter', fallback=self.get_fallback_value('Filtering',  'power level filter')))
-                self.icing_temperature_limit = float(config.get('Filtering', 'temperature filter', fallback=self.get_fallback_value('Filtering',  'temperature filter')))
-                self.reference_temperature_limit = float(config.get('Filtering', 'reference temperature', fallback=self.get_fallback_value('Filtering',  'reference temperature')))
-                self.stop_filter_type = int(config.get('Filtering', 'stop filter type', fallback=self.get_fallback_value('Filtering',  'stop filter type')))
-                dt_format = config.get('Source file', 'datetime format', raw=True, fallback=self.get_fallback_value('Source file', 'datetime format'))
-                starttime_str = config.get('Filtering', 'Start time', fallback=self.get_fallback_value('Filtering', 'start time'))
-                if starttime_str.upper() != 'NONE':
-                    self.starttimestamp = datetime.datetime.strptime(starttime_str, dt_format)
-                stoptime_str = config.get('Filtering', 'Stop time', fallback=self.get_fallback_value('Filtering', 'stop time'))
-                if stoptime_str.upper() != 'NONE':
-                    self.stoptimestamp = datetime.datetime.strptime(stoptime_str, dt_format)
-
-            except configparser.NoOptionError as missing_value:
-                print("missing config option in {0}: {1}".format(filename, missing_value))
-                sys.exit(1)
-            except ValueError as wrong_value:
-                print("Wrong type of value in {0}: {1}".format(filename, wrong_value))
-                sys.exit(1)
+        self.set_filtering_options_from_config(RunConfig.from_file(filename))
+
+    def set_ips_options_from_config(self, run_config):
+        """
+        set config options for a heated site from a parsed configuration
+        if the "Icing" section does not exist, IPS and ice detection stay off
+
+        :param run_config: RunConfig
+        """
+        if run_config.has_icing:
+            self.heated_site = run_config.heated_site
+            self.ice_detection = run_config.ice_detection
+            self.ice_alarm_index = run_config.ice_alarm_index
+            if self.replace_faults and (self.ice_alarm_index in self.fault_columns):
+                self.ice_alarm_value = self.replace_faultcode(run_config.ice_alarm_value)
+            else:
+                self.ice_alarm_value = run_config.ice_alarm_value
+            self.heating_status_index = list(run_config.heating_status_index)
+            if self.replace_faults and any({*self.heating_status_index} & {*self.fault_columns}): # status codes as text
+                self.heating_status_value = [self.replace_faultcode(codestring) for codestring in run_config.heating_status_value]
+            else:
+                self.heating_status_value = list(run_config.heating_status_value)
+            self.heating_status_type = run_config.heating_status_type
+            self.heating_power_index = run_config.heating_power_index
+        else:
+            print("no [Icing] section in {0}, ignoring IPS options".format(run_config.source))
 
     def set_ips_options_from_file(self, filename):
         """
         set config options for a heated site, first check if "Icing" section even exists, then set the options
         # if ice detection is set to false or IPS is set to false, don't try to read their options
         """
-        config = configparser.ConfigParser()
-        config.read(filename)
-        if config.has_section('Icing'):
-            try:
-                self.heated_site = config.getboolean("Icing","heating")
-                self.ice_detection = config.getboolean("Icing","ice detection")
-                self.ice_alarm_index = int(config.get("Icing","icing alarm index"))
-                if self.replace_faults and (self.ice_alarm_index in self.fault_columns):
-                    ice_alarm_raw = config.get("Icing", "icing alarm code")
-                    self.ice_alarm_value = self.replace_faultcode(ice_alarm_raw)
-                else:
-                    self.ice_alarm_value = int(config.get("Icing", "icing alarm code"))
-                heating_index_raw = config.get("Icing","ips status index")
-                heating_value_raw = config.get("Icing","ips status code")
-                self.heating_status_index = [int(code) for code in heating_index_raw.split(',')]
-                if self.replace_faults and any({*self.heating_status_index} & {*self.fault_columns}): # status codes as text
-                    self.heating_status_value = [self.replace_faultcode(codestring) for codestring in heating_value_raw.split(',')]
-                else:
-                    self.heating_status_value = [int(code) for code in heating_value_raw.split(',')]
-
-                self.heating_status_type = int(config.get("Icing","ips status type"))
-                self.heating_power_index = int(config.get("Icing","ips power consumption index"))
-            except configparser.NoOptionError as missing_value:
-                print("missing config option in {0}: {1}".format(filename, missing_value))
-                sys.exit(1)
-            except configparser.NoSectionError as missing_section:
-                print("missing config section in {0}: {1}".format(filename, missing_section))
-                sys.exit(1)
-            except ValueError as wrong_value:
-                print("Wrong type of value in {0}: {1}".format(filename, wrong_value))
-                sys.exit(1)
-        else:
-            print("no [Icing] section in {0}, ignoring IPS options".format(filename))
+        self.set_ips_options_from_config(RunConfig.from_file(filename))
+
+    def set_options_from_config(self, run_config):
+        """
+        set all options from a parsed configuration, same as calling the data, binning, filtering and ips setters in order
+
+        :param run_config: RunConfig
+        """
+        self.set_data_options_from_config(run_config)
+        self.set_binning_options_from_config(run_config)
+        self.set_filtering_options_from_config(run_config)
+        self.set_ips_options_from_config(run_config)
 
     def state_filter_data(self, data):
         """
@@ -561,29 +515,30 @@ class AEPcounter:
         goes through all curves bin by bin
         can be useful to automatically weed out outliers in the data
 
+        All speed bins, direction bins and target values are processed at once:
+        the distance of each direction bin to all others is calculated as one pairwise distance array
+
         :param pc: prefilterd power curves
-        :param target_value: index of the value used for filtering e.g. power
+        :param target_value: index, or a list of indexes, of the values used for filtering e.g. power
         :return: fltered power curve matrix
 
         """
         (x, y, z) = np.shape(pc)
         value_filter = 2.5
-        for speed_bin in range(x):
-            mean_distances = np.zeros(y)
-            for direction_bin in range(y):
-                mean_distances[direction_bin] = self.distance_to_neighbours(pc, speed_bin, direction_bin, target_value)
-            med_dist = np.nanmedian(mean_distances)
-            bad_values = []
-            for index,value in enumerate(mean_distances):
-                if (value/med_dist) > value_filter:
-                    bad_values.append(index)
-
-            neighbours = np.ones(y).astype('bool')
-            neighbours[bad_values] = False
-            # print("{0}: {1}".format(speed_bin,bad_values))
-            mpc = self.mean_power_curve(pc[:, neighbours,:])
-            for value in bad_values:
-                pc[speed_bin, value, target_value] = mpc[speed_bin, target_value]
+        targets = np.atleast_1d(target_value)
+        values = pc[:, :, targets]
+        # pairwise distances between direction bins, shape (speed, direction, direction, target)
+        distances = np.abs(values[:, :, np.newaxis, :] - values[:, np.newaxis, :, :])
+        distances[:, np.arange(y), np.arange(y), :] = np.nan
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            # bins with nothing but nans produce nan means, same as with single bins
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            mean_distances = np.nanmean(distances, axis=2)
+            med_dist = np.nanmedian(mean_distances, axis=1, keepdims=True)
+            bad_values = (mean_distances / med_dist) > value_filter
+            # mean of the remaining direction bins in each speed bin
+            mpc = np.nanmean(np.where(bad_values, np.nan, values), axis=1)
+        pc[:, :, targets] = np.where(bad_values, mpc[:, np.newaxis, :], values)
         return pc
 
     def diff_filter(self,data,diff_limit=0.001):
@@ -622,25 +577,269 @@ class AEPcounter:
                     too_smalls[speed_bin, direction_bin, 9] = True
         return too_smalls
 
+    def timestamp_array(self, timestamps):
+        """
+        convert a column of datetime.datetime timestamps into a numpy datetime64 array
+        makes it possible to do time arithmetic on whole columns instead of line by line
+
+        :param timestamps: timestamp column of the data
+        :return: numpy array of datetime64[us]
+        """
+        return np.asarray(timestamps).astype('datetime64[us]')
+
+    def content_fingerprint(self, *arrays):
+        """
+        calculate a fingerprint of the contents of numpy arrays, used as a cache key
+        when the contents of any of the arrays change, the fingerprint changes as well
+
+        :param arrays: numerical numpy arrays
+        :return: hex digest of the contents
+        """
+        fingerprint = hashlib.blake2b(digest_size=16)
+        for arr in arrays:
+            arr = np.ascontiguousarray(arr)
+            fingerprint.update(str((arr.dtype.str, arr.shape)).encode())
+            fingerprint.update(arr.tobytes())
+        return fingerprint.hexdigest()
+
+    def data_fingerprint(self, data):
+        """
+        fingerprint of the columns and settings the reference power of data depends on
+
+        calculated from the contents on every call, so data changed in place or changed settings give a new fingerprint
+
+        :param data: data array in the format of CSVimporter.full_data
+        :return: hex digest
+        """
+        settings = np.array([repr((self.ts_index, self.ws_index, self.wd_index, self.pow_index, self.starttimestamp, self.stoptimestamp))])
+        return self.content_fingerprint(self.timestamp_array(data[:, self.ts_index]), data[:, self.ws_index].astype(float),
+                                        data[:, self.wd_index].astype(float), data[:, self.pow_index].astype(float), self.direction_bins, settings)
+
+    def direction_bin_indexes(self, directions):
+        """
+        find the index of the nearest direction bin for each wind direction measurement
+        nans end up in the first bin, same as with np.argmin
+
+        :param directions: wind direction measurements
+        :return: array of direction bin indexes
+        """
+        directions = np.asarray(directions, dtype=float)
+        if len(self.direction_bins) == 1:
+            return np.zeros(len(directions), dtype=int)
+        midpoints = (self.direction_bins[1:] + self.direction_bins[:-1]) / 2.0
+        dirbins = np.searchsorted(midpoints, directions, side='left')
+        dirbins[np.isnan(directions)] = 0
+        return dirbins
+
+    def compile_power_curve_tables(self, power_curves, resolution=None):
+        """
+        compile the power curves of each direction bin into dense lookup tables sampled on a uniform wind speed grid
+
+        The table values are the np.interp values of the power curve at the grid points, so outside of the power curve
+        the tables are clamped to the first and last values in the same way as np.interp.
+        Direction bins where the wind speeds of the power curve are not strictly increasing are left uncompiled
+        and evaluated with np.interp instead.
+
+        :param power_curves: power curve array as returned by count_power_curves
+        :param resolution: wind speed step of the grid in m/s, defaults to self.lookup_table_resolution
+        :return: dictionary containing the grid start points, steps, the tables and the list of compiled variables,
+                 the last axis of the tables follows the order of the variables
+        """
+        if resolution is None:
+            resolution = self.lookup_table_resolution
+        if not resolution > 0:
+            raise ValueError("lookup table resolution has to be positive, got {0}".format(resolution))
+        (x, y, z) = np.shape(power_curves)
+        variables = [2, 3, 4, 8, 9]
+        starts = np.zeros(y)
+        steps = np.ones(y)
+        compiled = np.zeros(y, dtype=bool)
+        spans = np.zeros(y)
+        for dirbin in range(y):
+            speeds = power_curves[:, dirbin, 0]
+            if (x > 1) and np.isfinite(speeds).all() and (np.diff(speeds) > 0.0).all():
+                compiled[dirbin] = True
+                starts[dirbin] = speeds[0]
+                spans[dirbin] = speeds[-1] - speeds[0]
+        grid_size = max(int(np.ceil(np.max(spans) / resolution)) + 1, 2)
+        tables = np.full((y, grid_size, len(variables)), np.nan)
+        for dirbin in np.nonzero(compiled)[0]:
+            steps[dirbin] = spans[dirbin] / (grid_size - 1)
+            grid = starts[dirbin] + np.arange(grid_size) * steps[dirbin]
+            for slot, variable_index in enumerate(variables):
+                tables[dirbin, :, slot] = np.interp(grid, power_curves[:, dirbin, 0], power_curves[:, dirbin, variable_index])
+        return {'starts': starts, 'steps': steps, 'tables': tables, 'compiled': compiled, 'variables': variables,
+                'resolution': resolution}
+
+    def get_power_curve_tables(self, power_curves):
+        """
+        return the lookup tables of the power curves, compile them if power curves or resolution have changed
+
+        :param power_curves: power curve array
+        :return: lookup tables as returned by compile_power_curve_tables
+        """
+        pc_key = self.content_fingerprint(power_curves)
+        if (self.power_curve_tables is None) or (self.power_curve_tables[0] != pc_key) or \
+                (self.power_curve_tables[1]['resolution'] != self.lookup_table_resolution):
+            self.power_curve_tables = (pc_key, self.compile_power_curve_tables(power_curves))
+        return self.power_curve_tables[1]
+
+    def lookup_power_curve(self, wind_speeds, dirbins, power_curve_tables, variable_index):
+        """
+        evaluate power curve lookup tables, O(1) for each sample: grid index and linear blend between two table values
+
+        :param wind_speeds: wind speed measurements
+        :param dirbins: direction bin index of each measurement
+        :param power_curve_tables: lookup tables as returned by compile_power_curve_tables
+        :param variable_index: index of the interpolated variable in the power curve
+        :return: interpolated values, nan for nan wind speeds and uncompiled direction bins
+        """
+        tables = power_curve_tables['tables'][:, :, power_curve_tables['variables'].index(variable_index)]
+        grid_size = tables.shape[1]
+        position = (np.asarray(wind_speeds, dtype=float) - power_curve_tables['starts'][dirbins]) / power_curve_tables['steps'][dirbins]
+        missing = np.isnan(position)
+        position = np.clip(np.where(missing, 0.0, position), 0.0, grid_size - 1)
+        lower = np.minimum(position.astype(int), grid_size - 2)
+        blend = position - lower
+        lower_values = tables[dirbins, lower]
+        values = lower_values + blend * (tables[dirbins, lower + 1] - lower_values)
+        values[missing] = np.nan
+        return values
+
+    def power_curve_table_error(self, power_curves, resolution=None):
+        """
+        maximum absolute difference between lookup table evaluation and np.interp for the given power curves
+
+        Both are piecewise linear, so the largest difference is found at the power curve wind speeds themselves.
+
+        :param power_curves: power curve array
+        :param resolution: wind speed step of the lookup tables, has to be positive
+        :return: maximum absolute error over all compiled direction bins and variables
+        """
+        power_curve_tables = self.compile_power_curve_tables(power_curves, resolution)
+        (x, y, z) = np.shape(power_curves)
+        max_error = 0.0
+        for dirbin in np.nonzero(power_curve_tables['compiled'])[0]:
+            speeds = power_curves[:, dirbin, 0]
+            dirbins = np.full(x, dirbin)
+            for variable_index in power_curve_tables['variables']:
+                exact = np.interp(speeds, speeds, power_curves[:, dirbin, variable_index])
+                approx = self.lookup_power_curve(speeds, dirbins, power_curve_tables, variable_index)
+                max_error = max(max_error, np.nanmax(np.abs(exact - approx), initial=0.0))
+        return max_error
+
+    def interpolate_power_curve(self, wind_speeds, dirbins, power_curves, variable_index):
+        """
+        interpolate the value of one power curve variable at each wind speed using the power curve of the
+        matching direction bin
+
+        if self.lookup_table_resolution is set, the values are read from the precompiled lookup tables,
+        otherwise np.interp is used
+
+        :param wind_speeds: wind speed measurements
+        :param dirbins: direction bin index of each measurement, as returned by direction_bin_indexes
+        :param power_curves: power curve array
+        :param variable_index: index of the interpolated variable in the power curve, e.g. 2 for power
+        :return: interpolated values
+        """
+        wind_speeds = np.asarray(wind_speeds, dtype=float)
+        dirbins = np.asarray(dirbins, dtype=int)
+        values = np.full(len(wind_speeds), np.nan)
+        interp_mask = np.ones(len(wind_speeds), dtype=bool)
+        if self.lookup_table_resolution > 0:
+            power_curve_tables = self.get_power_curve_tables(power_curves)
+            if variable_index in power_curve_tables['variables']:
+                interp_mask = ~power_curve_tables['compiled'][dirbins]
+                table_mask = ~interp_mask
+                values[table_mask] = self.lookup_power_curve(wind_speeds[table_mask], dirbins[table_mask], power_curve_tables, variable_index)
+        for dirbin in np.unique(dirbins[interp_mask]):
+            mask = interp_mask & (dirbins == dirbin)
+            values[mask] = np.interp(wind_speeds[mask], power_curves[:, dirbin, 0], power_curves[:, dirbin, variable_index])
+        return values
+
     def theoretical_output_power(self, data, power_curves):
         """
         calculates the theoretical, expected output power based on power curve and measured wind speed
 
+        Results are cached. The cache is keyed by the content of the data, the settings the result depends on and the
+        power curve, so repeated calls with the same data and power curve return the same, shared array without
+        filtering and interpolating again, see data_fingerprint. Do not modify the returned array in place.
+
         :param data:
         :param power_curve:
-        :return: rerference power, in structure [timestamp, interpolated reference power, actual measured output power]
-        """
-        reference = []
+        :return: rerference power, in structure [timestamp, interpolated reference power, actual measured output power,
+                 P10, P90, uncertainty lower limit, uncertainty upper limit]
+        """
+        if len(data) == 0:
+            return np.array([])
+        data_key = self.data_fingerprint(data)
+        pc_key = self.content_fingerprint(power_curves, np.array([self.lookup_table_resolution]))
+        cached = self.reference_power_cache.get(data_key)
+        if (cached is not None) and (cached[0] == pc_key):
+            return cached[1]
         time_limited_data = self.time_filter_data(data)
-        for line in time_limited_data:
-            dirbin = np.argmin(np.abs(self.direction_bins - line[self.wd_index]))
-            int_pow = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 2])
-            int_pow_p10 = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 3])
-            int_pow_p90 = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 4])
-            uncert_lower_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 8])
-            uncert_upper_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 9])
-            reference.append((line[self.ts_index], int_pow, line[self.pow_index], int_pow_p10, int_pow_p90, uncert_lower_lim, uncert_upper_lim))
-        return np.array(reference)
+        if len(time_limited_data) == 0:
+            return np.array([])
+        timestamps = time_limited_data[:, self.ts_index]
+        wind_speeds = time_limited_data[:, self.ws_index].astype(float)
+        directions = time_limited_data[:, self.wd_index].astype(float)
+        dirbins = self.direction_bin_indexes(directions)
+        reference = np.empty((len(time_limited_data), 7), dtype=object)
+        reference[:, 0] = timestamps
+        reference[:, 1] = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 2)
+        reference[:, 2] = time_limited_data[:, self.pow_index]
+        reference[:, 3] = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 3)
+        reference[:, 4] = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 4)
+        reference[:, 5] = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 8)
+        reference[:, 6] = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 9)
+        # a new power curve for the same data replaces the old entry
+        self.reference_power_cache[data_key] = (pc_key, reference)
+        return reference
+
+    def production_index(self, data, index, delta=datetime.timedelta(seconds=10*60), timestamps=None):
+        """
+        calculates the production of each time step and the cumulative production of the whole time series
+        the production of a step is integrated from the previous time stamp to current with the trapezoidal rule
+        steps are skipped (production 0) if the difference between two adjacent timestamps is more than delta,
+        either end of the step is nan or either end has zero or negative power
+
+        NOTE: assumes timestamp is at index 0
+
+        With the cumulative production, the production between rows i and j is cumulative[j] - cumulative[i]
+
+        :param data: input data, containing the measured output
+        :param index: index of the production measurement
+        :param delta: difference between two timestamps defaults to ten minutes
+        :param timestamps: timestamps of the data as datetime64, converted from the data if not given
+        :return: timestamps as datetime64, production of each step ending at rows 1..n, cumulative production at each row
+        """
+        if timestamps is None:
+            timestamps = self.timestamp_array(data[:, 0])
+        power = data[:, index].astype(float)
+        step_lengths = np.diff(timestamps)
+        # integrity check, nans evaluate as False
+        with np.errstate(invalid='ignore'):
+            valid = (step_lengths <= np.timedelta64(delta)) & (power[:-1] > 0.0) & (power[1:] > 0.0)
+        durations = step_lengths / np.timedelta64(1, 'h') # length in hours
+        step_production = np.where(valid, durations * ((power[:-1] + power[1:]) / 2.0), 0.0)
+        cumulative_production = np.zeros(len(data))
+        np.cumsum(step_production, out=cumulative_production[1:])
+        return timestamps, step_production, cumulative_production
+
+    def production_totals(self, data, indexes, delta=datetime.timedelta(seconds=10*60)):
+        """
+        total production of several columns of the same data, the timestamps are converted only once
+        and each total is the last value of the cumulative production, see production_index
+
+        :param data: input data, timestamp at index 0
+        :param indexes: indexes of the production measurements
+        :param delta: difference between two timestamps defaults to ten minutes
+        :return: list of the total productions in the order of indexes
+        """
+        if len(data) < 2:
+            return [0.0 for index in indexes]
+        timestamps = self.timestamp_array(data[:, 0])
+        return [float(self.production_index(data, index, delta, timestamps)[2][-1]) for index in indexes]
 
     def calculate_production(self,data,index,delta=datetime.timedelta(seconds=10*60)):
         """
@@ -654,20 +853,13 @@ class AEPcounter:
         :param delta: difference between two timestamps defaults to ten minutes
         :return: structure containing [end timestep, production]
         """
-        output_data = []
-        for i in range(len(data)):
-            if i != 0:
-                # integrity check
-                if ((data[i,0] - data[i-1,0]) > delta) or np.isnan(data[i,index]) or np.isnan(data[i-1,index]) or (data[i,index] <=0.0) or (data[i-1,index] <= 0.0):
-                    prod = 0
-                else:
-                    dur = (data[i,0]-data[i-1,0]).total_seconds()/60.0/60.0 # length in hours
-                    pow_at_start = data[i-1,index]
-                    pow_at_stop = data[i,index]
-                    prod = dur * ((pow_at_start+pow_at_stop) / 2.0)
-                output_data.append((data[i,0],prod))
-        output_datalen = len(output_data)
-        return np.array(output_data)
+        if len(data) < 2:
+            return np.array([])
+        timestamps, step_production, cumulative_production = self.production_index(data, index, delta)
+        output_data = np.empty((len(step_production), 2), dtype=object)
+        output_data[:, 0] = data[1:, 0]
+        output_data[:, 1] = step_production
+        return output_data
 
     def count_power_curves(self, data):
         """
@@ -712,6 +904,27 @@ class AEPcounter:
         pc = np.zeros((len(self.wind_bins), len(self.direction_bins), 10))
         dir_data = self.put_data_into_bins(data, self.direction_bins, self.wd_index,direction=True)
         binned_data = self.put_data_into_bins(dir_data, self.wind_bins, self.ws_index)
+        #print(binned_data)
+        for speed_bin_index in range(len(self.wind_bins)):
+            for direction_bin_index in range(len(self.direction_bins)):
+                bin_contents = self.fetch_bin_contents_2d(binned_data, -1, speed_bin_index, -2, direction_bin_index)
+                self.power_curve_bin(pc, speed_bin_index, direction_bin_index, bin_contents[:, self.ws_index].astype('float'),
+                                     bin_contents[:, self.wd_index].astype('float'), bin_contents[:, self.pow_index].astype('float'))
+        return self.finish_power_curves(pc)
+
+    def power_curve_bin(self, pc, speed_bin_index, direction_bin_index, wind_speeds, directions, power):
+        """
+        calculate the power curve values of one wind speed and direction bin from the measurements in the bin
+
+        :param pc: power curve array, the values of the bin are set in place
+        :param speed_bin_index: index of the wind speed bin
+        :param direction_bin_index: index of the direction bin
+        :param wind_speeds: wind speeds in the bin, in time order
+        :param directions: wind directions in the bin, in time order
+        :param power: output power in the bin, in time order
+        """
+        # scipy.stats is slow to import and only needed here
+        import scipy.stats as ss
         wind_speed_index = 0
         wind_dir_index = 1
         power_index = 2
@@ -722,72 +935,79 @@ class AEPcounter:
         bin_uncertainty_lower_lim_index = 8
         bin_uncertainty_upper_lim_index = 9
         bin_size_index = 7
-        #print(binned_data)
-        for speed_bin_index in range(len(self.wind_bins)):
-            for direction_bin_index in range(len(self.direction_bins)):
-                bin_contents = self.fetch_bin_contents_2d(binned_data, -1, speed_bin_index, -2, direction_bin_index)
-                if bin_contents.size == 0:
-                    pc[speed_bin_index, direction_bin_index, wind_speed_index] = self.wind_bins[speed_bin_index]
-                    pc[speed_bin_index, direction_bin_index, wind_dir_index] = self.direction_bins[direction_bin_index]
-                    # force power to be 0 at wind speed 0, helps with interpolation
-                    # and other tricks used to cover missing data
-                    if speed_bin_index == 0:
-                        replacement = 0
-                    else:
-                        replacement = np.nan
-                    pc[speed_bin_index, direction_bin_index, power_index] = replacement
-                    pc[speed_bin_index, direction_bin_index, low_limit_index] = replacement
-                    pc[speed_bin_index, direction_bin_index, high_limit_index] = replacement
-                    pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = replacement
-                    pc[speed_bin_index, direction_bin_index, bin_uncertainty] = replacement
-                    pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = replacement
-                    pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = replacement
-                    pc[speed_bin_index, direction_bin_index, bin_size_index] = bin_contents.size
+        if len(power) == 0:
+            pc[speed_bin_index, direction_bin_index, wind_speed_index] = self.wind_bins[speed_bin_index]
+            pc[speed_bin_index, direction_bin_index, wind_dir_index] = self.direction_bins[direction_bin_index]
+            # force power to be 0 at wind speed 0, helps with interpolation
+            # and other tricks used to cover missing data
+            if speed_bin_index == 0:
+                replacement = 0
+            else:
+                replacement = np.nan
+            pc[speed_bin_index, direction_bin_index, power_index] = replacement
+            pc[speed_bin_index, direction_bin_index, low_limit_index] = replacement
+            pc[speed_bin_index, direction_bin_index, high_limit_index] = replacement
+            pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = replacement
+            pc[speed_bin_index, direction_bin_index, bin_uncertainty] = replacement
+            pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = replacement
+            pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = replacement
+            pc[speed_bin_index, direction_bin_index, bin_size_index] = 0
+        else:
+            # suppress runtime errors caused by bins with nothing but nans
+            if np.isnan(wind_speeds).all():
+                pc[speed_bin_index, direction_bin_index, wind_speed_index] = np.nan
+            else:
+                pc[speed_bin_index, direction_bin_index, wind_speed_index] = np.nanmedian(wind_speeds)
+            if np.isnan(directions).all():
+                pc[speed_bin_index, direction_bin_index, wind_dir_index] = np.nan
+            else:
+                pc[speed_bin_index, direction_bin_index, wind_dir_index] = self.wind_dir_mean(directions)
+            if np.isnan(power).all():
+                pc[speed_bin_index, direction_bin_index, power_index] = np.nan
+                pc[speed_bin_index, direction_bin_index, low_limit_index] = np.nan
+                pc[speed_bin_index, direction_bin_index, high_limit_index] = np.nan
+                pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = np.nan
+                pc[speed_bin_index, direction_bin_index, bin_uncertainty] = np.nan
+                pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = np.nan
+                pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = np.nan
+            else:
+                #pc[speed_bin_index, direction_bin_index, power_index] = np.nanmean(power)
+                mean_power = np.nanmedian(power)
+                power_std_dev = np.nanstd(power)
+                pc[speed_bin_index, direction_bin_index, power_index] = mean_power
+                pc[speed_bin_index, direction_bin_index, low_limit_index] = ss.scoreatpercentile(power, self.pc_low_limit)
+                pc[speed_bin_index, direction_bin_index, high_limit_index] = ss.scoreatpercentile(power, self.pc_high_limit)
+                pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = power_std_dev
+                # divide by zero possible
+                if pc[speed_bin_index, direction_bin_index, power_index] != 0.0:
+                    pc[speed_bin_index, direction_bin_index, bin_uncertainty] = power_std_dev / mean_power * 100.0
                 else:
-                    # suppress runtime errors caused by bins with nothing but nans
-                    if np.isnan(bin_contents[:, self.ws_index].astype('float')).all():
-                        pc[speed_bin_index, direction_bin_index, wind_speed_index] = np.nan
-                    else:
-                        pc[speed_bin_index, direction_bin_index, wind_speed_index] = np.nanmedian(bin_contents[:, self.ws_index].astype('float'))
-                    if np.isnan(bin_contents[:, self.wd_index].astype('float')).all():
-                        pc[speed_bin_index, direction_bin_index, wind_dir_index] = np.nan
-                    else:
-                        pc[speed_bin_index, direction_bin_index, wind_dir_index] = self.wind_dir_mean(bin_contents[:, self.wd_index].astype('float'))
-                    if np.isnan(bin_contents[:, self.pow_index].astype('float')).all():
-                        pc[speed_bin_index, direction_bin_index, power_index] = np.nan
-                        pc[speed_bin_index, direction_bin_index, low_limit_index] = np.nan
-                        pc[speed_bin_index, direction_bin_index, high_limit_index] = np.nan
-                        pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = np.nan
-                        pc[speed_bin_index, direction_bin_index, bin_uncertainty] = np.nan
-                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = np.nan
-                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = np.nan
-                    else:
-                        #pc[speed_bin_index, direction_bin_index, power_index] = np.nanmean(bin_contents[:, self.pow_index].astype('float'))
-                        mean_power = np.nanmedian(bin_contents[:, self.pow_index].astype('float'))
-                        power_std_dev = np.nanstd(bin_contents[:, self.pow_index].astype('float'))
-                        pc[speed_bin_index, direction_bin_index, power_index] = mean_power
-                        pc[speed_bin_index, direction_bin_index, low_limit_index] = ss.scoreatpercentile(bin_contents[:, self.pow_index], self.pc_low_limit)
-                        pc[speed_bin_index, direction_bin_index, high_limit_index] = ss.scoreatpercentile(bin_contents[:, self.pow_index], self.pc_high_limit)
-                        pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = power_std_dev
-                        # divide by zero possible
-                        if pc[speed_bin_index, direction_bin_index, power_index] != 0.0:
-                            pc[speed_bin_index, direction_bin_index, bin_uncertainty] = power_std_dev / mean_power * 100.0
-                        else:
-                            pc[speed_bin_index, direction_bin_index, bin_uncertainty] = 0.0
-                        # upper and lower limits needed for production uncertainty
-                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = max(0.0, mean_power - power_std_dev)
-                        # prevent upper liimt from going below lower limit
-                        if mean_power > self.rated_power:
-                            power_upper_limit = mean_power + power_std_dev
-                        else:
-                            power_upper_limit = min(mean_power + power_std_dev, self.rated_power)
-                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = power_upper_limit
-                    bin_rows, bin_columns = bin_contents.shape
-                    pc[speed_bin_index, direction_bin_index, bin_size_index] = bin_rows
+                    pc[speed_bin_index, direction_bin_index, bin_uncertainty] = 0.0
+                # upper and lower limits needed for production uncertainty
+                pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = max(0.0, mean_power - power_std_dev)
+                # prevent upper liimt from going below lower limit
+                if mean_power > self.rated_power:
+                    power_upper_limit = mean_power + power_std_dev
+                else:
+                    power_upper_limit = min(mean_power + power_std_dev, self.rated_power)
+                pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = power_upper_limit
+            pc[speed_bin_index, direction_bin_index, bin_size_index] = len(power)
 
-        #TODO:
-            # make filtering optional, on by default
+    def finish_power_curves(self, pc):
+        """
+        post-process the power curves counted bin by bin: remove too small bins, interpolate over the missing
+        values and apply the distance filter
 
+        :param pc: power curve array with the values of every bin set with power_curve_bin
+        :return: finished power curve array
+        """
+        power_index = 2
+        low_limit_index = 3
+        high_limit_index = 4
+        bin_standard_dev_index = 5
+        bin_uncertainty = 6
+        bin_uncertainty_lower_lim_index = 8
+        bin_uncertainty_upper_lim_index = 9
         too_smalls = self.bin_size_filter(pc, self.pc_binsize)
         pc[too_smalls] = np.nan
         # interpolate over missing data
@@ -808,9 +1028,7 @@ class AEPcounter:
         # filter out obviously wrong values only usable if there is more than one direction bin
         [x,y,z] = np.shape(pc)
         if self.pc_dist_filter and (y > 1):
-            pc = self.distance_filter(pc, power_index)
-            pc = self.distance_filter(pc, low_limit_index)
-            pc = self.distance_filter(pc, high_limit_index)
+            pc = self.distance_filter(pc, [power_index, low_limit_index, high_limit_index])
         return pc
 
     def mean_power_curve(self, pc):
@@ -942,50 +1160,81 @@ class AEPcounter:
         :param over: if True, flags the timestamps where the power is above P90 instead
         :return: an array of the format [timestamp, alarm, wind speed, reference power, temperature, power, limit]
         """
-        pow_alarms = []
-        timed = datetime.timedelta(seconds=601)
-        for index,line in enumerate(data):
-            # integrity check for the data
-            if (index != 0) and (index != len(data)-1):
-                continuous = (line[self.ts_index] - data[index-1,self.ts_index]) < timed and (data[index+1,self.ts_index] - line[self.ts_index]) < timed
-            else:
-                continuous = False
-            # pick index of active direction bin
-            dirbin = np.argmin(np.abs(line[self.wd_index]-self.direction_bins))
-            # pick the active wind speed bin
-            windbin = np.argmin(np.abs(line[self.ws_index]-self.wind_bins))
-            #wind and power at active bin
-
-            # interpolate the value from power and limit (P10) curve to matches the current wind speed
-            # np.interp does piecewise linear interpolation that can be assumed to be good enough in this
-            # case. The power curve is close to linear between any two bins
+        timed = np.timedelta64(601, 's')
+        datalen = len(data)
+        if datalen == 0:
+            return np.array([])
+        alarms = np.empty((datalen, 7), dtype=object)
+        # integrity check for the data, both neighbouring timestamps need to be within the time limit
+        timestamps = self.timestamp_array(data[:, self.ts_index])
+        step_ok = np.diff(timestamps) < timed
+        continuous = np.zeros(datalen, dtype=bool)
+        continuous[1:-1] = step_ok[:-1] & step_ok[1:]
+        # pick index of active direction bin
+        dirbins = self.direction_bin_indexes(data[:, self.wd_index].astype(float))
+        wind_speeds = data[:, self.ws_index].astype(float)
+        # interpolate the value from power and limit (P10) curve to matches the current wind speed
+        # piecewise linear interpolation can be assumed to be good enough in this
+        # case. The power curve is close to linear between any two bins
+        if over:
+            int_lim = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 4)
+        else:
+            int_lim = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 3)
+        int_pow = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 2)
+        power = data[:, self.pow_index].astype(float)
+        temperature = data[:, self.temp_index].astype(float)
+        # nans in data evaluate as False, which is what we want
+        with np.errstate(invalid='ignore'):
+            cold = temperature <= self.icing_temperature_limit
             if over:
-                int_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 4])
+                flagged = continuous & (power >= int_lim) & cold
+                alarm_value = 3.0
             else:
-                int_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 3])
-            int_pow = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 2])
-
-            if continuous:
-                if over:
-                    if (line[self.pow_index] >= int_lim) and (line[self.temp_index] <= self.icing_temperature_limit):
-                        pow_alrm = 3.0
-                    else:
-                        pow_alrm = 0.0
-                else:
-                    if (line[self.pow_index] <= int_lim) and (line[self.temp_index] <= self.icing_temperature_limit):
-                        pow_alrm = 1.0
-                    else:
-                        pow_alrm = 0.0
-            else:
-                pow_alrm = 0.0
-            pow_alarms.append((line[self.ts_index], pow_alrm, line[self.ws_index], int_pow, line[self.temp_index], line[self.pow_index], int_lim))
-        alarms = np.array(pow_alarms)
+                flagged = continuous & (power <= int_lim) & cold
+                alarm_value = 1.0
+        alarms[:, 0] = data[:, self.ts_index]
+        alarms[:, 1] = np.where(flagged, alarm_value, 0.0)
+        alarms[:, 2] = data[:, self.ws_index]
+        alarms[:, 3] = int_pow
+        alarms[:, 4] = data[:, self.temp_index]
+        alarms[:, 5] = data[:, self.pow_index]
+        alarms[:, 6] = int_lim
         if time_filter:
             filtered_alarms = self.timefilter_ice_alarms(alarms, self.icing_time)
             return filtered_alarms
         else:
             return alarms
 
+    def prefix_sums(self, values):
+        """
+        cumulative sums of values with a zero prepended. The sum of values[i:j] is prefix[j] - prefix[i]
+        nans are counted as zeros
+
+        :param values: 1d array
+        :return: array of cumulative sums, one longer than values
+        """
+        prefix = np.zeros(len(values) + 1)
+        np.cumsum(np.nan_to_num(values, nan=0.0), out=prefix[1:])
+        return prefix
+
+    def range_nanmeans(self, values, start_indexes, stop_indexes):
+        """
+        nanmean of values[start:stop] for a set of index ranges, computed in float32 like the event means have always
+        been. The ranges of the events do not overlap, so all the means together take O(n)
+
+        :param values: 1d float32 array
+        :param start_indexes: range starts
+        :param stop_indexes: range stops, not included in the range
+        :return: mean of each range, nan if the range contains no valid values
+        """
+        means = np.full(len(start_indexes), np.nan, dtype=np.float32)
+        with warnings.catch_warnings():
+            # ranges without valid values are nan
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            for index, (start, stop) in enumerate(zip(start_indexes, stop_indexes)):
+                means[index] = np.nanmean(values[start:stop])
+        return means
+
     def power_loss_during_alarm(self, data, ips_alarm=False):
         """
         Collect the start and stop times of icing alarms and calculate the total
@@ -994,6 +1243,10 @@ class AEPcounter:
         counts the production loss by calculating the approximate area between
         the estimated production curve and the actual production curve as calculated by power_alarms
 
+        The losses are integrated step by step with the trapezoidal rule into a cumulative sum, after which
+        the loss and duration of each event are differences of cumulative sums. The means of each event are
+        float32 means over the rows of the event.
+
         :param data: data produced by the power_alarms function
         :param ips_alarm: set to True if alarm was caused by IPS system
         :return: a structure containing the starts and stops and losses formatted as [starttime stoptime powerloss]
@@ -1004,79 +1257,88 @@ class AEPcounter:
         if datalen > 0:
             # calculate the times when the alarm changes on and off
             # numpy.diff calculates array[n+1] - array[n]
-            alarm_diff = np.diff(data[:, 1])
+            alarm_diff = np.diff(data[:, 1].astype(float))
             # pad a zero to the beginning, unless data[0] is an alarm
             if data[0,1] != 0.0:
                 alarm_diff = np.hstack((np.array(1), alarm_diff))
             else:
                 alarm_diff = np.hstack((np.array(0), alarm_diff))
 
+            # now icing starts at rows where diff > 0 and stops at rows where diff < 0
+            start_indexes = np.nonzero(alarm_diff > 0)[0]
+            stop_indexes = np.nonzero(alarm_diff < 0)[0]
+            num_events = min(len(start_indexes), len(stop_indexes))
+            start_indexes = start_indexes[:num_events]
+            stop_indexes = stop_indexes[:num_events]
+
+            timestamps = self.timestamp_array(data[:, 0])
+            # step durations in hours
+            step_durations = np.diff(timestamps) / np.timedelta64(1, 'h')
+            reference_power = data[:, 3].astype(float)
+            power = data[:, 5].astype(float)
+            losses = reference_power - power
+            # integrate the losses using trapezoidal rule, if either end of a step is np.nan the step adds zero
+            valid_steps = ~(np.isnan(losses[:-1]) | np.isnan(losses[1:]))
+            loss_steps = np.where(valid_steps, step_durations * ((losses[:-1] + losses[1:]) / 2.0), 0.0)
+            loss_sums = self.prefix_sums(loss_steps)
+            event_losses = loss_sums[stop_indexes] - loss_sums[start_indexes]
+            if ips_alarm and (self.heating_power_index >= 0):
+                ips_power = data[:, 7].astype(float)
+                ips_steps = np.where(valid_steps, step_durations * ((ips_power[:-1] + ips_power[1:]) / 2.0), 0.0)
+                ips_sums = self.prefix_sums(ips_steps)
+                # a nan in the heating power makes the sum of that event nan, but not of the others
+                ips_nans = self.prefix_sums(np.isnan(ips_steps).astype(float))
+                event_ips = np.where(ips_nans[stop_indexes] > ips_nans[start_indexes], np.nan,
+                                     ips_sums[stop_indexes] - ips_sums[start_indexes])
+            else:
+                event_ips = np.zeros(num_events)
+            event_lengths = (timestamps[stop_indexes] - timestamps[start_indexes]) / np.timedelta64(1, 'h')
+            power_32 = data[:, 5].astype(np.float32)
+            reference_power_32 = data[:, 3].astype(np.float32)
+            mean_power_drops = self.range_nanmeans(reference_power_32 - power_32, start_indexes, stop_indexes)
+            mean_powers = self.range_nanmeans(power_32, start_indexes, stop_indexes)
+            mean_reference_powers = self.range_nanmeans(reference_power_32, start_indexes, stop_indexes)
+            mean_wind_speeds = self.range_nanmeans(data[:, 2].astype(np.float32), start_indexes, stop_indexes)
+            mean_temperatures = self.range_nanmeans(data[:, 4].astype(np.float32), start_indexes, stop_indexes)
+
+            for index in range(num_events):
+                starttime = data[start_indexes[index], 0]
+                stoptime = data[stop_indexes[index], 0]
+                try:
+                    if starttime > stoptime:
+                        raise TimingError(starttime, stoptime, index)
+                except TimingError as e:
+                    print("Start after stop at index {0} in {1}".format(e.index, self.id))
+                    print("start: {0}; stop: {1}".format(e.start.strftime(e.dateformat), e.stop.strftime(e.dateformat)))
+                    continue
+                event = (starttime, stoptime, event_losses[index], event_lengths[index], mean_power_drops[index],
+                         mean_powers[index], mean_reference_powers[index], mean_wind_speeds[index], mean_temperatures[index])
+                if ips_alarm:
+                    event = event + (event_ips[index],)
+                alarm_stats.append(event)
 
-            # now icing starts at times when diff == 1 and stops when diff == -1
-            starts = data[alarm_diff > 0, 0]
-            stops = data[alarm_diff < 0, 0]
-
-            num_starts = len(starts)
-            num_stops = len(stops)
+        return np.array(alarm_stats, dtype=object)
 
-            max_index = min((num_starts, num_stops))
-            index = 0
+    def event_indexes(self, alarm_timings=None, stop_timings=None, over_timings=None, status_timings=None, ice_timings=None, ips_timings=None):
+        """
+        build sorted interval indexes of the events returned by power_loss_during_alarm for time queries, e.g.
 
-            # sort starts and stops into an array
-            try:
-                while (index < max_index) and (datalen > 0):
-                    try:
-                        starttime = starts[index]
-                        stoptime = stops[index]
-                        if starttime > stoptime:
-                            raise TimingError(starttime,stoptime,index)
-
-                        # pull thecorresponding start and stoptimes from real data
-                        start_index = np.argmin(np.abs(data[:, 0]-starttime))
-                        stop_index = np.argmin(np.abs(data[:, 0]-stoptime))
-
-                        loss_sum = 0
-                        ips_sum = 0
-                        for i in range(start_index, stop_index, 1):
-                            # step duration in hours
-                            step_duration = (data[i+1, 0]-data[i, 0]).total_seconds()/60.0/60.0
-                            loss_at_start = data[i, 3]-data[i, 5]
-                            loss_at_stop = data[i+1, 3]-data[i+1, 5]
-                            # if either of these is np.nan add a zero to the loss sum
-                            if np.isnan(loss_at_start) or np.isnan(loss_at_stop):
-                                loss_sum += 0.0
-                                if ips_alarm:
-                                    ips_sum += 0
-                            else:
-                                # integrate the losses using trapezoidal rule
-                                loss_sum += step_duration * ((loss_at_start + loss_at_stop)/2.0)
-                                if ips_alarm:
-                                    ips_sum += step_duration * ((data[i,7] + data[i+1,7])/2.0)
-                        mean_power_drop = np.nanmean(data[start_index:stop_index,3].astype(np.float32)-data[start_index:stop_index,5].astype(np.float32))
-                        mean_power = np.nanmean(data[start_index:stop_index,5].astype(np.float32))
-                        mean_reference_power = np.nanmean(data[start_index:stop_index,3].astype(np.float32))
-                        mean_wind_speed = np.nanmean(data[start_index:stop_index,2].astype(np.float32))
-                        mean_temperature = np.nanmean(data[start_index:stop_index,4].astype(np.float32))
-                        event_length = (data[stop_index,0]- data[start_index,0]).total_seconds()/60.0/60.0
-                        #alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature))
-                        if ips_alarm:
-                            if self.heating_power_index < 0:
-                                alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature ,0.0))
-                            else:
-                                alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature,ips_sum))
-                        else:
-                            alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature))
-                    except TimingError as e:
-                        import pdb;pdb.set_trace()
-                        print("Start after stop at index {0} in {1}".format(e.index, self.id))
-                        print("start: {0}; stop: {1}".format(e.start.strftime(e.dateformat), e.stop.strftime(e.dateformat)))
-                    index += 1
-            except IndexError:
-                print("out of bounds at index: {0}".format(index))
-                print("num starts: {0}; num stops: {1}".format(num_starts, num_stops))
+            indexes = aepc.event_indexes(alarm_timings=alarm_timings, stop_timings=stop_timings)
+            indexes['stops'].in_event(t)
+            indexes['losses'].loss_between(t1, t2)
 
+        categories are named after the event files: losses, stops, over, status, ice_det and ips.
+        categories given as None are left out.
 
-        return np.array(alarm_stats, dtype=object)
+        :return: OrderedDict of category name: EventIndex
+        """
+        categories = [('losses', alarm_timings), ('stops', stop_timings), ('over', over_timings),
+                      ('status', status_timings), ('ice_det', ice_timings), ('ips', ips_timings)]
+        indexes = collections.OrderedDict()
+        for category, timings in categories:
+            if timings is not None:
+                indexes[category] = EventIndex.from_timings(timings)
+        return indexes
 
     def air_density_correction(self, data):
         """
@@ -1160,31 +1422,30 @@ class AEPcounter:
         :param power_curve: power curve array used
         :return: filtered data with stops flagged
         """
-        filtered_data = []
         stop_limit = self.stop_level * self.rated_power
         # [timestamp, alarm, wind speed, reference power, temperature, power]
         pow_alarms = self.power_alarms(data, power_curve, False) # do time filtering only once
-        for index, line in enumerate(pow_alarms):
-            # if (line[1] == 1) and (line[5] <= stop_limit) and (line[3] >= stop_limit):
-            #     line[1] = 2.0
+        if len(pow_alarms) == 0:
+            return pow_alarms
+        power = pow_alarms[:, 5].astype(float)
+        reference_power = pow_alarms[:, 3].astype(float)
+        # nans evaluate as False
+        with np.errstate(invalid='ignore'):
             # power level filter is here to avoid double classifying points to two different classes
-            if (line[1] == 1) and (line[5] <= (self.rated_power * self.power_level_filter_limit)):
-            # change this to look forward so tha tif the turbine will stop within a window of mark also the points where we
-            # are above the stop limit to belonging into the stop
-                stops = 0
-                for i in range(index, min(len(pow_alarms), index+self.stop_time)):
-                    templine = pow_alarms[i, :]
-                    if (templine[5] <= stop_limit) and (templine[3] >= stop_limit):
-                        stops += 1
-                if stops > 0:
-                    line[1] = 2.0
-                else:
-                    line[1] = 0
-            else:
-                line[1] = 0
-            filtered_data.append(line)
-
-        time_filtered_data = self.timefilter_ice_alarms(np.array(filtered_data), self.stop_time)
+            candidates = (pow_alarms[:, 1].astype(float) == 1) & (power <= (self.rated_power * self.power_level_filter_limit))
+            stopped = (power <= stop_limit) & (reference_power >= stop_limit)
+        # look forward so that if the turbine will stop within a window of stop_time samples, mark also the points
+        # where we are above the stop limit to belong into the stop
+        stop_counts = self.prefix_sums(stopped.astype(float))
+        window_starts = np.arange(len(pow_alarms))
+        window_stops = np.minimum(window_starts + self.stop_time, len(pow_alarms))
+        stops_in_window = stop_counts[window_stops] - stop_counts[window_starts]
+        # the rows without a stop are integer zeros, as written to the alarm files
+        alarms = np.zeros(len(pow_alarms), dtype=object)
+        alarms[candidates & (stops_in_window > 0)] = 2.0
+        pow_alarms[:, 1] = alarms
+
+        time_filtered_data = self.timefilter_ice_alarms(pow_alarms, self.stop_time)
         return time_filtered_data
 
     def status_code_stops(self, data, power_curves, filter_type="stop"):
@@ -1195,62 +1456,48 @@ class AEPcounter:
         :param data: input data to be processed
         :return [timestamp, alarm, wind speed, reference power, temperature, power, limit]:
         """
-        output = []
-        for line in data:
-            flag = False
-            # for item in self.ice_stop_index:
-            #     if line[item] in self.stopcodes:
-            #         flag = True
-            if filter_type == 'stop':
-                # if (self.stop_filter_type == 2 and line[self.status_stop_index] not in self.stopcodes) or \
-                #         (self.stop_filter_type == 1 and line[self.status_stop_index] in self.stopcodes):
-                #     flag = True
-                if self.stop_filter_type == 2:
-                    flag = any([line[i] not in self.stopcodes for i in self.status_stop_index])
-                elif self.stop_filter_type == 1:
-                    flag = any([line[i] in self.stopcodes for i in self.status_stop_index])
-                else:
-                    pass
-            elif filter_type == 'ips':
-                # if (self.heating_status_type == 2 and line[self.heating_status_index] != self.heating_status_value) or \
-                #         (self.heating_status_type == 1 and line[self.heating_status_index] == self.heating_status_value):
-                #     flag=True
-                if self.heating_status_type == 2:
-                    flag = any([line[i] not in self.heating_status_value for i in self.heating_status_index])
-                elif self.heating_status_type == 1:
-                    flag = any([line[i] in self.heating_status_value for i in self.heating_status_index])
-                else:
-                    pass
-            elif filter_type == 'icing':
-                if line[self.ice_alarm_index] == self.ice_alarm_value:
-                    flag = True
-            output_line =[]
-            output_line.append(line[self.ts_index]) # 0
-            if flag:
-                if filter_type == 'stop':
-                    output_line.append(4.0)
-                elif filter_type == 'ips':
-                    output_line.append(5.0)
-                elif filter_type == 'icing':
-                    output_line.append(6.0)
+        datalen = len(data)
+        if datalen == 0:
+            return np.array([])
+        flags = np.zeros(datalen, dtype=bool)
+        if filter_type == 'stop':
+            stop_flags = np.array([np.isin(data[:, i].astype(float), self.stopcodes) for i in self.status_stop_index])
+            if self.stop_filter_type == 2:
+                flags = (~stop_flags).any(axis=0)
+            elif self.stop_filter_type == 1:
+                flags = stop_flags.any(axis=0)
+            alarm_value = 4.0
+        elif filter_type == 'ips':
+            heating_flags = np.array([np.isin(data[:, i].astype(float), self.heating_status_value) for i in self.heating_status_index])
+            if self.heating_status_type == 2:
+                flags = (~heating_flags).any(axis=0)
+            elif self.heating_status_type == 1:
+                flags = heating_flags.any(axis=0)
+            alarm_value = 5.0
+        elif filter_type == 'icing':
+            flags = data[:, self.ice_alarm_index].astype(float) == self.ice_alarm_value
+            alarm_value = 6.0
+        else:
+            alarm_value = 0.0
+        if filter_type == 'ips':
+            output = np.empty((datalen, 8), dtype=object)
+            if self.heating_power_index < 0:
+                output[:, 7] = 0.0
             else:
-                output_line.append(0.0) # 1
-            output_line.append(line[self.ws_index]) # 2
-            # pick index of active direction bin
-            dirbin = np.argmin(np.abs(line[self.wd_index] - self.direction_bins))
-            int_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 3])
-            int_pow = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 2])
-            output_line.append(int_pow) # 3
-            output_line.append(line[self.temp_index]) # 4
-            output_line.append(line[self.pow_index]) # 5
-            output_line.append(int_lim) # 6
-            if filter_type == 'ips':
-                if self.heating_power_index < 0:
-                    output_line.append(0.0)
-                else:
-                    output_line.append(line[self.heating_power_index]) # 7
-            output.append(np.array(output_line))
-        return np.array(output)
+                output[:, 7] = data[:, self.heating_power_index]  # 7
+        else:
+            output = np.empty((datalen, 7), dtype=object)
+        # pick index of active direction bin
+        dirbins = self.direction_bin_indexes(data[:, self.wd_index].astype(float))
+        wind_speeds = data[:, self.ws_index].astype(float)
+        output[:, 0] = data[:, self.ts_index]  # 0
+        output[:, 1] = np.where(flags, alarm_value, 0.0)  # 1
+        output[:, 2] = data[:, self.ws_index]  # 2
+        output[:, 3] = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 2)  # 3
+        output[:, 4] = data[:, self.temp_index]  # 4
+        output[:, 5] = data[:, self.pow_index]  # 5
+        output[:, 6] = self.interpolate_power_curve(wind_speeds, dirbins, power_curves, 3)  # 6
+        return output
 
     def combine_timeseries(self, pow_alms1,stops,pow_alms2):
         """
@@ -1269,14 +1516,103 @@ class AEPcounter:
         """
 
         # stops timeseries longer because it uses different source data
-
-        common_indexes1 = [index1 for index1, line1 in enumerate(stops) if line1[0] in pow_alms1[:,0]]
-        common_indexes2 = [index2 for index2, line2 in enumerate(stops) if line2[0] in pow_alms2[:,0]]
-        combined_ts = stops
-        combined_ts[common_indexes1,1] += pow_alms1[:,1]
-        combined_ts[common_indexes2,1] += pow_alms2[:,1]
+        # the alarm values are joined to it on the timestamps
+        combined_ts = np.array(stops, copy=True)
+        if len(combined_ts) == 0:
+            return combined_ts
+        for alarms in (pow_alms1, pow_alms2):
+            rows, matched = self.join_timestamps(combined_ts, alarms)
+            combined_ts[rows, 1] = combined_ts[rows, 1].astype(float) + alarms[matched, 1].astype(float)
         return combined_ts
 
+    def join_timestamps(self, series, other):
+        """
+        match the rows of two time series on their timestamps with a sorted merge on int64 timestamps, O(n log n)
+
+        :param series: time series with the timestamps at index 0
+        :param other: time series joined to series, timestamps at index 0
+        :return: rows of series and mask of the rows of other that have a matching timestamp, in the order of other
+        """
+        if (len(series) == 0) or (len(other) == 0):
+            return np.array([], dtype=int), np.zeros(len(other), dtype=bool)
+        timestamps = self.timestamp_array(series[:, 0]).astype(np.int64)
+        order = np.argsort(timestamps, kind='stable')
+        sorted_timestamps = timestamps[order]
+        other_timestamps = self.timestamp_array(other[:, 0]).astype(np.int64)
+        positions = np.minimum(np.searchsorted(sorted_timestamps, other_timestamps), len(sorted_timestamps) - 1)
+        matched = sorted_timestamps[positions] == other_timestamps
+        return order[positions[matched]], matched
+
+    def classify_timeseries(self, pow_alms1, stops, pow_alms2):
+        """
+        classify every sample of the combined alarm time series into one ice case
+
+        combine_timeseries sums the alarm values, so a power loss sample that is also a stop sums to 3 like
+        overproduction. Here a stop takes precedence over a power loss
+
+        0 = no alarm
+        1 = power loss
+        2 = stop
+        3 = overproduction
+
+        :param pow_alms1: power alarms as returned by power_alarms
+        :param stops: stops as returned by find_icing_related_stops
+        :param pow_alms2: overproduction alarms as returned by power_alarms with over=True
+        :return: array of [timestamp, class] on the timestamps of stops, same rows as combine_timeseries
+        """
+        if len(stops) == 0:
+            return np.array([])
+        classes = np.zeros(len(stops), dtype=int)
+        for alarms, alarm_value in ((pow_alms1, 1), (pow_alms2, 3)):
+            rows, matched = self.join_timestamps(stops, alarms)
+            flagged = alarms[matched, 1].astype(float) == alarm_value
+            classes[rows[flagged]] = alarm_value
+        classes[stops[:, 1].astype(float) == 2] = 2
+        classification = np.empty((len(stops), 2), dtype=object)
+        classification[:, 0] = stops[:, 0]
+        classification[:, 1] = classes
+        return classification
+
+
+    def nearest_rows(self, sorted_timestamps, times):
+        """
+        find the index of the nearest timestamp for each of times, ties go to the earlier timestamp
+
+        :param sorted_timestamps: sorted timestamps as datetime64
+        :param times: searched times as datetime64
+        :return: array of indexes into sorted_timestamps
+        """
+        positions = np.clip(np.searchsorted(sorted_timestamps, times), 1, len(sorted_timestamps) - 1)
+        earlier = sorted_timestamps[positions - 1]
+        later = sorted_timestamps[positions]
+        nearest = np.where((times - earlier) <= (later - times), positions - 1, positions)
+        if len(sorted_timestamps) == 1:
+            nearest = np.zeros(len(times), dtype=int)
+        return nearest
+
+    def removal_mask(self, data, *timings):
+        """
+        mark the rows of data that fall inside any of the events listed in timings
+        an event covers the rows from the row nearest to the event start up to, but not including, the row nearest
+        to the event stop
+
+        :param data: original dataset, sorted by timestamp
+        :param timings: any number of arrays containing the incident starts and stops as returned by power_loss_during_alarm
+        :return: boolean array, True for the rows inside events
+        """
+        datalen = len(data)
+        event_edges = np.zeros(datalen + 1)
+        if datalen > 0:
+            timestamps = self.timestamp_array(data[:, self.ts_index])
+            for event_timings in timings:
+                if (event_timings is None) or (len(event_timings) == 0):
+                    continue
+                start_rows = self.nearest_rows(timestamps, self.timestamp_array(event_timings[:, 0]))
+                stop_rows = self.nearest_rows(timestamps, self.timestamp_array(event_timings[:, 1]))
+                valid = start_rows < stop_rows
+                np.add.at(event_edges, start_rows[valid], 1)
+                np.add.at(event_edges, stop_rows[valid], -1)
+        return np.cumsum(event_edges[:-1]) > 0
 
     def define_removable_indexes(self,data,timings):
         """
@@ -1284,16 +1620,9 @@ class AEPcounter:
 
         :param data: original dataset
         :param timings: array containg the incident starts and stops
-        :return: indexes that can be used to filter the original data, a list of ranges
+        :return: indexes that can be used to filter the original data
         """
-        removed_indexes = []
-        for event in timings:
-            event_start = event[0]
-            event_stop = event[1]
-            event_start_index = np.fromiter(map(datetime.timedelta.total_seconds,np.abs(data[:,self.ts_index]-event_start)),dtype='float').argmin()
-            event_stop_index = np.fromiter(map(datetime.timedelta.total_seconds,np.abs(data[:,self.ts_index]-event_stop)),dtype='float').argmin()
-            removed_indexes.extend(list(range(event_start_index,event_stop_index,1)))
-        return removed_indexes
+        return np.nonzero(self.removal_mask(data, timings))[0]
 
     def increase_reference_dataset(self, data, stop_timings, alarm_timings, over_timings):
         """
@@ -1305,17 +1634,56 @@ class AEPcounter:
         :param over_timigns: overproduction incidents from the data
         :return: new reference dataset
         """
-        stop_removal = self.define_removable_indexes(data,stop_timings)
-        alarm_removal = self.define_removable_indexes(data,alarm_timings)
-        over_removal = self.define_removable_indexes(data,over_timings)
-        removed_indexes = [*stop_removal,*alarm_removal,*over_removal]
-        new_ref = []
-        for index,line in enumerate(data):
-            if index not in removed_indexes:
-                new_ref.append(line)
-        return np.array(new_ref)
-
-
+        return data[~self.removal_mask(data, stop_timings, alarm_timings, over_timings), :]
+
+    def reference_events(self, power_level_filtered_data, state_filtered_data, pc):
+        """
+        calculate the icing events that are removed from the reference dataset during refinement
+
+        :param power_level_filtered_data: data used for power alarms
+        :param state_filtered_data: data used for stop detection
+        :param pc: power curve
+        :return: stop timings, alarm timings and overproduction timings
+        """
+        stop_timings = self.power_loss_during_alarm(self.find_icing_related_stops(state_filtered_data, pc))
+        alarm_timings = self.power_loss_during_alarm(self.power_alarms(power_level_filtered_data, pc))
+        over_timings = self.power_loss_during_alarm(self.power_alarms(power_level_filtered_data, pc, over=True))
+        return stop_timings, alarm_timings, over_timings
+
+    def refine_reference_dataset(self, candidate_data, power_level_filtered_data, state_filtered_data, pc, max_iterations=None):
+        """
+        Iteratively refine the reference dataset.
+
+        Starting from power curve pc, the icing events are calculated and all data inside them is removed from
+        candidate_data, which becomes the new reference dataset. A new power curve is then calculated from it.
+        This is repeated until the set of icing events does not change or max_iterations is reached.
+
+        :param candidate_data: data the reference dataset is chosen from, usually state and power level filtered data
+                               without the temperature filter
+        :param power_level_filtered_data: data used for power alarms
+        :param state_filtered_data: data used for stop detection
+        :param pc: initial power curve
+        :param max_iterations: maximum number of refinement rounds, defaults to self.reference_iterations
+        :return: new reference dataset, new power curve, number of iterations, True if the event set converged
+        """
+        if max_iterations is None:
+            max_iterations = self.reference_iterations
+        reference_data = candidate_data
+        events = self.reference_events(power_level_filtered_data, state_filtered_data, pc)
+        event_keys = [self.timestamp_array(timings[:, :2]) if len(timings) > 0 else None for timings in events]
+        iterations = 0
+        converged = False
+        while (iterations < max_iterations) and not converged:
+            iterations += 1
+            reference_data = self.increase_reference_dataset(candidate_data, *events)
+            pc = self.count_power_curves(reference_data)
+            events = self.reference_events(power_level_filtered_data, state_filtered_data, pc)
+            new_event_keys = [self.timestamp_array(timings[:, :2]) if len(timings) > 0 else None for timings in events]
+            converged = all((old is None and new is None) or
+                            (old is not None and new is not None and np.array_equal(old, new))
+                            for old, new in zip(event_keys, new_event_keys))
+            event_keys = new_event_keys
+        return reference_data, pc, iterations, converged
 
     def one_year_month_sums(self, data, wanted_year, index):
         """
@@ -1336,111 +1704,364 @@ class AEPcounter:
         return np.array(dated_sums)
 
 
-    def calculate_production_stats(self, data, pc, ice_alarms, ice_stops, status_stops, ips_on, ice_detection):
+    def calendar_keys(self, timestamps, granularity='month'):
         """
-        Calculates month-by-month statistics from the data.
+        calculate an integer calendar period key for each timestamp
+
+        granularities:
+
+            * month: months since 1970-01
+            * day: days since 1970-01-01
+            * week: day number of the monday starting the ISO week
+            * season: starting year of the icing season from October to April, -1 for timestamps from May to September
+
+        :param timestamps: timestamps as datetime64
+        :param granularity: one of 'month', 'day', 'week' or 'season'
+        :return: array of period keys
+        """
+        months = timestamps.astype('datetime64[M]').astype(np.int64)
+        if granularity == 'month':
+            return months
+        elif granularity == 'season':
+            years = months // 12 + 1970
+            month_of_year = months % 12 + 1
+            return np.where(month_of_year >= 10, years, np.where(month_of_year <= 4, years - 1, -1))
+        days = timestamps.astype('datetime64[D]').astype(np.int64)
+        if granularity == 'day':
+            return days
+        elif granularity == 'week':
+            # 1970-01-01 was a thursday
+            return days - (days + 3) % 7
+        else:
+            raise ValueError("unknown calendar granularity: {0}".format(granularity))
+
+    def period_start(self, key, granularity='month'):
+        """
+        first moment of the calendar period defined by a key from calendar_keys
+
+        :param key: calendar key
+        :param granularity: granularity used to calculate the key
+        :return: start of the period as datetime.datetime
+        """
+        if granularity == 'month':
+            return datetime.datetime(1970 + int(key) // 12, int(key) % 12 + 1, 1)
+        elif granularity == 'season':
+            return datetime.datetime(int(key), 10, 1)
+        else:
+            return datetime.datetime.combine(np.datetime64(int(key), 'D').astype(datetime.date), datetime.time())
+
+    def rollup(self, periods, series, granularity='month'):
+        """
+        sum any number of time series into calendar periods in one pass
+
+        :param periods: sorted array of calendar keys of the periods in the output
+        :param series: list of (timestamps, values) pairs, timestamps as datetime64, each series can have its own timestamps
+        :param granularity: calendar granularity, see calendar_keys
+        :return: array of sums with one row per period and one column per series,
+                 values outside the listed periods are ignored
+        """
+        num_periods = len(periods)
+        positions = []
+        weights = []
+        for column, (timestamps, values) in enumerate(series):
+            keys = self.calendar_keys(timestamps, granularity)
+            position = np.searchsorted(periods, keys)
+            in_periods = position < num_periods
+            in_periods[in_periods] = periods[position[in_periods]] == keys[in_periods]
+            positions.append(position[in_periods] + column * num_periods)
+            weights.append(np.asarray(values, dtype=float)[in_periods])
+        if num_periods == 0:
+            return np.zeros((0, len(series)))
+        sums = np.bincount(np.concatenate(positions), weights=np.concatenate(weights),
+                           minlength=num_periods * len(series))
+        return sums.reshape((len(series), num_periods)).T
+
+    def production_step_series(self, data, pc, ice_alarms, ice_stops, status_stops, ips_on, ice_detection):
+        """
+        Calculates the step by step production time series that are summed into production statistics.
+
+        Missing series (no status stops, no IPS or no IPS power measurement) are returned as zeros
 
         :param data: input data used to asses production
         :param pc: power curve used to calculate theoretical production
         :param ice_alarms: time series of icing alarms
         :param ice_stops: time series of icing induced stops
         :param status_stops: time series of stops as indicated by a statuscode in the scada
-        :param ips_on: toggle if IPS is available or not
+        :param ips_on: time series of IPS operation, None if there is no IPS
         :param ice_detection: timeseries of icing events as detected by an ice detector
-        :return:
-        """
-
-        power_reference = self.theoretical_output_power(data,pc)
-        theoretical_production = self.calculate_production(power_reference,1)
-        actual_production = self.calculate_production(power_reference,2)
-        #pow_alarms.append((line[0], pow_alrm, line[self.ws_index], int_pow, line[self.temp_index], line[self.pow_index], int_lim))
-        iced_power_drop_events = ice_alarms[ice_alarms[:,1] == 1.0, :]
-        # iced_power_drops = np.hstack((iced_power_drop_events[:,0], iced_power_drop_events[:,3]-iced_power_drop_events[:,5]))
-        iced_power_drops_power = np.c_[iced_power_drop_events[:,0], iced_power_drop_events[:,3]-iced_power_drop_events[:,5]]
-        iced_power_drops = self.calculate_production(iced_power_drops_power,1)
-        ice_stop_events = ice_stops[ice_stops[:,1] == 2.0]
-        # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
-        iced_stops_power = np.c_[ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]]
-        iced_stops = self.calculate_production(iced_stops_power,1)
-        # status
-        if status_stops is not None:
-            status_stop_events = status_stops[status_stops[:, 1] == 4.0]
-            # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
-            status_stops_power = np.c_[status_stop_events[:,0], status_stop_events[:,3]-status_stop_events[:,5]]
-            status_stops_prod = self.calculate_production(status_stops_power,1)
-        else:
-            status_stop_events = None
-            status_stops_power = None
-            status_stops_prod = None
-
+        :return: OrderedDict of series name: (timestamps as datetime64, production of each step)
+        """
+
+        def event_production(events, alarm_value):
+            # production lost during the flagged samples, reference - actual
+            if len(events) == 0:
+                return np.array([], dtype='datetime64[us]'), np.array([])
+            flagged = events[events[:, 1] == alarm_value, :]
+            if len(flagged) < 2:
+                return np.array([], dtype='datetime64[us]'), np.array([])
+            timestamps, step_production, cumulative_production = self.production_index(np.c_[flagged[:, 0], flagged[:, 3] - flagged[:, 5]], 1)
+            return timestamps[1:], step_production
+
+        def step_production(source, index):
+            if len(source) < 2:
+                return np.array([], dtype='datetime64[us]'), np.array([])
+            timestamps, production, cumulative_production = self.production_index(source, index)
+            return timestamps[1:], production
+
+        no_series = (np.array([], dtype='datetime64[us]'), np.array([]))
+        power_reference = self.theoretical_output_power(data, pc)
+        series = collections.OrderedDict()
+        series['theoretical'] = step_production(power_reference, 1)
+        series['actual'] = step_production(power_reference, 2)
+        series['ice alarms'] = event_production(ice_alarms, 1.0)
+        series['ice stops'] = event_production(ice_stops, 2.0)
+        series['status stops'] = event_production(status_stops, 4.0) if status_stops is not None else no_series
         ##############
         # IPS section
         ##############
         if ips_on is not None: # If there is no icing section IPS statistics are not calculated
-            ips_stop_events = ips_on[ips_on[:, 1] == 5.0]
-            # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
-            ips_on_power = np.c_[ips_stop_events[:,0], ips_stop_events[:,3]-ips_stop_events[:,5]]
-            ips_on_prod = self.calculate_production(ips_on_power,1)
-            ice_detection_events = ice_detection[ice_detection[:, 1] == 6.0]
-
-            #ips consumption
+            series['ips on'] = event_production(ips_on, 5.0)
+            series['ice detection'] = event_production(ice_detection, 6.0) if ice_detection is not None else no_series
             if self.heating_power_index < 0:
-                ips_self_consumption = 0.0
+                series['ips consumption'] = no_series
             else:
-                ips_self_consumption = self.calculate_production(data,self.heating_power_index)
-
-            # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
-            ice_detection_power = np.c_[ice_detection_events[:, 0], ice_detection_events[:, 3] - ice_detection_events[:, 5]]
-            ice_detection_prod = self.calculate_production(ice_detection_power, 1)
+                series['ips consumption'] = step_production(data, self.heating_power_index)
+        else:
+            print("Dummy IPS Values")
+            series['ips on'] = no_series
+            series['ice detection'] = no_series
+            series['ips consumption'] = no_series
+        return series
 
-        # print(iced_power_drops)
-        years = set([point[0].year for point in data])
-        production_statistics = []
-        for year in years:
-            theoretical_production_sums = self.one_year_month_sums(theoretical_production,year,1)
-            actual_production_sums = self.one_year_month_sums(actual_production,year,1)
-            iced_power_sums = self.one_year_month_sums(iced_power_drops,year,1)
-            ice_stop_sums = self.one_year_month_sums(iced_stops,year,1)
-            if status_stops is not None:
-                status_stop_sums = self.one_year_month_sums(status_stops_prod,year,1)
-            else:
-                status_stop_sums = np.copy(theoretical_production_sums)
-                status_stop_sums[:, 1] = 0.0
+    def calculate_production_stats(self, data, pc, ice_alarms, ice_stops, status_stops, ips_on, ice_detection, granularity='month', series=None):
+        """
+        Calculates month-by-month statistics from the data.
+        Other calendar periods can be selected with granularity: 'day', 'week' or 'season' (October to April)
 
-            if ips_on is not None:
-                ips_on_sums = self.one_year_month_sums(ips_on_prod,year,1)
-                ice_detection_sums = self.one_year_month_sums(ice_detection_prod, year,1)
-                ips_consumption_sums = self.one_year_month_sums(ips_self_consumption,year,1)
-            else:
-                print("Dummy IPS Values")
-                ips_on_sums = np.copy(theoretical_production_sums)
-                ips_on_sums[:,1] = 0.0
-                ice_detection_sums = ips_on_sums
-                ips_self_consumption = 0.0
-            for index, stat_month in enumerate(theoretical_production_sums):
-                # if theoretical_production_sums[index,0] == actual_production_sums[index,0]:
-                ice_loss = iced_power_sums[index,1] + ice_stop_sums[index,1] + ips_on_sums[index,1] + ice_detection_sums[index,1]
-                if theoretical_production_sums[index,1] == 0.0:
-                    reldiff = 0.0
-                    total_icediff = 0.0
-                    icediff = 0.0
-                    stopdiff = 0.0
-                    statusdiff = 0.0
-                    ipsdiff = 0.0
-                    iddiff = 0.0
-                else:
-                    reldiff = (theoretical_production_sums[index, 1] - actual_production_sums[index,1])/theoretical_production_sums[index, 1]
-                    icediff = (theoretical_production_sums[index, 1] - iced_power_sums[index,1])/theoretical_production_sums[index, 1]
-                    stopdiff = (theoretical_production_sums[index, 1] - ice_stop_sums[index,1])/theoretical_production_sums[index, 1]
-                    statusdiff = (theoretical_production_sums[index, 1] - status_stop_sums[index,1])/theoretical_production_sums[index, 1]
-                    ipsdiff = (theoretical_production_sums[index, 1] - ips_on_sums[index,1])/theoretical_production_sums[index, 1]
-                    iddiff = (theoretical_production_sums[index, 1] - ice_detection_sums[index,1])/theoretical_production_sums[index, 1]
-                    total_icediff = (theoretical_production_sums[index, 1] - ice_loss)/theoretical_production_sums[index, 1]
-                production_statistics.append(
-                    [theoretical_production_sums[index, 0], theoretical_production_sums[index, 1],
-                     actual_production_sums[index, 1],
-                     theoretical_production_sums[index, 1] - actual_production_sums[index, 1], reldiff,
-                     iced_power_sums[index, 1], icediff, ice_stop_sums[index, 1], stopdiff, status_stop_sums[index, 1],
-                     statusdiff, ips_on_sums[index,1], ipsdiff, ice_detection_sums[index, 1], iddiff,ice_loss, total_icediff, ips_consumption_sums[index,1]])
-        return np.array(production_statistics)
+        For monthly statistics all months of every year in data are listed, for other granularities only the periods
+        that contain data.
 
+        :param data: input data used to asses production
+        :param pc: power curve used to calculate theoretical production
+        :param ice_alarms: time series of icing alarms
+        :param ice_stops: time series of icing induced stops
+        :param status_stops: time series of stops as indicated by a statuscode in the scada
+        :param ips_on: toggle if IPS is available or not
+        :param ice_detection: timeseries of icing events as detected by an ice detector
+        :param granularity: calendar period used in the statistics, see calendar_keys
+        :param series: precalculated result of production_step_series, calculated if not given
+        :return:
+        """
+        if series is None:
+            series = self.production_step_series(data, pc, ice_alarms, ice_stops, status_stops, ips_on, ice_detection)
+        data_keys = self.calendar_keys(self.timestamp_array(data[:, 0]), granularity)
+        if granularity == 'month':
+            years = np.unique(data_keys // 12)
+            periods = (years[:, np.newaxis] * 12 + np.arange(12)).ravel()
+        else:
+            periods = np.unique(data_keys[data_keys >= 0])
+        sums = self.rollup(periods, list(series.values()), granularity)
+        (theoretical, actual, iced_power, ice_stop, status_stop, ips_on_sums, ice_detection_sums, ips_consumption) = sums.T
+        ice_loss = iced_power + ice_stop + ips_on_sums + ice_detection_sums
+        with np.errstate(invalid='ignore', divide='ignore'):
+            def relative(values):
+                return np.where(theoretical == 0.0, 0.0, (theoretical - values) / theoretical)
+            reldiff = relative(actual)
+            icediff = relative(iced_power)
+            stopdiff = relative(ice_stop)
+            statusdiff = relative(status_stop)
+            ipsdiff = relative(ips_on_sums)
+            iddiff = relative(ice_detection_sums)
+            total_icediff = relative(ice_loss)
+        production_statistics = []
+        for index, period in enumerate(periods):
+            production_statistics.append(
+                [self.period_start(period, granularity), theoretical[index], actual[index],
+                 theoretical[index] - actual[index], reldiff[index],
+                 iced_power[index], icediff[index], ice_stop[index], stopdiff[index], status_stop[index],
+                 statusdiff[index], ips_on_sums[index], ipsdiff[index], ice_detection_sums[index], iddiff[index],
+                 ice_loss[index], total_icediff[index], ips_consumption[index]])
+        return np.array(production_statistics, dtype=object)
+
+    def summary_values(self, data, reference_data, pc, alarm_timings, stop_timings, over_timings, status_timings, ice_timings, ips_timings, data_sizes):
+        """
+        Calculate summary statistics for the dataset. contains:
+            availability
+            data loss due to filtering
+            size of the reference dataset
+            hour counts for different ice classes
+            production losses due to different causes
+            Theoretical maximum production
+            observed production
+            losses due to all reasons
+
+        :param data: data used to calculate statistics
+        :param reference_data: the reference dataset used to calculate power curve
+        :param pc: power curve structure
+        :param alarm_timings: reduced power incidents
+        :param stop_timings: icing induced stops
+        :param over_timings: overproduction incidents
+        :param status_timings: status code stops
+        :param ice_timings: ice detector alarms
+        :param ips_timings: IPS operation
+        :param data_sizes: sizes after each filtering step
+        :return: OrderedDict of field name: (value, unit) in the order of the summary file
+        """
+        if self.starttimestamp == datetime.datetime.min:
+            start_time = data[0,self.ts_index]
+        else:
+            start_time = self.starttimestamp
+        if self.stoptimestamp == datetime.datetime.max:
+            stop_time = data[-1,self.ts_index]
+        else:
+            stop_time = self.stoptimestamp
+        data_period = (stop_time-start_time).total_seconds()/60.0/60.0
+        reference_start = reference_data[0,self.ts_index]
+        reference_stop = reference_data[-1,self.ts_index]
+        reference_data_period = (reference_stop-reference_start).total_seconds()/60.0/60.0
+        step_size = data[1, self.ts_index] - data[0, self.ts_index]
+        #check for empty array (no stops)
+        if np.shape(stop_timings) == (0,):
+            stop_losses = 0.0
+            stop_duration = 0.0
+        else:
+            stop_losses  = np.nansum(stop_timings[:, 2])
+            stop_duration = np.nansum(stop_timings[:, 3])
+        # check for empty
+        if np.shape(alarm_timings) == (0,):
+            icing_loss_production = 0.0
+            icing_duration = 0.0
+        else:
+            icing_loss_production = np.nansum(alarm_timings[:, 2])
+            icing_duration = np.nansum(alarm_timings[:, 3])
+        # check for empty
+        if np.shape(over_timings) == (0,):
+            over_prod_duration = 0.0
+        else:
+            over_prod_duration = np.nansum(over_timings[:, 3])
+        # check for empty
+        if (np.shape(status_timings) == (0,)) or (status_timings is None):
+            status_stop_duration = 0.0
+            status_stop_loss = 0.0
+        else:
+            status_stop_loss = np.nansum(status_timings[:, 2])
+            status_stop_duration = np.nansum(status_timings[:, 3])
+        if (np.shape(ice_timings) == (0,)) or (ice_timings is None):
+            ice_detection_duration = 0.0
+            ice_detection_loss = 0.0
+        else:
+            ice_detection_loss = np.nansum(ice_timings[:, 2])
+            ice_detection_duration = np.nansum(ice_timings[:, 3])
+        if (np.shape(ips_timings) == (0,)) or (ips_timings is None):
+            ips_on_duration = 0.0
+            ips_on_production_loss = 0.0
+            ips_self_consumption = 0.0
+        else:
+            ips_on_production_loss = np.nansum(ips_timings[:,2])
+            ips_on_duration = np.nansum(ips_timings[:,3])
+            ips_self_consumption = np.nansum(ips_timings[:,4])
+
+        uncertainty = self.power_curve_uncertainty_average(pc)
+
+        tmax_power = self.theoretical_output_power(data, pc)
+        if np.shape(tmax_power) == (0,):
+            theoretical_production_sum = 0.0
+            actual_production_sum = 0.0
+            min_production_sum = 0.0
+            max_production_sum = 0.0
+            total_losses = 0.0
+            energy_based_avail = 0.0
+            icing_loss_perc = 0.0
+            stop_loss_perc = 0.0
+            icing_duration_perc = 0.0
+            stop_duration_perc = 0.0
+            over_prod_duration_perc = 0.0
+            technical_availability = 0.0
+            status_stop_loss_perc = 0.0
+            ice_detection_duration_perc = 0.0
+            ice_detection_loss_perc = 0.0
+            ips_on_duration_perc = 0.0
+            ips_on_loss_perc = 0.0
+            ips_self_consumption_perc = 0.0
+            production_upper_limit = 0.0
+            production_lower_limit = 0.0
+            production_p10_limit = 0.0
+            production_p90_limit = 0.0
+        else:
+            (theoretical_production_sum, actual_production_sum, production_sum_p10, production_sum_p90,
+             min_production_sum, max_production_sum) = self.production_totals(tmax_power, [1, 2, 3, 4, 5, 6])
+            production_upper_limit = max_production_sum / theoretical_production_sum * 100.0
+            production_lower_limit = min_production_sum / theoretical_production_sum * 100.0
+            production_p10_limit = production_sum_p10 / theoretical_production_sum * 100.0
+            production_p90_limit = production_sum_p90 / theoretical_production_sum * 100.0
+            total_losses = theoretical_production_sum - actual_production_sum
+            energy_based_avail = 100.0 - ((total_losses/theoretical_production_sum) * 100.0)
+            icing_loss_perc = (icing_loss_production/actual_production_sum) * 100.0
+            stop_loss_perc = (stop_losses/actual_production_sum) * 100.0
+            status_stop_loss_perc = (status_stop_loss/actual_production_sum) * 100.0
+            icing_duration_perc = (icing_duration / data_period) * 100.0
+            stop_duration_perc = (stop_duration / data_period) * 100.0
+            over_prod_duration_perc = (over_prod_duration / data_period) * 100.0
+            technical_availability = ((data_period - status_stop_duration) / data_period) * 100.0
+            ice_detection_duration_perc = (ice_detection_duration / data_period) * 100.0
+            ice_detection_loss_perc = (ice_detection_loss / actual_production_sum) * 100.0
+            ips_on_duration_perc = (ips_on_duration / data_period) * 100.0
+            ips_on_loss_perc = (ips_on_production_loss / actual_production_sum) * 100.0
+            ips_self_consumption_perc = (ips_self_consumption / actual_production_sum) * 100.0
+        # availability = self.count_availability(data) * 100.0
+        availability = data_sizes[0] / ((stop_time - start_time) / step_size) * 100.0
+
+        filtered_data_size = (data_sizes[1]/data_sizes[0]) * 100.0
+        reference_data_size = (data_sizes[2]/data_sizes[0]) * 100.0
+
+        values = collections.OrderedDict()
+        values['Dataset name'] = (self.id, ' ')
+        values['Production losses due to icing'] = (icing_loss_production, 'kWh')
+        values['Relative production losses due to icing'] = (icing_loss_perc, '%')
+        values['Losses due to icing related stops'] = (stop_losses, 'kWh')
+        values['Relative losses due to icing related stops'] = (stop_loss_perc, '%')
+        values['Icing during production'] = (icing_duration, 'h')
+        values['Icing during production (% of total data)'] = (icing_duration_perc, '%')
+        values['Turbine stopped during production'] = (stop_duration, 'h')
+        values['Turbine stopped production (% of total data)'] = (stop_duration_perc, '%')
+        values['Over production hours'] = (over_prod_duration, 'h')
+        values['Over production hours (% of total)'] = (over_prod_duration_perc, '%')
+        if self.heated_site:
+            values['IPS on hours'] = (ips_on_duration, 'h')
+            values['IPS on hours (% of total)'] = (ips_on_duration_perc, '%')
+            values['Losses during IPS operation'] = (ips_on_production_loss, 'kWh')
+            values['Relative losses during IPS operation'] = (ips_on_loss_perc, '%')
+        if self.ice_detection:
+            values['Ice detector icing hours'] = (ice_detection_duration, 'h')
+            values['Ice detector icing hours (% of total data)'] = (ice_detection_duration_perc, '%')
+            values['Losses during ice detector alarms'] = (ice_detection_loss, 'h')
+            values['Relative losses during ice detector alarm (% of total data)'] = (ice_detection_loss_perc, 'h')
+        if self.heating_power_index >= 0:
+            values['IPS self consumption'] = (ips_self_consumption, 'kWh')
+            values['IPS self consumption (% of total)'] = (ips_self_consumption_perc, '%')
+        values['SCADA forced stops'] = (status_stop_duration, 'h')
+        values['Time Based Availability (TBA)'] = (technical_availability, '%')
+        values['Loss during SCADA stops'] = (status_stop_loss, 'kWh')
+        values['Relative losses during SCADA stops (% of total)'] = (status_stop_loss_perc, '%')
+        values['Power curve uncertainty'] = (uncertainty, '%')
+        values['Production upper limit (std.dev)'] = (production_upper_limit, '%')
+        values['Production lower limit (std.dev)'] = (production_lower_limit, '%')
+        values['Production P90'] = (production_p90_limit, '%')
+        values['Production P10'] = (production_p10_limit, '%')
+        values['Theoretical mean production'] = (theoretical_production_sum, 'kWh')
+        values['Observed power production'] = (actual_production_sum, 'kWh')
+        values['Total Losses'] = (total_losses, 'kWh')
+        values['Energy Based Availability (EBA)'] = (energy_based_avail, '%')
+        values['Data start time'] = (start_time.strftime("%Y-%m-%d %H:%M:%S"), ' ')
+        values['Data stop time'] = (stop_time.strftime("%Y-%m-%d %H:%M:%S"), ' ')
+        values['Total amount of data'] = (data_period, 'h')
+        values['Reference data start time'] = (reference_start.strftime("%Y-%m-%d %H:%M:%S"), ' ')
+        values['Reference data stop time'] = (reference_stop.strftime("%Y-%m-%d %H:%M:%S"), ' ')
+        values['Total amount of data in reference dataset'] = (reference_data_period, 'h')
+        values['Data availability'] = (availability, '%')
+        values['Sample count in original data'] = (data_sizes[0], ' ')
+        values['Sample count in after filtering'] = (data_sizes[1], ' ')
+        values['Data size after filtering'] = (filtered_data_size, '%')
+        values['Sample count in reference data'] = (data_sizes[2], ' ')
+        values['Reference dataset as % of original data'] = (reference_data_size, '%')
+        return values
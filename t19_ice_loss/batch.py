@@ -0,0 +1,548 @@
+"""
+Batched processing of a farm of identical turbines with data on a common time grid
+
+The data of all the turbines is given as one float array of shape (turbines, time, columns), every turbine in
+the column layout of its .ini file. The filtering, air density correction, power curve binning and the alarm,
+stop and status code flags are calculated for all the turbines at once: the filters are boolean masks over
+(turbine x time), and the rows each stage works on are the rows of all turbines one after the other, with the
+turbine boundaries taken into account wherever neighbouring rows matter. Only the power curve statistics of each
+bin and the interpolation from each turbine's own power curve are done turbine by turbine.
+
+The results are handed to the normal pipeline of each turbine, so the event timings, summaries and result files
+are calculated and written exactly as in a single turbine run ::
+
+    results = analyse_batch(timestamps, values, run_configs)
+    for result in results:
+        result.write()
+
+or for the turbines of a wide farm file, see t19_ice_loss.farm ::
+
+    python -m t19_ice_loss.batch T1.ini T2.ini T3.ini
+
+The turbines need the same processing settings, only the id, data file, farm columns and the Output section
+can differ. With reference iterations set, only the power curve of the initial reference dataset is batched.
+"""
+
+import argparse
+import datetime
+import sys
+
+import numpy as np
+
+from .aep_counter import AEPcounter
+from .data_file_handler import CSVimporter
+from .farm import read_farm_file, write_fault_codes
+from .pipeline import turbine_pipeline
+from .run import RunResult
+
+# settings that may differ between the turbines of a batch
+TURBINE_SETTINGS = {'source', 'config', 'id', 'filename', 'farm_columns', 'result_dir', 'summaryfile_write', 'pc_plot_picture',
+                    'alarm_time_series_file_write', 'filtered_raw_data_write', 'icing_events_write', 'power_curve_write',
+                    'daily_stats_write', 'weekly_stats_write', 'seasonal_stats_write', 'event_index_write', 'output_workers',
+                    'plot_mode', 'plot_point_budget', 'profile_write'}
+# rows handled at once when binning, limits the size of the (rows x bins) distance arrays
+BINNING_CHUNK = 65536
+
+
+def check_identical_turbines(run_configs):
+    """
+    raise ValueError if the processing settings of the turbines differ
+
+    :param run_configs: RunConfig of each turbine
+    """
+    reference = run_configs[0]
+    for run_config in run_configs[1:]:
+        for name, value in vars(reference).items():
+            if name in TURBINE_SETTINGS:
+                continue
+            other = getattr(run_config, name, None)
+            if isinstance(value, np.ndarray) or isinstance(other, np.ndarray):
+                same = np.array_equal(value, other)
+            else:
+                same = value == other
+            if not same:
+                raise ValueError("{0} of {1} differs from {2}, a batch needs turbines with the same settings".format(
+                    name, run_config.source, reference.source))
+
+
+class RowSet:
+    """
+    selected rows of all turbines, turbine after turbine and in time order within each turbine
+    """
+    def __init__(self, mask):
+        """
+        :param mask: boolean array (turbines, time), True for the selected rows
+        """
+        self.turbines, self.times = np.nonzero(mask)
+        counts = np.bincount(self.turbines, minlength=mask.shape[0])
+        self.offsets = np.zeros(mask.shape[0] + 1, dtype=int)
+        np.cumsum(counts, out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.times)
+
+    def turbine_slice(self, turbine):
+        return slice(self.offsets[turbine], self.offsets[turbine + 1])
+
+    def same_turbine_steps(self):
+        """
+        :return: True for each step between two consecutive rows of the same turbine
+        """
+        return self.turbines[1:] == self.turbines[:-1]
+
+    def segment_ends(self):
+        """
+        :return: index one past the last row of the turbine of each row
+        """
+        return self.offsets[self.turbines + 1]
+
+
+class BatchAEPcounter(AEPcounter):
+    """
+    AEPcounter for many turbines at once, with the settings of one turbine
+
+    The batch methods take the timestamps of the common time grid and the float array of shape
+    (turbines, time, columns), and return masks or flat arrays over the rows of a RowSet.
+    """
+    def batch_air_density_correction(self, values):
+        """
+        air density corrected wind speeds, same as air_density_correction
+
+        :param values: data array (turbines, time, columns)
+        :return: copy of values with the corrected wind speeds
+        """
+        temp_std = 288.15
+        kelvin = 273.15
+        corrected = values.copy()
+        pressure_factor = (1 - self.site_elevation * 2.2557e-5) ** 5.25588
+        density_correction = (temp_std / (values[:, :, self.temp_index] + kelvin)) * pressure_factor
+        # the cube root is taken per distinct value with the same scalar operation as the single turbine version,
+        # the vectorized power can differ from it in the last bit
+        unique_corrections, inverse = np.unique(density_correction, return_inverse=True)
+        roots = np.array([np.abs(correction) ** (1 / 3) for correction in unique_corrections])
+        signs = np.sign(density_correction)
+        wind_speeds = values[:, :, self.ws_index] * signs * roots[inverse.reshape(density_correction.shape)]
+        corrected[:, :, self.ws_index] = np.where(np.isnan(density_correction), np.nan, wind_speeds)
+        return corrected
+
+    def batch_time_mask(self, timestamps):
+        starttime = np.datetime64(self.starttimestamp, 'us') if self.starttimestamp != datetime.datetime.min else None
+        stoptime = np.datetime64(self.stoptimestamp, 'us') if self.stoptimestamp != datetime.datetime.max else None
+        mask = np.ones(len(timestamps), dtype=bool)
+        if starttime is not None:
+            mask &= timestamps >= starttime
+        if stoptime is not None:
+            mask &= timestamps < stoptime
+        return mask
+
+    def batch_state_mask(self, values):
+        """
+        :return: (turbines, time) mask of the rows state_filter_data keeps
+        """
+        checks = np.ones(values.shape[:2], dtype=bool)
+        with np.errstate(invalid='ignore'):
+            for normal_state_index, value_index in enumerate(self.state_index):
+                if self.state_filter_type == 3:
+                    checks &= values[:, :, value_index] >= self.normal_state[normal_state_index]
+                elif self.state_filter_type == 4:
+                    checks &= values[:, :, value_index] <= self.normal_state[normal_state_index]
+                else:
+                    checks &= values[:, :, value_index] == self.normal_state[normal_state_index]
+        if self.state_filter_type == 2:
+            return ~checks
+        return checks
+
+    def batch_power_level_mask(self, values):
+        with np.errstate(invalid='ignore'):
+            return values[:, :, self.pow_index] >= (self.power_level_filter_limit * self.rated_power)
+
+    def batch_temperature_mask(self, values):
+        with np.errstate(invalid='ignore'):
+            return values[:, :, self.temp_index] >= self.reference_temperature_limit
+
+    def batch_bins(self, wind_speeds, directions):
+        """
+        wind speed and direction bin of each row, same as put_data_into_bins
+        """
+        speed_bins = np.empty(len(wind_speeds), dtype=int)
+        direction_bins = np.empty(len(directions), dtype=int)
+        bin_x = np.cos(np.radians(self.direction_bins))
+        bin_y = np.sin(np.radians(self.direction_bins))
+        for start in range(0, len(wind_speeds), BINNING_CHUNK):
+            chunk = slice(start, start + BINNING_CHUNK)
+            speed_bins[chunk] = np.abs(wind_speeds[chunk, np.newaxis] - self.wind_bins).argmin(axis=1)
+            x = np.cos(np.radians(directions[chunk]))[:, np.newaxis]
+            y = np.sin(np.radians(directions[chunk]))[:, np.newaxis]
+            direction_bins[chunk] = np.sqrt((x - bin_x) ** 2 + (y - bin_y) ** 2).argmin(axis=1)
+        return speed_bins, direction_bins
+
+    def batch_power_curves(self, values, mask):
+        """
+        power curves of every turbine from its reference rows, same as count_power_curves
+
+        :param values: air density corrected data array (turbines, time, columns)
+        :param mask: (turbines, time) mask of the reference data rows
+        :return: list of power curve arrays, one per turbine
+        """
+        rows = RowSet(mask)
+        wind_speeds = values[rows.turbines, rows.times, self.ws_index]
+        directions = values[rows.turbines, rows.times, self.wd_index]
+        power = values[rows.turbines, rows.times, self.pow_index]
+        speed_bins, direction_bins = self.batch_bins(wind_speeds, directions)
+        speed_count, direction_count = len(self.wind_bins), len(self.direction_bins)
+        keys = (rows.turbines * speed_count + speed_bins) * direction_count + direction_bins
+        # stable sort keeps the rows of each bin in time order, as in the single turbine version
+        order = np.argsort(keys, kind='stable')
+        bounds = np.searchsorted(keys[order], np.arange(mask.shape[0] * speed_count * direction_count + 1))
+        wind_speeds, directions, power = wind_speeds[order], directions[order], power[order]
+        power_curves = []
+        for turbine in range(mask.shape[0]):
+            pc = np.zeros((speed_count, direction_count, 10))
+            for speed_bin_index in range(speed_count):
+                for direction_bin_index in range(direction_count):
+                    key = (turbine * speed_count + speed_bin_index) * direction_count + direction_bin_index
+                    in_bin = slice(bounds[key], bounds[key + 1])
+                    self.power_curve_bin(pc, speed_bin_index, direction_bin_index, wind_speeds[in_bin], directions[in_bin], power[in_bin])
+            power_curves.append(self.finish_power_curves(pc))
+        return power_curves
+
+    def batch_time_filter(self, alarms, rows, window):
+        """
+        remove alarm runs shorter than window, same as timefilter_ice_alarms for each turbine
+
+        :param alarms: alarm values over the rows, changed in place
+        :param rows: RowSet of the alarms
+        :param window: required number of consecutive alarms
+        :return: alarms
+        """
+        flagged = alarms != 0
+        same_turbine = rows.same_turbine_steps()
+        previous = np.zeros(len(rows), dtype=bool)
+        previous[1:] = flagged[:-1] & same_turbine
+        following = np.zeros(len(rows), dtype=bool)
+        following[:-1] = flagged[1:] & same_turbine
+        run_starts = np.nonzero(flagged & ~previous)[0]
+        run_stops = np.nonzero(flagged & ~following)[0] + 1
+        segment_starts = rows.offsets[rows.turbines[run_starts]]
+        segment_lengths = rows.segment_ends()[run_starts] - segment_starts
+        # runs starting within the last window rows of a turbine are left as they are
+        short = ((run_starts - segment_starts) < (segment_lengths - window)) & ((run_stops - run_starts) < window)
+        changes = np.zeros(len(rows) + 1, dtype=int)
+        np.add.at(changes, run_starts[short], 1)
+        np.add.at(changes, run_stops[short], -1)
+        alarms[np.cumsum(changes[:-1]) > 0] = 0
+        return alarms
+
+    def batch_interpolate(self, rows, wind_speeds, directions, power_curves, variable_index):
+        """
+        interpolate a power curve variable for every row from the power curve of its turbine
+        """
+        result = np.full(len(rows), np.nan)
+        for turbine, power_curve in enumerate(power_curves):
+            in_turbine = rows.turbine_slice(turbine)
+            if in_turbine.start == in_turbine.stop:
+                continue
+            dirbins = self.direction_bin_indexes(directions[in_turbine])
+            result[in_turbine] = self.interpolate_power_curve(wind_speeds[in_turbine], dirbins, power_curve, variable_index)
+        return result
+
+    def batch_power_alarms(self, timestamps, values, mask, power_curves, time_filter=True, over=False):
+        """
+        power alarms of every turbine, same as power_alarms
+
+        :param timestamps: datetime64[us] timestamps of the time grid
+        :param values: air density corrected data array (turbines, time, columns)
+        :param mask: (turbines, time) mask of the input data rows
+        :param power_curves: list of power curves, one per turbine
+        :return: RowSet and dict of flat columns: alarm, wind speed, reference power, temperature, power, limit
+        """
+        timed = np.timedelta64(601, 's')
+        rows = RowSet(mask)
+        row_times = timestamps[rows.times]
+        step_ok = (np.diff(row_times) < timed) & rows.same_turbine_steps()
+        continuous = np.zeros(len(rows), dtype=bool)
+        continuous[1:-1] = step_ok[:-1] & step_ok[1:]
+        wind_speeds = values[rows.turbines, rows.times, self.ws_index]
+        directions = values[rows.turbines, rows.times, self.wd_index]
+        power = values[rows.turbines, rows.times, self.pow_index]
+        temperature = values[rows.turbines, rows.times, self.temp_index]
+        limit = self.batch_interpolate(rows, wind_speeds, directions, power_curves, 4 if over else 3)
+        reference_power = self.batch_interpolate(rows, wind_speeds, directions, power_curves, 2)
+        with np.errstate(invalid='ignore'):
+            cold = temperature <= self.icing_temperature_limit
+            if over:
+                flagged = continuous & (power >= limit) & cold
+                alarm_value = 3.0
+            else:
+                flagged = continuous & (power <= limit) & cold
+                alarm_value = 1.0
+        # object column as in power_alarms, the time filter zeroes alarms with integer zeros
+        alarms = np.where(flagged, alarm_value, 0.0).astype(object)
+        if time_filter:
+            self.batch_time_filter(alarms, rows, self.icing_time)
+        return rows, {'alarm': alarms, 'wind speed': wind_speeds, 'reference power': reference_power, 'temperature': temperature,
+                      'power': power, 'limit': limit}
+
+    def batch_icing_related_stops(self, timestamps, values, mask, power_curves):
+        """
+        icing related stops of every turbine, same as find_icing_related_stops
+        """
+        rows, columns = self.batch_power_alarms(timestamps, values, mask, power_curves, False)
+        stop_limit = self.stop_level * self.rated_power
+        power = columns['power']
+        with np.errstate(invalid='ignore'):
+            candidates = (columns['alarm'] == 1) & (power <= (self.rated_power * self.power_level_filter_limit))
+            stopped = (power <= stop_limit) & (columns['reference power'] >= stop_limit)
+        # stops within stop_time rows of the same turbine
+        stop_counts = self.prefix_sums(stopped.astype(float))
+        window_starts = np.arange(len(rows))
+        window_stops = np.minimum(window_starts + self.stop_time, rows.segment_ends())
+        stops_in_window = stop_counts[window_stops] - stop_counts[window_starts]
+        # integer zeros for the rows without a stop, as in find_icing_related_stops
+        columns['alarm'] = np.zeros(len(rows), dtype=object)
+        columns['alarm'][candidates & (stops_in_window > 0)] = 2.0
+        self.batch_time_filter(columns['alarm'], rows, self.stop_time)
+        return rows, columns
+
+    def batch_status_code_stops(self, timestamps, values, mask, power_curves, filter_type='stop'):
+        """
+        status code flags of every turbine, same as status_code_stops
+        """
+        rows = RowSet(mask)
+        row_values = values[rows.turbines, rows.times, :]
+        flags = np.zeros(len(rows), dtype=bool)
+        if filter_type == 'stop':
+            stop_flags = np.array([np.isin(row_values[:, i], self.stopcodes) for i in self.status_stop_index])
+            if self.stop_filter_type == 2:
+                flags = (~stop_flags).any(axis=0)
+            elif self.stop_filter_type == 1:
+                flags = stop_flags.any(axis=0)
+            alarm_value = 4.0
+        elif filter_type == 'ips':
+            heating_flags = np.array([np.isin(row_values[:, i], self.heating_status_value) for i in self.heating_status_index])
+            if self.heating_status_type == 2:
+                flags = (~heating_flags).any(axis=0)
+            elif self.heating_status_type == 1:
+                flags = heating_flags.any(axis=0)
+            alarm_value = 5.0
+        elif filter_type == 'icing':
+            flags = row_values[:, self.ice_alarm_index] == self.ice_alarm_value
+            alarm_value = 6.0
+        else:
+            alarm_value = 0.0
+        wind_speeds = row_values[:, self.ws_index]
+        directions = row_values[:, self.wd_index]
+        columns = {'alarm': np.where(flags, alarm_value, 0.0), 'wind speed': wind_speeds,
+                   'reference power': self.batch_interpolate(rows, wind_speeds, directions, power_curves, 2),
+                   'temperature': row_values[:, self.temp_index], 'power': row_values[:, self.pow_index],
+                   'limit': self.batch_interpolate(rows, wind_speeds, directions, power_curves, 3)}
+        if filter_type == 'ips':
+            if self.heating_power_index < 0:
+                columns['heating power'] = np.zeros(len(rows))
+            else:
+                columns['heating power'] = row_values[:, self.heating_power_index]
+        return rows, columns
+
+
+def alarm_array(timestamps, rows, columns, turbine, aepc=None):
+    """
+    alarms of one turbine in the format of AEPcounter.power_alarms,
+    [timestamp, alarm, wind speed, reference power, temperature, power, limit (, heating power)]
+
+    :param aepc: TurbineAEPcounter to remember the timestamps of the array in
+    """
+    in_turbine = rows.turbine_slice(turbine)
+    names = ['alarm', 'wind speed', 'reference power', 'temperature', 'power', 'limit']
+    if 'heating power' in columns:
+        names.append('heating power')
+    if in_turbine.start == in_turbine.stop:
+        return np.array([])
+    output = np.empty((in_turbine.stop - in_turbine.start, len(names) + 1), dtype=object)
+    turbine_timestamps = timestamps[rows.times[in_turbine]]
+    output[:, 0] = turbine_timestamps.astype(object)
+    for column, name in enumerate(names, 1):
+        output[:, column] = columns[name][in_turbine]
+    if aepc is not None:
+        aepc.remember_timestamps(output, 0, turbine_timestamps)
+    return output
+
+
+class TurbineAEPcounter(AEPcounter):
+    """
+    AEPcounter of one turbine of a batch
+
+    The data and alarm arrays made from the batch remember their datetime64 timestamps, so the stages of the turbine
+    don't convert the datetime.datetime timestamp columns back to datetime64 again and again.
+    """
+    def __init__(self):
+        super().__init__()
+        self.known_timestamps = {}
+
+    def remember_timestamps(self, data, ts_index, timestamps):
+        """
+        :param data: object array made from the batch
+        :param ts_index: timestamp column of data
+        :param timestamps: datetime64[us] timestamps of the rows of data
+        :return: data
+        """
+        # the array is kept with its timestamps so that its id can't be reused by another array meanwhile
+        self.known_timestamps[id(data)] = (data, ts_index, timestamps)
+        return data
+
+    def __getstate__(self):
+        # the arrays are not sent along, a copy of the counter converts the timestamps of its data itself
+        state = super().__getstate__()
+        state['known_timestamps'] = {}
+        return state
+
+    def timestamp_array(self, timestamps):
+        if isinstance(timestamps, np.ndarray) and (timestamps.base is not None):
+            known = self.known_timestamps.get(id(timestamps.base))
+            if (known is not None) and (known[0] is timestamps.base):
+                data, ts_index, known_timestamps = known
+                column = data[:, ts_index]
+                if (timestamps.shape == column.shape) and (timestamps.strides == column.strides) and \
+                        (timestamps.__array_interface__['data'][0] == column.__array_interface__['data'][0]):
+                    return known_timestamps.copy()
+        return super().timestamp_array(timestamps)
+
+    def theoretical_output_power(self, data, power_curves):
+        reference = super().theoretical_output_power(data, power_curves)
+        known = self.known_timestamps.get(id(data))
+        if (len(reference) > 0) and (known is not None) and (known[0] is data):
+            # the reference power has the rows of data within the start and stop times, see time_filter_data
+            timestamps = known[2]
+            in_time = (timestamps >= np.datetime64(self.starttimestamp, 'us')) & (timestamps < np.datetime64(self.stoptimestamp, 'us'))
+            self.remember_timestamps(reference, 0, timestamps[in_time])
+        return reference
+
+
+def data_array(timestamps, values, ts_index, rows=None, aepc=None):
+    """
+    data of one turbine in the format of CSVimporter.full_data
+
+    :param values: data array (time, columns) of the turbine
+    :param rows: mask of the wanted rows, all rows by default
+    :param aepc: TurbineAEPcounter to remember the timestamps of the array in
+    """
+    if rows is not None:
+        timestamps = timestamps[rows]
+        values = values[rows]
+    data = values.astype(object)
+    data[:, ts_index] = timestamps.astype(object)
+    if aepc is not None:
+        aepc.remember_timestamps(data, ts_index, timestamps)
+    return data
+
+
+def analyse_batch(timestamps, values, run_configs, headers=None, fault_dict=None):
+    """
+    analyse a farm of identical turbines at once
+
+    :param timestamps: timestamps of the common time grid, sorted and unique, as datetime64 or datetime.datetime
+    :param values: float array (turbines, time, columns), each turbine in the column layout of its configuration,
+                   textual fault codes replaced with the numbers of fault_dict. The timestamp column is not used
+    :param run_configs: RunConfig of each turbine, see check_identical_turbines
+    :param headers: column names of each turbine, used when writing the filtered raw data
+    :param fault_dict: textual fault code: number used in the data, needed if replace fault codes is set
+    :return: list of RunResult, one per turbine
+    """
+    check_identical_turbines(run_configs)
+    timestamps = np.asarray(timestamps).astype('datetime64[us]')
+    values = np.asarray(values, dtype=float)
+    if (values.ndim != 3) or (values.shape[0] != len(run_configs)) or (values.shape[1] != len(timestamps)):
+        raise ValueError("values need to have the shape (turbines, time, columns), got {0} for {1} turbines and {2} timestamps".format(
+            values.shape, len(run_configs), len(timestamps)))
+    settings = run_configs[0]
+    if settings.replace_faults and (fault_dict is None):
+        raise ValueError("replace fault codes is set, fault_dict with the codes used in values is needed")
+
+    counter = BatchAEPcounter()
+    if settings.replace_faults:
+        counter.fault_dict = dict(fault_dict)
+    counter.set_options_from_config(settings)
+
+    corrected = counter.batch_air_density_correction(values)
+    time_mask = np.broadcast_to(counter.batch_time_mask(timestamps), values.shape[:2])
+    state_mask = counter.batch_state_mask(corrected)
+    power_level_mask = counter.batch_power_level_mask(corrected)
+    masks = {'time limited data': time_mask,
+             'state filtered data': time_mask & state_mask,
+             'power level filtered data': time_mask & state_mask & power_level_mask,
+             'state reference data': state_mask,
+             'initial reference data': state_mask & counter.batch_temperature_mask(corrected) & power_level_mask}
+    power_curves = counter.batch_power_curves(corrected, masks['initial reference data'])
+
+    alarms = {}
+    if counter.reference_iterations == 0:
+        # the final power curve is the initial one, so the alarms can be batched as well
+        alarms['power alarms'] = counter.batch_power_alarms(timestamps, corrected, masks['power level filtered data'], power_curves)
+        alarms['over production alarms'] = counter.batch_power_alarms(timestamps, corrected, masks['power level filtered data'], power_curves, over=True)
+        if counter.stop_filter_type in (0, 1, 2):
+            alarms['stops'] = counter.batch_icing_related_stops(timestamps, corrected, masks['state filtered data'], power_curves)
+        if counter.stop_filter_type in (1, 2):
+            alarms['status stops'] = counter.batch_status_code_stops(timestamps, corrected, time_mask, power_curves)
+        if counter.heated_site:
+            alarms['ips on flags'] = counter.batch_status_code_stops(timestamps, corrected, time_mask, power_curves, filter_type='ips')
+        if counter.ice_detection:
+            alarms['ice detected'] = counter.batch_status_code_stops(timestamps, corrected, time_mask, power_curves, filter_type='icing')
+
+    results = []
+    for turbine, run_config in enumerate(run_configs):
+        reader = CSVimporter()
+        reader.read_file_options_from_config(run_config)
+        reader.headers = list(headers[turbine]) if headers is not None else []
+        aepc = TurbineAEPcounter()
+        if run_config.replace_faults:
+            reader.fault_dict = dict(fault_dict)
+            aepc.fault_dict = reader.fault_dict
+        aepc.set_options_from_config(run_config)
+        pipeline = turbine_pipeline(reader, aepc)
+        # the object arrays of the data stages are made only if some later stage needs them
+        pipeline.replace_stage('data', lambda turbine=turbine, aepc=aepc: data_array(timestamps, values[turbine], settings.ts_index, aepc=aepc))
+        pipeline.replace_stage('corrected data', lambda turbine=turbine, aepc=aepc: data_array(timestamps, corrected[turbine], settings.ts_index, aepc=aepc))
+        for name, mask in masks.items():
+            pipeline.replace_stage(name, lambda turbine=turbine, aepc=aepc, mask=mask: data_array(timestamps, corrected[turbine], settings.ts_index,
+                                                                                                  mask[turbine], aepc))
+        pipeline.replace_stage('initial power curve', lambda turbine=turbine: power_curves[turbine])
+        for name, (rows, columns) in alarms.items():
+            pipeline.replace_stage(name, lambda turbine=turbine, aepc=aepc, rows=rows, columns=columns: alarm_array(timestamps, rows, columns, turbine, aepc))
+        results.append(RunResult(run_config, reader, aepc, pipeline))
+    return results
+
+
+def farm_block(run_configs):
+    """
+    read the farm file of the turbines once and stack their columns for analyse_batch
+
+    :param run_configs: RunConfigs of the turbines, all with the same farm file and farm_columns set
+    :return: timestamps, values (turbines, time, columns), headers of each turbine, fault_dict
+    """
+    timestamps, farm_values, columns, headers, fault_dict = read_farm_file(run_configs)
+    positions = dict((column, position) for position, column in enumerate(columns))
+    values = np.full((len(run_configs), len(timestamps), len(run_configs[0].farm_columns)), np.nan)
+    for turbine, run_config in enumerate(run_configs):
+        for index, column in enumerate(run_config.farm_columns):
+            if (index != run_config.ts_index) and (index not in run_config.skip_columns):
+                values[turbine, :, index] = farm_values[positions[column]]
+    turbine_headers = [[headers[column] if column < len(headers) else '' for column in run_config.farm_columns] for run_config in run_configs]
+    return timestamps, values, turbine_headers, fault_dict
+
+
+if __name__ == '__main__':
+    from .run_config import RunConfig
+
+    parser = argparse.ArgumentParser(description='analyse the turbines of a wide farm file as one batch')
+    parser.add_argument('configfiles', nargs='+', help='.ini files of the turbines, all with the same farm file and farm columns set')
+    args = parser.parse_args()
+
+    run_configs = [RunConfig.from_file(configfile) for configfile in args.configfiles]
+    if any(run_config.farm_columns is None for run_config in run_configs):
+        print("farm columns needs to be set for every turbine of a batch")
+        sys.exit(1)
+    timestamps, values, headers, fault_dict = farm_block(run_configs)
+    for result in analyse_batch(timestamps, values, run_configs, headers, fault_dict):
+        print("{0} : Processing dataset {1}".format(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), result.id))
+        if result.run_config.replace_faults:
+            write_fault_codes(result.run_config, fault_dict)
+        result.write()
@@ -1,11 +1,26 @@
-import matplotlib.pyplot as plt
-import matplotlib
 import datetime
 import csv
+import sys
 import numpy as np
 import json
-import configparser
 
+from .event_index import save_event_indexes
+from .run_config import RunConfig
+
+
+
+def load_pyplot(headless=True):
+    """
+    import matplotlib only when something is plotted, it is the slowest import of the package
+
+    :param headless: select the non-interactive Agg backend, unless pyplot has already been imported with another one
+    :return: matplotlib, matplotlib.pyplot
+    """
+    import matplotlib
+    if headless and ('matplotlib.pyplot' not in sys.modules):
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return matplotlib, plt
 
 
 class CSVimporter:
@@ -51,6 +66,30 @@ class CSVimporter:
         self.icing_events_write = False
         self.power_curve_write = True
 
+    def read_file_options_from_config(self, run_config):
+        """
+        set file options from a parsed configuration
+
+        :param run_config: RunConfig
+        """
+        self.id = run_config.id
+        self.filename = run_config.filename
+        self.delim = run_config.delim
+        self.quote_char = run_config.quote_char
+        self.dt_format = run_config.dt_format
+        self.dt_extra_char = run_config.dt_extra_char
+        self.fault_columns = list(run_config.fault_columns)
+        self.replace_faults = run_config.replace_faults
+        self.skip_columns = list(run_config.skip_columns)
+        self.result_dir = run_config.result_dir
+        self.summaryfile_write = run_config.summaryfile_write
+        self.pc_plot_picture = run_config.pc_plot_picture
+        self.alarm_time_series_file_write = run_config.alarm_time_series_file_write
+        self.filtered_raw_data_write = run_config.filtered_raw_data_write
+        self.icing_events_write = run_config.icing_events_write
+        self.power_curve_write = run_config.power_curve_write
+        self.timestamp_index = run_config.ts_index
+
     def read_file_options_from_file(self,config_filename):
         """
         set file options from a config file see the documentation for full listing of options
@@ -59,45 +98,7 @@ class CSVimporter:
 
         
         """
-        config = configparser.ConfigParser()
-        config.read(config_filename)
-        try:
-            self.id = config.get('Source file','id')
-            self.filename = config.get('Source file','filename')
-            delimiter = config.get('Source file','delimiter', fallback=',')
-            if delimiter == 'TAB':
-                self.delim = '\t'
-            else:
-                self.delim = delimiter
-            quot_char = config.get('Source file','quotechar', fallback=None)
-            if (quot_char is None) or (quot_char.upper() == 'NONE'):
-                self.quote_char = None
-            else:
-                self.quote_char = quot_char
-            self.dt_format = config.get('Source file','datetime format',raw = True, fallback='%Y-%m-%d %H:%M:%S')
-            self.dt_extra_char = int(config.get('Source file','datetime extra char', fallback=0))
-            fault_column_string = config.get('Source file','fault columns')
-            self.fault_columns = [int(column_index) for column_index in fault_column_string.split(',')]
-            self.replace_faults = config.getboolean('Source file','replace fault codes',fallback=False)
-            skip_column_string = config.get('Source file','Skip columns')
-            if skip_column_string == "NONE":
-                self.skip_columns = []
-            else:
-                self.skip_columns = [int(column_index) for column_index in skip_column_string.split(',')]
-            self.result_dir = config.get('Output','result directory',fallback='.')
-            self.summaryfile_write = config.getboolean('Output', 'summary', fallback=True)
-            self.pc_plot_picture = config.getboolean('Output', 'plot', fallback=True)
-            self.alarm_time_series_file_write = config.getboolean('Output', 'alarm time series', fallback=False)
-            self.filtered_raw_data_write = config.getboolean('Output', 'filtered raw data', fallback=False)
-            self.icing_events_write = config.getboolean('Output', 'icing events', fallback=False)
-            self.power_curve_write = config.getboolean('Output', 'power curve', fallback=True)
-            self.timestamp_index = int(config.get('Data Structure','timestamp index'))
-        except configparser.NoOptionError as missing_value:
-            print("missing config option: {0} in {1}".format(missing_value, config_filename))
-        except ValueError as wrong_value:
-            print("Wrong type of value in {0}: {1}".format(config_filename, wrong_value))
-
-        
+        self.read_file_options_from_config(RunConfig.from_file(config_filename))
 
     def create_new_faultcodes(self, column_num, write_to_file = False, outfilename = ''):
         """
@@ -253,7 +254,7 @@ class CSVimporter:
         full_data = []
         line_number = 1
         dataline = []
-        if self.replace_faults:
+        if self.replace_faults and not self.fault_dict:
             self.process_fault_codes()
             # print(self.fault_dict)
         while True:
@@ -321,7 +322,41 @@ class Result_file_writer():
         self.filtered_raw_data_write = False
         self.icing_events_write = False
         self.power_curve_write = True
-
+        self.daily_stats_write = False
+        self.weekly_stats_write = False
+        self.seasonal_stats_write = False
+        self.event_index_write = False
+        self.output_workers = 1
+        self.plot_mode = 'scatter'
+        self.plot_point_budget = 20000
+        self.power_curve_plot_max = 20
+        self.profile_write = False
+        self.profile_memory = False
+
+
+    def set_output_file_options_from_config(self, run_config):
+        """
+        set the options of the Output section from a parsed configuration. These are used to select what outputs will be written and what not
+
+        :param run_config: RunConfig
+        """
+        self.result_dir = run_config.result_dir
+        self.summaryfile_write = run_config.summaryfile_write
+        self.pc_plot_picture = run_config.pc_plot_picture
+        self.alarm_time_series_file_write = run_config.alarm_time_series_file_write
+        self.filtered_raw_data_write = run_config.filtered_raw_data_write
+        self.icing_events_write = run_config.icing_events_write
+        self.power_curve_write = run_config.power_curve_write
+        self.daily_stats_write = run_config.daily_stats_write
+        self.weekly_stats_write = run_config.weekly_stats_write
+        self.seasonal_stats_write = run_config.seasonal_stats_write
+        self.event_index_write = run_config.event_index_write
+        self.output_workers = run_config.output_workers
+        self.plot_mode = run_config.plot_mode
+        self.plot_point_budget = run_config.plot_point_budget
+        self.power_curve_plot_max = run_config.power_curve_plot_max
+        self.profile_write = run_config.profile_write
+        self.profile_memory = run_config.profile_memory
 
     def set_output_file_options(self, config_filename):
         """
@@ -329,21 +364,7 @@ class Result_file_writer():
 
         :param config_filename: Name of the config file used
         """
-        config = configparser.ConfigParser()
-        config.read(config_filename)
-        try:
-            self.result_dir = config.get('Output', 'result directory', fallback='./')
-            self.summaryfile_write = config.getboolean('Output', 'summary', fallback=True)
-            self.pc_plot_picture = config.getboolean('Output', 'plot', fallback=True)
-            self.alarm_time_series_file_write = config.getboolean('Output', 'alarm time series', fallback=False)
-            self.filtered_raw_data_write = config.getboolean('Output', 'filtered raw data', fallback=False)
-            self.icing_events_write = config.getboolean('Output', 'icing events', fallback=False)
-            self.power_curve_write = config.getboolean('Output', 'power curve', fallback=True)
-            self.power_curve_plot_max = int(config.get('Data Structure', 'maximum wind speed', fallback='20'))
-        except configparser.NoOptionError as missing_value:
-            print("missing config option: {0} in {1}".format(missing_value, config_filename))
-        except ValueError as wrong_value:
-            print("Wrong type of value in {0}: {1}".format(config_filename, wrong_value))
+        self.set_output_file_options_from_config(RunConfig.from_file(config_filename))
     
     def write_alarm_file(self, result_filepath, array):
         """
@@ -415,18 +436,24 @@ class Result_file_writer():
             return False, e
         
     
+    def write_event_indexes(self, aepc, indexes):
+        """
+        save the event indexes into <id>_events.npz, they can be read back with t19_ice_loss.event_index.load_event_indexes
+
+        :param aepc: active AEP counter
+        :param indexes: dictionary of category: EventIndex as returned by AEPcounter.event_indexes
+        :return: status of the write operation, filename, possible error
+        """
+        filename = aepc.result_dir + aepc.id + '_events.npz'
+        try:
+            save_event_indexes(filename, indexes)
+            return True, filename, ''
+        except IOError as e:
+            return False, filename, e
+
     def summary_statistics(self, aepc, data, reference_data, pc, alarm_timings, stop_timings, over_timings, status_timings, ice_timings, ips_timings, data_sizes):
         """
-        Calculate summary statistics for the dataset. contains:
-            availability
-            data loss due to filtering
-            size of the reference dataset
-            hour counts for different ice classes
-            production losses due to different causes
-            Theoretical maximum production
-            observed production
-            losses due to all reasons
-            Written to a file
+        Calculate summary statistics for the dataset and write them to a file, see AEPcounter.summary_values
     
         :param aepc: the active aeoc object
         :param data: data used to calculate statistics
@@ -439,210 +466,35 @@ class Result_file_writer():
         :return: status of the write operation, full filename ,possible error
         
         """
-        if aepc.starttimestamp == datetime.datetime.min:
-            start_time = data[0,aepc.ts_index]
-        else:
-            start_time = aepc.starttimestamp
-        if aepc.stoptimestamp == datetime.datetime.max:
-            stop_time = data[-1,aepc.ts_index]
-        else:
-            stop_time = aepc.stoptimestamp
-        data_period = (stop_time-start_time).total_seconds()/60.0/60.0
-        reference_start = reference_data[0,aepc.ts_index]
-        reference_stop = reference_data[-1,aepc.ts_index]
-        reference_data_period = (reference_stop-reference_start).total_seconds()/60.0/60.0
-        step_size = data[1, aepc.ts_index] - data[0, aepc.ts_index]
-        #check for empty array (no stops)
-        if np.shape(stop_timings) == (0,):
-            stop_losses = 0.0
-            stop_duration = 0.0
-        else:
-            stop_losses  = np.nansum(stop_timings[:, 2])
-            stop_duration = np.nansum(stop_timings[:, 3])        
-        # check for empty
-        if np.shape(alarm_timings) == (0,):
-            icing_loss_production = 0.0
-            icing_duration = 0.0
-        else:
-            icing_loss_production = np.nansum(alarm_timings[:, 2])
-            icing_duration = np.nansum(alarm_timings[:, 3])        
-        # check for empty
-        if np.shape(over_timings) == (0,):
-            over_prod_duration = 0.0
-        else:
-            over_prod_duration = np.nansum(over_timings[:, 3])        
-        # check for empty
-        if (np.shape(status_timings) == (0,)) or (status_timings is None):
-            status_stop_duration = 0.0
-            status_stop_loss = 0.0
-        else:
-            status_stop_loss = np.nansum(status_timings[:, 2])
-            status_stop_duration = np.nansum(status_timings[:, 3])
-        if (np.shape(ice_timings) == (0,)) or (ice_timings is None):
-            ice_detection_duration = 0.0
-            ice_detection_loss = 0.0
-        else:
-            ice_detection_loss = np.nansum(ice_timings[:, 2])
-            ice_detection_duration = np.nansum(ice_timings[:, 3])
-        if (np.shape(ips_timings) == (0,)) or (ips_timings is None):
-            ips_on_duration = 0.0
-            ips_on_production_loss = 0.0
-            ips_self_consumption = 0.0
-        else:
-            ips_on_production_loss = np.nansum(ips_timings[:,2])
-            ips_on_duration = np.nansum(ips_timings[:,3])
-            ips_self_consumption = np.nansum(ips_timings[:,4])
+        values = aepc.summary_values(data, reference_data, pc, alarm_timings, stop_timings, over_timings, status_timings, ice_timings, ips_timings, data_sizes)
+        return self.write_summary(aepc, values)
 
-        uncertainty = aepc.power_curve_uncertainty_average(pc)
-        
-        tmax_power = aepc.theoretical_output_power(data, pc)
-        if np.shape(tmax_power) == (0,):
-            theoretical_production_sum = 0.0
-            actual_production_sum = 0.0
-            min_production_sum = 0.0
-            max_production_sum = 0.0
-            total_losses = 0.0
-            energy_based_avail = 0.0
-            icing_loss_perc = 0.0
-            stop_loss_perc = 0.0
-            icing_duration_perc = 0.0
-            stop_duration_perc = 0.0
-            over_prod_duration_perc = 0.0
-            technical_availability = 0.0
-            status_stop_loss_perc = 0.0
-            ice_detection_duration_perc = 0.0
-            ice_detection_loss_perc = 0.0
-            ips_on_duration_perc = 0.0
-            ips_on_loss_perc = 0.0
-        else:
-            theoretical_production = aepc.calculate_production(tmax_power, 1)
-            actual_production = aepc.calculate_production(tmax_power, 2)
-            production_p10 = aepc.calculate_production(tmax_power, 3)
-            production_p90 = aepc.calculate_production(tmax_power, 4)
-            min_production = aepc.calculate_production(tmax_power, 5)
-            max_production = aepc.calculate_production(tmax_power, 6)
-            theoretical_production_sum = np.nansum(theoretical_production[:, 1])
-            actual_production_sum = np.nansum(actual_production[:, 1])
-            min_production_sum = np.nansum(min_production[:, 1])
-            max_production_sum = np.nansum(max_production[:, 1])
-            production_sum_p10 = np.nansum(production_p10[:, 1])
-            production_sum_p90 = np.nansum(production_p90[:, 1])
-            production_upper_limit = max_production_sum / theoretical_production_sum * 100.0
-            production_lower_limit = min_production_sum / theoretical_production_sum * 100.0
-            production_p10_limit = production_sum_p10 / theoretical_production_sum * 100.0
-            production_p90_limit = production_sum_p90 / theoretical_production_sum * 100.0
-            total_losses = theoretical_production_sum - actual_production_sum
-            energy_based_avail = 100.0 - ((total_losses/theoretical_production_sum) * 100.0)
-            icing_loss_perc = (icing_loss_production/actual_production_sum) * 100.0
-            stop_loss_perc = (stop_losses/actual_production_sum) * 100.0
-            status_stop_loss_perc = (status_stop_loss/actual_production_sum) * 100.0
-            icing_duration_perc = (icing_duration / data_period) * 100.0
-            stop_duration_perc = (stop_duration / data_period) * 100.0
-            over_prod_duration_perc = (over_prod_duration / data_period) * 100.0
-            technical_availability = ((data_period - status_stop_duration) / data_period) * 100.0
-            ice_detection_duration_perc = (ice_detection_duration / data_period) * 100.0
-            ice_detection_loss_perc = (ice_detection_loss / actual_production_sum) * 100.0
-            ips_on_duration_perc = (ips_on_duration / data_period) * 100.0
-            ips_on_loss_perc = (ips_on_production_loss / actual_production_sum) * 100.0
-            ips_self_consumption_perc = (ips_self_consumption / actual_production_sum) * 100.0
-        # availability = aepc.count_availability(data) * 100.0
-        availability = data_sizes[0] / ((stop_time - start_time) / step_size) * 100.0
-    
-        filtered_data_size = (data_sizes[1]/data_sizes[0]) * 100.0
-        reference_data_size = (data_sizes[2]/data_sizes[0]) * 100.0
-    
+    def write_summary(self, aepc, values):
+        """
+        write summary statistics into <id>_summary.txt
+
+        :param aepc: the active aeoc object
+        :param values: OrderedDict of field name: (value, unit) as returned by AEPcounter.summary_values
+        :return: status of the write operation, full filename ,possible error
+        """
         filename_trunk = '_summary.txt'
         full_filename = aepc.result_dir + aepc.id + filename_trunk
         try:
             with open(full_filename,'w') as f:
-                # f.write("Statistics from the dataset: {} \n".format(aepc.id))
-                # f.write("\n")
-                # f.write("[Generic statistics] \n")
-                # f.write("Data start: {0}, stop {1}; total: {2:.1f} hours \n"
-                        # .format(start_time.strftime("%Y-%m-%d %H:%M:%S"),stop_time.strftime("%Y-%m-%d %H:%M:%S"),data_period))
-                # f.write("Data availability: {:.1f} % \n".format(availability))
-                # f.write("Sample count in original data: {0}, after filtering: {1}, loss due to filtering: {2:.1f} % \n"
-                        # .format(data_sizes[0],data_sizes[1], data_loss))
-                # f.write("Sample count in reference data {0}, size of raw data {1:.1f} \n"
-                        # .format(data_sizes[2],reference_loss))
-                # f.write("\n")
-                # f.write("[Production] \n")
-                # f.write("Theoretical maximum production: {0:.1f}, observed power production: {1:.1f} \n"
-                        # .format(theoretical_production_sum, actual_production_sum))
-                # f.write("Total losses {0:.1f}, {1:.1f} % \n".format(total_losses, total_losses_perc))
-                # f.write("\n")
-                # f.write("[Icing] \n")
-                # f.write("Icing during production: {0:.1f} hours, {1:.1f} % of total data \n"
-                        # .format(icing_duration,icing_duration_perc))
-                # f.write("Icing induced stops: {0:.1f} hours, {1:.1f} % of total data \n"
-                        # .format(stop_duration,stop_duration_perc))
-                # f.write("Overproduction: {0:.1f} hours, {1:.1f} % of total data \n"
-                        # .format(over_prod_duration,over_prod_duration_perc))
-                # f.write("Production losses due to icing: {0:.1f}, {1:.1f} % \n"
-                        # .format(icing_loss_production, icing_loss_perc))
-                # f.write("Production losses during icing induced stops: {0:.1f}, {1:.1f} % \n"
-                             # .format(stop_losses, stop_loss_perc))
                 f.write("{heading: <{fill1}}\t {value: >{fill2}} \t{unit}\n".format(heading='Field',fill1=50,value='Value', fill2=20, unit='unit'))
-                f.write("{heading: <{fill1}}\t {value: >{fill2}} \t{unit}\n".format(heading='Dataset name',fill1=50,value=aepc.id, fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production losses due to icing',fill1=50, value=icing_loss_production, fill2=20, unit='kWh'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative production losses due to icing',fill1=50, value=icing_loss_perc, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Losses due to icing related stops',fill1=50, value=stop_losses, fill2=20, unit='kWh'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses due to icing related stops',fill1=50, value=stop_loss_perc, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Icing during production',fill1=50, value=icing_duration, fill2=20, unit='h'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Icing during production (% of total data)',fill1=50, value=icing_duration_perc, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Turbine stopped during production',fill1=50, value=stop_duration, fill2=20, unit='h'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Turbine stopped production (% of total data)',fill1=50, value=stop_duration_perc, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Over production hours',fill1=50, value=over_prod_duration, fill2=20, unit='h'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Over production hours (% of total)',fill1=50, value=over_prod_duration_perc, fill2=20, unit='%'))
-                if aepc.heated_site:
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS on hours', fill1=50, value=ips_on_duration,fill2=20, unit='h'))
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS on hours (% of total)', fill1=50, value=ips_on_duration_perc, fill2=20,unit='%'))
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Losses during IPS operation', fill1=50, value=ips_on_production_loss,fill2=20, unit='kWh'))
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses during IPS operation', fill1=50, value=ips_on_loss_perc, fill2=20,unit='%'))
-                if aepc.ice_detection:
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Ice detector icing hours',fill1=50, value=ice_detection_duration, fill2=20, unit='h'))
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Ice detector icing hours (% of total data)',fill1=50, value=ice_detection_duration_perc, fill2=20, unit='%'))
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Losses during ice detector alarms',fill1=50, value=ice_detection_loss, fill2=20, unit='h'))
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses during ice detector alarm (% of total data)',fill1=50, value=ice_detection_loss_perc, fill2=20, unit='h'))
-                if aepc.heating_power_index >= 0:
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS self consumption',fill1=50, value=ips_self_consumption, fill2=20, unit='kWh'))
-                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS self consumption (% of total)',fill1=50, value=ips_self_consumption_perc, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='SCADA forced stops',fill1=50, value=status_stop_duration, fill2=20, unit='h'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Time Based Availability (TBA)',fill1=50, value=technical_availability, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Loss during SCADA stops',fill1=50, value=status_stop_loss, fill2=20, unit='kWh'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses during SCADA stops (% of total)',fill1=50, value=status_stop_loss_perc, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Power curve uncertainty',fill1=50, value=uncertainty, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production upper limit (std.dev)',fill1=50, value=production_upper_limit, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production lower limit (std.dev)',fill1=50, value=production_lower_limit, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production P90', fill1=50, value=production_p90_limit, fill2=20,unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production P10', fill1=50, value=production_p10_limit, fill2=20,unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Theoretical mean production', fill1=50, value=theoretical_production_sum,fill2=20, unit='kWh'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Observed power production',fill1=50, value=actual_production_sum, fill2=20, unit='kWh'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Total Losses',fill1=50, value=total_losses, fill2=20, unit='kWh'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Energy Based Availability (EBA)',fill1=50, value=energy_based_avail, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Data start time',fill1=50, value=start_time.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Data stop time',fill1=50, value=stop_time.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Total amount of data',fill1=50, value=data_period, fill2=20, unit='h'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Reference data start time',fill1=50, value=reference_start.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Reference data stop time',fill1=50, value=reference_stop.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Total amount of data in reference dataset',fill1=50, value=reference_data_period, fill2=20, unit='h'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Data availability',fill1=50, value=availability, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}d} \t{unit}\n".format(heading='Sample count in original data',fill1=50, value=data_sizes[0], fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}d} \t{unit}\n".format(heading='Sample count in after filtering',fill1=50, value=data_sizes[1], fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Data size after filtering',fill1=50, value=filtered_data_size, fill2=20, unit='%'))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}d} \t{unit}\n".format(heading='Sample count in reference data',fill1=50, value=data_sizes[2], fill2=20, unit=' '))
-                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Reference dataset as % of original data',fill1=50, value=reference_data_size, fill2=20, unit='%'))
+                for heading, (value, unit) in values.items():
+                    if isinstance(value, str):
+                        f.write("{heading: <{fill1}}\t {value: >{fill2}} \t{unit}\n".format(heading=heading, fill1=50, value=value, fill2=20, unit=unit))
+                    elif isinstance(value, (int, np.integer)):
+                        f.write("{heading: <{fill1}}\t {value:>{fill2}d} \t{unit}\n".format(heading=heading, fill1=50, value=value, fill2=20, unit=unit))
+                    else:
+                        f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading=heading, fill1=50, value=value, fill2=20, unit=unit))
                 f.write(" \t \t \n")
                 f.write(" \t \t \n")
-                
-                
-                
             return True, full_filename , ''
         except IOError as e:
             return False, full_filename, e
     
-    
-    
     def write_power_curve(self, aepc, pc, pc_id=''):
         """
         Write power curve, P10 and P90 into a file
@@ -692,6 +544,22 @@ class Result_file_writer():
         except IOError as e:
             return False, filename, e
     
+    def production_stats_granularities(self):
+        """
+        list the calendar periods of production statistics selected in the output options, monthly statistics always
+        come first
+
+        :return: list of granularities
+        """
+        granularities = ['month']
+        if self.daily_stats_write:
+            granularities.append('day')
+        if self.weekly_stats_write:
+            granularities.append('week')
+        if self.seasonal_stats_write:
+            granularities.append('season')
+        return granularities
+
     def write_monthly_stats(self, data, pc, aepc, ice_events, ice_stops, status_stops, ips_on_flags, ice_detected):
         """
         write production loss statistics to file
@@ -701,37 +569,60 @@ class Result_file_writer():
         :param aepc: aep counter used to calculate the stats
         :return: status of the write operation, filename, error
         """
-        production_statistics = aepc.calculate_production_stats(data, pc,ice_events, ice_stops, status_stops, ips_on_flags, ice_detected)
-        filename_trunk = '_production_stats.txt'
-        filename = aepc.result_dir + aepc.id + filename_trunk
-        headers = ['month', 'Theoretical production', 'Actual production', 'Total losses', 'Total losses (%)',
-                   'Production losses due to icing', 'Relative icing production loss',
-                   'Losses due to icing induced stops', 'Relative losses due to iced stops',
-                   'Losses during SCADA stops', 'Relative losses during SCADA stops',
-                   'Losses during IPS operation', 'Relative losses during IPS operation',
-                   'Losses during ice detection', 'Relative losses during ice detection',
-                   'Total icing losses', 'Relative icing losses', 'IPS consumption']
-        try:
-            with open(filename,'w') as f:
-                for item in headers:
-                    f.write(item)
-                    f.write('\t')
-                f.write('\n')
-                for line in production_statistics:
-                    for item in line:
-                        if type(item) == datetime.datetime:
-                            f.write(item.strftime('%Y-%m'))
-                            f.write('\t')
-                        else:
-                            f.write(str(item))
-                            f.write('\t')
+        return self.write_production_stats(data, pc, aepc, ice_events, ice_stops, status_stops, ips_on_flags, ice_detected)[0]
+
+    def write_production_stats(self, data, pc, aepc, ice_events, ice_stops, status_stops, ips_on_flags, ice_detected, granularities=('month',), series=None):
+        """
+        write production loss statistics for one or more calendar granularities to file
+        the production time series are calculated once and summed into each set of calendar periods
+
+        files are named <id>_production_stats.txt for months and <id>_daily_stats.txt, <id>_weekly_stats.txt and
+        <id>_seasonal_stats.txt for the other granularities
+
+        :param data: input data
+        :param pc: calculated power curve
+        :param aepc: aep counter used to calculate the stats
+        :param granularities: calendar periods to write, see AEPcounter.calendar_keys
+        :param series: precalculated result of AEPcounter.production_step_series, calculated if not given
+        :return: list of (status of the write operation, filename, error) in the order of granularities
+        """
+        filename_trunks = {'month': '_production_stats.txt', 'day': '_daily_stats.txt', 'week': '_weekly_stats.txt',
+                           'season': '_seasonal_stats.txt'}
+        period_headers = {'month': 'month', 'day': 'day', 'week': 'week', 'season': 'season (Oct-Apr)'}
+        period_formats = {'month': '%Y-%m', 'day': '%Y-%m-%d', 'week': '%G-W%V', 'season': '%Y'}
+        if series is None:
+            series = aepc.production_step_series(data, pc, ice_events, ice_stops, status_stops, ips_on_flags, ice_detected)
+        results = []
+        for granularity in granularities:
+            production_statistics = aepc.calculate_production_stats(data, pc, ice_events, ice_stops, status_stops, ips_on_flags, ice_detected, granularity, series)
+            filename = aepc.result_dir + aepc.id + filename_trunks[granularity]
+            headers = [period_headers[granularity], 'Theoretical production', 'Actual production', 'Total losses', 'Total losses (%)',
+                       'Production losses due to icing', 'Relative icing production loss',
+                       'Losses due to icing induced stops', 'Relative losses due to iced stops',
+                       'Losses during SCADA stops', 'Relative losses during SCADA stops',
+                       'Losses during IPS operation', 'Relative losses during IPS operation',
+                       'Losses during ice detection', 'Relative losses during ice detection',
+                       'Total icing losses', 'Relative icing losses', 'IPS consumption']
+            try:
+                with open(filename,'w') as f:
+                    for item in headers:
+                        f.write(item)
+                        f.write('\t')
                     f.write('\n')
-            return True, filename, ''
-        except IOError as e:
-            return False, filename, e
-        
-        
-    
+                    for line in production_statistics:
+                        for item in line:
+                            if type(item) == datetime.datetime:
+                                f.write(item.strftime(period_formats[granularity]))
+                                f.write('\t')
+                            else:
+                                f.write(str(item))
+                                f.write('\t')
+                        f.write('\n')
+                results.append((True, filename, ''))
+            except IOError as e:
+                results.append((False, filename, e))
+        return results
+
     def insert_fault_codes(self, data,aepc,reader):
         """
         re-insert the textual fault codes into the data time series table
@@ -783,10 +674,7 @@ class Result_file_writer():
         reference_stop = data[-1,aepc.ts_index]
         reference_data_period = (reference_stop-reference_start).total_seconds()/60.0/60.0
         tmax_power = aepc.theoretical_output_power(data, pc)
-        theoretical_production = aepc.calculate_production(tmax_power, 1)
-        actual_production = aepc.calculate_production(tmax_power, 2)
-        theoretical_production_sum = np.nansum(theoretical_production[:, 1])
-        actual_production_sum = np.nansum(actual_production[:, 1])
+        theoretical_production_sum, actual_production_sum = aepc.production_totals(tmax_power, [1, 2])
         total_losses = theoretical_production_sum - actual_production_sum
         total_losses_perc = ((theoretical_production_sum - actual_production_sum)/theoretical_production_sum) * 100.0
         # check for empty
@@ -825,18 +713,27 @@ class Result_file_writer():
         stop_label = "Stops due to icing: {0:.1f} %".format(stop_loss_perc)
         overprod_label = "Overproduction: {0:.1f} % of total time".format(over_prod_duration_perc)
 
+        matplotlib, plt = load_pyplot(headless=write)
         matplotlib.rcParams.update({'font.size': 22})
         # plt.style.use('bmh')
         fig0 = plt.figure(0)
         ax = fig0.gca()
-        ax.plot(red_power[:, 2], red_power[:, 5], 'bo',label='standard production', alpha=0.5, markersize=6)
-        # mark all cases where an alarm has been triggered with a red 'x'
-        ax.plot(red_power[red_power[:,1] == 1.0, 2], red_power[red_power[:,1] == 1.0, 5], 'ro', label=production_loss_label, alpha=0.5, markersize=6)
-        ax.plot(stops[stops[:,1] == 2.0, 2], stops[stops[:,1] == 2.0, 5], 'ko', label=stop_label, alpha=0.5, markersize=6)
-        ax.plot(overprod[overprod[:,1] == 3.0, 2], overprod[overprod[:,1] == 3.0, 5], 'go', label=overprod_label, alpha=0.5, markersize=6)
+        flagged = [(red_power[red_power[:,1] == 1.0], 'ro', production_loss_label),
+                   (stops[stops[:,1] == 2.0], 'ko', stop_label),
+                   (overprod[overprod[:,1] == 3.0], 'go', overprod_label)]
         if ips_on_flags is not None:
-            ips_label = "IPS ON"
-            ax.plot(ips_on_flags[ips_on_flags[:, 1] != 0.0, 2], ips_on_flags[ips_on_flags[:, 1] != 0.0, 5], 'yo', label=ips_label, alpha=0.5, markersize=6)
+            flagged.append((ips_on_flags[ips_on_flags[:, 1] != 0.0], 'yo', "IPS ON"))
+        if self.density_plot(len(red_power)):
+            # all samples as a 2D histogram, flagged points on top thinned down to the point budget
+            self.plot_sample_density(ax, red_power[:, 2], red_power[:, 5])
+            for points, style, label in flagged:
+                points = self.thin_points(points, self.plot_point_budget)
+                ax.plot(points[:, 2], points[:, 5], style, label=label, alpha=0.5, markersize=4)
+        else:
+            ax.plot(red_power[:, 2], red_power[:, 5], 'bo',label='standard production', alpha=0.5, markersize=6)
+            # mark all cases where an alarm has been triggered with a red 'x'
+            for points, style, label in flagged:
+                ax.plot(points[:, 2], points[:, 5], style, label=label, alpha=0.5, markersize=6)
 
         # plot a mean power curve and the P10 curve on top of the data
         ax.plot(mpc[:,0], mpc[:,2], 'c-', lw=4, label='Power curve') # linewidth 2
@@ -896,6 +793,62 @@ class Result_file_writer():
         #          plt.show()
         #==============================================================================
     
+    def density_plot(self, sample_count):
+        """
+        check if the power curve plot is drawn as a density image instead of a scatter plot
+
+        :param sample_count: number of samples in the plot
+        :return: True for density rendering
+        """
+        if self.plot_mode == 'density':
+            return True
+        if self.plot_mode == 'auto':
+            return sample_count > self.plot_point_budget
+        return False
+
+    def thin_points(self, points, budget):
+        """
+        pick at most budget evenly spaced rows from points, keeps the time order
+
+        :param points: array of samples
+        :param budget: maximum number of rows
+        :return: points or a subset of them
+        """
+        if len(points) <= budget:
+            return points
+        return points[np.linspace(0, len(points) - 1, budget).astype(int)]
+
+    def plot_sample_density(self, ax, wind_speed, power, wind_speed_step=0.1, power_bins=200):
+        """
+        draw the (wind speed, power) samples as a 2D histogram with a logarithmic color scale
+        binning is a single pass over the data, drawing time does not depend on the number of samples
+
+        :param ax: matplotlib axes to draw into
+        :param wind_speed: wind speeds of the samples
+        :param power: power of the samples
+        :param wind_speed_step: width of the wind speed bins in m/s
+        :param power_bins: number of bins on the power axis
+        """
+        wind_speed = np.asarray(wind_speed, dtype=float)
+        power = np.asarray(power, dtype=float)
+        valid = np.isfinite(wind_speed) & np.isfinite(power)
+        if not np.any(valid):
+            return
+        wind_speed = wind_speed[valid]
+        power = power[valid]
+        ws_edges = np.arange(0.0, max(self.power_curve_plot_max, np.max(wind_speed)) + wind_speed_step, wind_speed_step)
+        power_low = np.min(power)
+        power_high = np.max(power)
+        if power_high <= power_low:
+            power_high = power_low + 1.0
+        power_edges = np.linspace(power_low, power_high, power_bins + 1)
+        counts, _, _ = np.histogram2d(wind_speed, power, bins=(ws_edges, power_edges))
+        counts = np.ma.masked_equal(counts.T, 0.0)
+        import matplotlib.colors
+        ax.pcolormesh(ws_edges, power_edges, counts, cmap='Blues', norm=matplotlib.colors.LogNorm(), shading='flat')
+        # QuadMesh has no legend entry of its own
+        ax.plot([], [], 's', color='tab:blue', label='standard production (density)', markersize=12)
+
     def read_powercurve_from_file(self,filename):
         """
         read powercurve from file produced by the program
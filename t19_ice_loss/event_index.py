@@ -0,0 +1,173 @@
+"""
+Sorted interval index over icing events, used to answer time queries on the results of
+AEPcounter.power_loss_during_alarm without rescanning the event lists
+"""
+
+import numpy as np
+
+
+class EventIndex:
+    """
+    Sorted interval structure for one category of events (e.g. production losses or stops)
+
+    Events within one category do not overlap, so both event starts and stops are sorted.
+    Point, overlap and range queries are binary searches into these arrays, O(log E).
+    Event stop times are exclusive, same as in the alarm time series: the stop timestamp is the first sample
+    without an alarm.
+    """
+    def __init__(self, starts=None, stops=None, losses=None):
+        """
+        :param starts: event start times, datetime.datetime or numpy.datetime64
+        :param stops: event stop times
+        :param losses: production loss during each event in kWh
+        """
+        if starts is None:
+            starts = []
+            stops = []
+            losses = []
+        starts = np.array(starts, dtype='datetime64[us]')
+        stops = np.array(stops, dtype='datetime64[us]')
+        losses = np.asarray(losses, dtype=float)
+        order = np.argsort(starts, kind='stable')
+        self.starts = starts[order]
+        self.stops = stops[order]
+        self.losses = losses[order]
+        # cumulative losses, loss of events i..j-1 is cumulative_losses[j] - cumulative_losses[i]
+        self.cumulative_losses = np.zeros(len(self.losses) + 1)
+        np.cumsum(np.nan_to_num(self.losses, nan=0.0), out=self.cumulative_losses[1:])
+        # cumulative durations in microseconds, kept as integers so that the sums are exact
+        self.cumulative_durations = np.zeros(len(self.starts) + 1, dtype=np.int64)
+        np.cumsum((self.stops - self.starts).astype(np.int64), out=self.cumulative_durations[1:])
+
+    @classmethod
+    def from_timings(cls, timings):
+        """
+        build an index from the output of AEPcounter.power_loss_during_alarm
+
+        :param timings: event array formatted as [starttime, stoptime, loss, ...], can be empty or None
+        :return: EventIndex
+        """
+        if (timings is None) or (len(timings) == 0):
+            return cls()
+        return cls(timings[:, 0], timings[:, 1], timings[:, 2].astype(float))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _as_time(self, time):
+        return np.datetime64(time, 'us')
+
+    def event_at(self, time):
+        """
+        find the event that is active at time
+
+        :param time: queried time
+        :return: index of the event, None if there is no event at that time
+        """
+        time = self._as_time(time)
+        index = np.searchsorted(self.starts, time, side='right') - 1
+        if (index >= 0) and (time < self.stops[index]):
+            return int(index)
+        return None
+
+    def in_event(self, time):
+        """
+        check if time is inside any event
+
+        :param time: queried time
+        :return: True if an event is active at time
+        """
+        return self.event_at(time) is not None
+
+    def overlapping(self, starttime, stoptime):
+        """
+        list the events that overlap with the window from starttime to stoptime
+
+        :param starttime: start of the window
+        :param stoptime: end of the window
+        :return: array of event indexes
+        """
+        first, last = self._overlap_range(self._as_time(starttime), self._as_time(stoptime))
+        return np.arange(first, last)
+
+    def _overlap_range(self, starttime, stoptime):
+        first = np.searchsorted(self.stops, starttime, side='right')
+        last = np.searchsorted(self.starts, stoptime, side='left')
+        return int(first), int(max(first, last))
+
+    def loss_between(self, starttime, stoptime):
+        """
+        total production loss between starttime and stoptime
+        events that are only partially inside the window are counted in proportion to their overlapping time
+
+        :param starttime: start of the window
+        :param stoptime: end of the window
+        :return: loss in kWh
+        """
+        starttime = self._as_time(starttime)
+        stoptime = self._as_time(stoptime)
+        first, last = self._overlap_range(starttime, stoptime)
+        if first >= last:
+            return 0.0
+        total = self.cumulative_losses[last] - self.cumulative_losses[first]
+        for index in {first, last - 1}:
+            duration = self.stops[index] - self.starts[index]
+            if duration <= np.timedelta64(0, 'us'):
+                continue
+            overlap = min(self.stops[index], stoptime) - max(self.starts[index], starttime)
+            outside = 1.0 - max(overlap, np.timedelta64(0, 'us')) / duration
+            if not np.isnan(self.losses[index]):
+                total -= self.losses[index] * outside
+        return total
+
+    def duration_between(self, starttime, stoptime):
+        """
+        total event time between starttime and stoptime in hours, O(log E) from the cumulative event durations
+
+        :param starttime: start of the window
+        :param stoptime: end of the window
+        :return: duration in hours
+        """
+        starttime = self._as_time(starttime)
+        stoptime = self._as_time(stoptime)
+        first, last = self._overlap_range(starttime, stoptime)
+        if first >= last:
+            return 0.0
+        total = self.cumulative_durations[last] - self.cumulative_durations[first]
+        # only the first and last events can be partially outside of the window
+        for index in {first, last - 1}:
+            overlap = min(self.stops[index], stoptime) - max(self.starts[index], starttime)
+            total -= (self.stops[index] - self.starts[index] - overlap).astype(np.int64)
+        return float(np.timedelta64(total, 'us') / np.timedelta64(1, 'h'))
+
+
+def save_event_indexes(filename, indexes):
+    """
+    save a set of event indexes into one .npz file
+
+    :param filename: output filename
+    :param indexes: dictionary of category name: EventIndex
+    """
+    arrays = {}
+    for category, index in indexes.items():
+        arrays[category + '/starts'] = index.starts.astype(np.int64)
+        arrays[category + '/stops'] = index.stops.astype(np.int64)
+        arrays[category + '/losses'] = index.losses
+    np.savez(filename, **arrays)
+
+
+def load_event_indexes(filename):
+    """
+    load a set of event indexes saved with save_event_indexes
+
+    :param filename: name of the .npz file
+    :return: dictionary of category name: EventIndex
+    """
+    indexes = {}
+    with np.load(filename) as saved:
+        categories = sorted({key.rsplit('/', 1)[0] for key in saved.files})
+        for category in categories:
+            indexes[category] = EventIndex(saved[category + '/starts'].astype('datetime64[us]'),
+                                           saved[category + '/stops'].astype('datetime64[us]'),
+                                           saved[category + '/losses'])
+    return indexes
@@ -0,0 +1,232 @@
+"""
+Wide farm data files, one file with a timestamp column and a block of columns for every turbine
+
+The file is read once and its columns are put into shared memory as typed arrays: timestamps as int64
+microseconds and the other columns as float64, textual fault codes replaced with numbers. Every turbine has its
+own .ini file naming the farm file and listing the farm file columns of the turbine in the order of its own
+columns, the indexes in the Data Structure and Icing sections refer to that order ::
+
+    [Source file]
+    filename = farm.csv
+    farm columns = 0,9,10,11,12,13,14,15,16
+
+Turbine runs in other processes attach to the shared memory and read their columns from it without parsing the
+file again, so the farm data is in memory once however many turbines are processed at the same time.
+"""
+
+import csv
+import datetime
+import json
+import os
+
+import numpy as np
+
+
+def _text_to_float(text):
+    # same conversions as CSVimporter.read_data
+    try:
+        return float(text)
+    except ValueError:
+        if 'FALSE' in text.upper():
+            return 0.0
+        elif 'TRUE' in text.upper():
+            return 1.0
+        return np.nan
+
+
+class SharedFarm:
+    """
+    handle to the columns of a farm file in shared memory, can be pickled and sent to worker processes
+    """
+    def __init__(self, filename, timestamp_name, values_name, rows, columns, headers, fault_dict):
+        """
+        :param filename: name of the farm file
+        :param timestamp_name: name of the shared memory block of the timestamps
+        :param values_name: name of the shared memory block of the other columns
+        :param rows: number of rows, unique timestamps in order
+        :param columns: farm file column indexes stored in the values block, in order
+        :param headers: column names of the farm file
+        :param fault_dict: textual fault code: number used in the data, common to all turbines of the file
+        """
+        self.filename = filename
+        self.timestamp_name = timestamp_name
+        self.values_name = values_name
+        self.rows = rows
+        self.columns = list(columns)
+        self.headers = list(headers)
+        self.fault_dict = dict(fault_dict)
+        self._memories = []
+
+    def attach(self):
+        """
+        map the shared memory into this process
+
+        :return: timestamps as datetime64[us] and values with one farm column per row, both views into the shared memory
+        """
+        from multiprocessing import shared_memory
+        if not self._memories:
+            self._memories = [shared_memory.SharedMemory(name=self.timestamp_name), shared_memory.SharedMemory(name=self.values_name)]
+        timestamps = np.ndarray((self.rows,), dtype='datetime64[us]', buffer=self._memories[0].buf)
+        # column major, each column is one contiguous block
+        values = np.ndarray((len(self.columns), self.rows), dtype=np.float64, buffer=self._memories[1].buf)
+        return timestamps, values
+
+    def close(self):
+        """
+        unmap the shared memory from this process, views returned by attach can't be used after this
+        """
+        for memory in self._memories:
+            memory.close()
+        self._memories = []
+
+    def unlink(self):
+        """
+        free the shared memory, called by the process that created it once all the turbines are done
+        """
+        from multiprocessing import shared_memory
+        self.close()
+        for name in (self.timestamp_name, self.values_name):
+            try:
+                memory = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            memory.close()
+            memory.unlink()
+
+    def turbine_data(self, run_config):
+        """
+        collect the data of one turbine in the format of CSVimporter.full_data
+
+        the shared columns are read through views, only the array handed to AEPcounter is created here
+
+        :param run_config: RunConfig of the turbine, farm_columns selects its columns
+        :return: numpy object array, timestamps as datetime.datetime
+        """
+        positions = dict((column, position) for position, column in enumerate(self.columns))
+        timestamps, values = self.attach()
+        try:
+            data = np.empty((self.rows, len(run_config.farm_columns)), dtype=object)
+            for index, column in enumerate(run_config.farm_columns):
+                if index in run_config.skip_columns:
+                    data[:, index] = np.nan
+                elif index == run_config.ts_index:
+                    data[:, index] = timestamps.astype(object)
+                else:
+                    data[:, index] = values[positions[column]]
+        finally:
+            self.close()
+        return data
+
+    def turbine_headers(self, run_config):
+        return [self.headers[column] if column < len(self.headers) else '' for column in run_config.farm_columns]
+
+
+def _check_same_reader_options(run_configs):
+    reference = run_configs[0]
+    for run_config in run_configs[1:]:
+        for attribute in ('delim', 'quote_char', 'dt_format', 'dt_extra_char'):
+            if getattr(run_config, attribute) != getattr(reference, attribute):
+                raise ValueError("{0} of {1} differs from {2}, turbines reading the same farm file need the same file options".format(
+                    attribute, run_config.source, reference.source))
+        if run_config.farm_columns[run_config.ts_index] != reference.farm_columns[reference.ts_index]:
+            raise ValueError("timestamp column of {0} differs from {1}".format(run_config.source, reference.source))
+
+
+def read_farm_file(run_configs):
+    """
+    read the columns of a farm file used by the turbines into typed arrays
+
+    textual fault codes are replaced in the fault columns of turbines with replace fault codes set, the
+    numbers are given in the order the codes are found. Rows are sorted by timestamp and duplicate timestamps
+    removed, as in CSVimporter.read_data.
+
+    :param run_configs: RunConfigs of the turbines in the file, all with the same filename and farm_columns set
+    :return: timestamps as datetime64[us], values with one column per row, farm column indexes of the value rows,
+             headers of the file, fault_dict
+    """
+    _check_same_reader_options(run_configs)
+    reference = run_configs[0]
+    ts_column = reference.farm_columns[reference.ts_index]
+    columns = sorted(set(column for run_config in run_configs for column in run_config.farm_columns) - {ts_column})
+    text_columns = set(run_config.farm_columns[index] for run_config in run_configs if run_config.replace_faults
+                       for index in run_config.fault_columns)
+    converters = [(position, column, column in text_columns) for position, column in enumerate(columns)]
+
+    fault_dict = {}
+    timestamps = []
+    rows = []
+    line_number = 1
+    with open(reference.filename, 'r') as datafile:
+        reader = csv.reader(datafile, delimiter=reference.delim, quotechar=reference.quote_char)
+        headers = next(reader)
+        for dataline in reader:
+            line_number += 1
+            try:
+                ts_string = dataline[ts_column]
+                if reference.dt_extra_char != 0:
+                    ts_string = ts_string[:-reference.dt_extra_char]
+                timestamp = datetime.datetime.strptime(ts_string, reference.dt_format)
+                row = [0.0] * len(columns)
+                for position, column, text in converters:
+                    if text:
+                        row[position] = fault_dict.setdefault(dataline[column].strip(), len(fault_dict))
+                    else:
+                        row[position] = _text_to_float(dataline[column])
+            except (ValueError, IndexError) as e:
+                print("{0} : Error {1} while reading file {2}".format(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), e, reference.filename))
+                print("Error on line: {0}".format(line_number))
+                continue
+            timestamps.append(timestamp)
+            rows.append(row)
+    print("{0} : File {1} read".format(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), reference.filename))
+
+    timestamps = np.array(timestamps, dtype='datetime64[us]')
+    unique_timestamps, first_rows = np.unique(timestamps, return_index=True)
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns))[first_rows, :].T
+    return unique_timestamps, values, columns, headers, fault_dict
+
+
+def share_farm_file(run_configs):
+    """
+    read a farm file once with read_farm_file and put the columns used by the turbines into shared memory
+
+    :param run_configs: RunConfigs of the turbines in the file, all with the same filename and farm_columns set
+    :return: SharedFarm, call unlink when done
+    """
+    from multiprocessing import shared_memory
+    unique_timestamps, values, columns, headers, fault_dict = read_farm_file(run_configs)
+    reference = run_configs[0]
+    timestamp_memory = shared_memory.SharedMemory(create=True, size=max(unique_timestamps.nbytes, 1))
+    values_memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(unique_timestamps.shape, dtype=unique_timestamps.dtype, buffer=timestamp_memory.buf)[:] = unique_timestamps
+    np.ndarray(values.shape, dtype=np.float64, buffer=values_memory.buf)[:] = values
+    farm = SharedFarm(reference.filename, timestamp_memory.name, values_memory.name, len(unique_timestamps), columns, headers, fault_dict)
+    timestamp_memory.close()
+    values_memory.close()
+    return farm
+
+
+def write_fault_codes(run_config, fault_dict):
+    """
+    save the fault codes of the farm file into the result directory of a turbine, as when reading a file of its own
+    """
+    if not os.path.exists(run_config.result_dir):
+        os.makedirs(run_config.result_dir)
+    with open(run_config.result_dir + run_config.id + '_faults.json', 'w') as outfile:
+        json.dump(fault_dict, outfile, indent=4, sort_keys=True)
+
+
+def analyse_farm_turbine(run_config, farm):
+    """
+    analyse one turbine of a farm file in shared memory, same as analyse_file for a file of its own
+
+    :param run_config: RunConfig of the turbine
+    :param farm: SharedFarm made with share_farm_file
+    :return: RunResult
+    """
+    from .run import analyse
+    fault_dict = None
+    if run_config.replace_faults:
+        fault_dict = dict(farm.fault_dict)
+        write_fault_codes(run_config, fault_dict)
+    return analyse(farm.turbine_data(run_config), run_config, farm.turbine_headers(run_config), fault_dict)
@@ -0,0 +1,924 @@
+"""
+Reference implementations of the stages that have been rewritten for speed
+
+These are the original row by row versions of the AEPcounter and Result_file_writer methods, kept as they
+were so that the fast versions can be checked against them, see t19_ice_loss.verify. Only the missing IPS
+consumption crashes of calculate_production_stats have been fixed. They are slow and not used in normal runs.
+"""
+
+import datetime
+import numpy as np
+
+from .aep_counter import AEPcounter
+from .aep_counter import TimingError
+from .data_file_handler import Result_file_writer
+
+
+class LegacyAEPcounter(AEPcounter):
+    """
+    AEPcounter with the original implementations of the power curve, alarm, event and production statistics methods
+    """
+    def theoretical_output_power(self, data, power_curves):
+        """
+        calculates the theoretical, expected output power based on power curve and measured wind speed
+
+        :param data:
+        :param power_curve:
+        :return: rerference power, in structure [timestamp, interpolated reference power, actual measured output power]
+        """
+        reference = []
+        time_limited_data = self.time_filter_data(data)
+        for line in time_limited_data:
+            dirbin = np.argmin(np.abs(self.direction_bins - line[self.wd_index]))
+            int_pow = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 2])
+            int_pow_p10 = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 3])
+            int_pow_p90 = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 4])
+            uncert_lower_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 8])
+            uncert_upper_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 9])
+            reference.append((line[self.ts_index], int_pow, line[self.pow_index], int_pow_p10, int_pow_p90, uncert_lower_lim, uncert_upper_lim))
+        return np.array(reference)
+
+    def calculate_production(self,data,index,delta=datetime.timedelta(seconds=10*60)):
+        """
+        calculates total production between from previous time stamp to current, assuming the difference is constant
+        skips all occurrences where the difference between two adjacent timestamps is not constant
+
+        NOTE: assumes timestamp is at index 0
+
+        :param data: input data, containing the measured output
+        :param index: index of the production measurement
+        :param delta: difference between two timestamps defaults to ten minutes
+        :return: structure containing [end timestep, production]
+        """
+        output_data = []
+        for i in range(len(data)):
+            if i != 0:
+                # integrity check
+                if ((data[i,0] - data[i-1,0]) > delta) or np.isnan(data[i,index]) or np.isnan(data[i-1,index]) or (data[i,index] <=0.0) or (data[i-1,index] <= 0.0):
+                    prod = 0
+                else:
+                    dur = (data[i,0]-data[i-1,0]).total_seconds()/60.0/60.0 # length in hours
+                    pow_at_start = data[i-1,index]
+                    pow_at_stop = data[i,index]
+                    prod = dur * ((pow_at_start+pow_at_stop) / 2.0)
+                output_data.append((data[i,0],prod))
+        output_datalen = len(output_data)
+        return np.array(output_data)
+
+    def distance_filter(self, pc, target_value):
+        """
+        calculate distances between different power curves,
+        if value is dramatically different replace with mean of all others
+        goes through all curves bin by bin
+        can be useful to automatically weed out outliers in the data
+
+        :param pc: prefilterd power curves
+        :param target_value: index of the value used for filtering e.g. power
+        :return: fltered power curve matrix
+
+        """
+        (x, y, z) = np.shape(pc)
+        value_filter = 2.5
+        for speed_bin in range(x):
+            mean_distances = np.zeros(y)
+            for direction_bin in range(y):
+                mean_distances[direction_bin] = self.distance_to_neighbours(pc, speed_bin, direction_bin, target_value)
+            med_dist = np.nanmedian(mean_distances)
+            bad_values = []
+            for index,value in enumerate(mean_distances):
+                if (value/med_dist) > value_filter:
+                    bad_values.append(index)
+
+            neighbours = np.ones(y).astype('bool')
+            neighbours[bad_values] = False
+            # print("{0}: {1}".format(speed_bin,bad_values))
+            mpc = self.mean_power_curve(pc[:, neighbours,:])
+            for value in bad_values:
+                pc[speed_bin, value, target_value] = mpc[speed_bin, target_value]
+        return pc
+
+    def count_power_curves(self, data):
+        """
+        Calculates a set of power curves from the input data
+        bins the data according to wind speed and direction
+        the binning and the column indexes of the data are defined in the class variables
+
+        Power curves contain the power curve and the P10 limit for said curve separately
+        for each wind direction defined in the wind direction binning.
+
+        output is three dimensional array containing:
+
+            * median wind speed
+            * median wind direction
+            * P10 value
+            * bin size (number of measurements in this particular bin)
+
+        for each speed and direction defined in self.wind_bins and self_direction bins
+
+        missing data (empty bins) are marked as nan
+        missing values can then be interpolated over so that there are no empty bins.
+
+        Also possible to do other kinds of filtering to improve the end result and to reduce the
+        impact of outliers in the data
+
+        Method automatically filters the data according to elsewhere defined state variable filter
+        (is this a good idea???)
+
+        Only part of data where temperature is more than 3 degrees is used to make the power curves
+
+        :param data: input data time series. can be unfiltered
+        :param temperature_filter_level: temperature in degrees, all data with temperatures above this level are used to build the reference dataset
+        :param lower_limit: percentile used as limit for power reduction (default 10)
+        :param upper_limit: percentile used as limit for overproduction (default 90)
+        :return pc: a numpy.ndarray that contains the power curves, warning limits and bin sizes for each bin,
+                    sorted by wind speed and direction
+
+        """
+        import scipy.stats as ss
+        # direction_bins = np.array([0])
+        # st_data = self.state_filter_data(data, self.normal_state)
+        # ref_data = self.temperature_filter_data(data, temperature_filter_level)
+        pc = np.zeros((len(self.wind_bins), len(self.direction_bins), 10))
+        dir_data = self.put_data_into_bins(data, self.direction_bins, self.wd_index,direction=True)
+        binned_data = self.put_data_into_bins(dir_data, self.wind_bins, self.ws_index)
+        wind_speed_index = 0
+        wind_dir_index = 1
+        power_index = 2
+        low_limit_index = 3
+        high_limit_index = 4
+        bin_standard_dev_index = 5
+        bin_uncertainty = 6
+        bin_uncertainty_lower_lim_index = 8
+        bin_uncertainty_upper_lim_index = 9
+        bin_size_index = 7
+        #print(binned_data)
+        for speed_bin_index in range(len(self.wind_bins)):
+            for direction_bin_index in range(len(self.direction_bins)):
+                bin_contents = self.fetch_bin_contents_2d(binned_data, -1, speed_bin_index, -2, direction_bin_index)
+                if bin_contents.size == 0:
+                    pc[speed_bin_index, direction_bin_index, wind_speed_index] = self.wind_bins[speed_bin_index]
+                    pc[speed_bin_index, direction_bin_index, wind_dir_index] = self.direction_bins[direction_bin_index]
+                    # force power to be 0 at wind speed 0, helps with interpolation
+                    # and other tricks used to cover missing data
+                    if speed_bin_index == 0:
+                        replacement = 0
+                    else:
+                        replacement = np.nan
+                    pc[speed_bin_index, direction_bin_index, power_index] = replacement
+                    pc[speed_bin_index, direction_bin_index, low_limit_index] = replacement
+                    pc[speed_bin_index, direction_bin_index, high_limit_index] = replacement
+                    pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = replacement
+                    pc[speed_bin_index, direction_bin_index, bin_uncertainty] = replacement
+                    pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = replacement
+                    pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = replacement
+                    pc[speed_bin_index, direction_bin_index, bin_size_index] = bin_contents.size
+                else:
+                    # suppress runtime errors caused by bins with nothing but nans
+                    if np.isnan(bin_contents[:, self.ws_index].astype('float')).all():
+                        pc[speed_bin_index, direction_bin_index, wind_speed_index] = np.nan
+                    else:
+                        pc[speed_bin_index, direction_bin_index, wind_speed_index] = np.nanmedian(bin_contents[:, self.ws_index].astype('float'))
+                    if np.isnan(bin_contents[:, self.wd_index].astype('float')).all():
+                        pc[speed_bin_index, direction_bin_index, wind_dir_index] = np.nan
+                    else:
+                        pc[speed_bin_index, direction_bin_index, wind_dir_index] = self.wind_dir_mean(bin_contents[:, self.wd_index].astype('float'))
+                    if np.isnan(bin_contents[:, self.pow_index].astype('float')).all():
+                        pc[speed_bin_index, direction_bin_index, power_index] = np.nan
+                        pc[speed_bin_index, direction_bin_index, low_limit_index] = np.nan
+                        pc[speed_bin_index, direction_bin_index, high_limit_index] = np.nan
+                        pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = np.nan
+                        pc[speed_bin_index, direction_bin_index, bin_uncertainty] = np.nan
+                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = np.nan
+                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = np.nan
+                    else:
+                        #pc[speed_bin_index, direction_bin_index, power_index] = np.nanmean(bin_contents[:, self.pow_index].astype('float'))
+                        mean_power = np.nanmedian(bin_contents[:, self.pow_index].astype('float'))
+                        power_std_dev = np.nanstd(bin_contents[:, self.pow_index].astype('float'))
+                        pc[speed_bin_index, direction_bin_index, power_index] = mean_power
+                        pc[speed_bin_index, direction_bin_index, low_limit_index] = ss.scoreatpercentile(bin_contents[:, self.pow_index], self.pc_low_limit)
+                        pc[speed_bin_index, direction_bin_index, high_limit_index] = ss.scoreatpercentile(bin_contents[:, self.pow_index], self.pc_high_limit)
+                        pc[speed_bin_index, direction_bin_index, bin_standard_dev_index] = power_std_dev
+                        # divide by zero possible
+                        if pc[speed_bin_index, direction_bin_index, power_index] != 0.0:
+                            pc[speed_bin_index, direction_bin_index, bin_uncertainty] = power_std_dev / mean_power * 100.0
+                        else:
+                            pc[speed_bin_index, direction_bin_index, bin_uncertainty] = 0.0
+                        # upper and lower limits needed for production uncertainty
+                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_lower_lim_index] = max(0.0, mean_power - power_std_dev)
+                        # prevent upper liimt from going below lower limit
+                        if mean_power > self.rated_power:
+                            power_upper_limit = mean_power + power_std_dev
+                        else:
+                            power_upper_limit = min(mean_power + power_std_dev, self.rated_power)
+                        pc[speed_bin_index, direction_bin_index, bin_uncertainty_upper_lim_index] = power_upper_limit
+                    bin_rows, bin_columns = bin_contents.shape
+                    pc[speed_bin_index, direction_bin_index, bin_size_index] = bin_rows
+
+        #TODO:
+            # make filtering optional, on by default
+
+        too_smalls = self.bin_size_filter(pc, self.pc_binsize)
+        pc[too_smalls] = np.nan
+        # interpolate over missing data
+        for dir_bin_index in range(len(self.direction_bins)):
+            try:
+                pc[:, dir_bin_index, power_index] = self.interpolate_over_nans(pc[:, dir_bin_index, power_index])
+                pc[:, dir_bin_index, low_limit_index] = self.interpolate_over_nans(pc[:, dir_bin_index, low_limit_index])
+                pc[:, dir_bin_index, high_limit_index] = self.interpolate_over_nans(pc[:, dir_bin_index, high_limit_index])
+                pc[:, dir_bin_index, bin_standard_dev_index] = self.interpolate_over_nans(pc[:,dir_bin_index, bin_standard_dev_index])
+                pc[:, dir_bin_index, bin_uncertainty] = self.interpolate_over_nans(pc[:, dir_bin_index, bin_uncertainty])
+                pc[:, dir_bin_index, bin_uncertainty_lower_lim_index] = self.interpolate_over_nans(pc[:, dir_bin_index, bin_uncertainty_lower_lim_index])
+                pc[:, dir_bin_index, bin_uncertainty_upper_lim_index] = self.interpolate_over_nans(pc[:, dir_bin_index, bin_uncertainty_upper_lim_index])
+            except ValueError:
+                # import ipdb;ipdb.set_trace()
+                print('Error in power curve generation!!')
+                print('Dir bin index: {}'.format(dir_bin_index))
+                print(pc[:, dir_bin_index, :])
+        # filter out obviously wrong values only usable if there is more than one direction bin
+        [x,y,z] = np.shape(pc)
+        if self.pc_dist_filter and (y > 1):
+            pc = self.distance_filter(pc, power_index)
+            pc = self.distance_filter(pc, low_limit_index)
+            pc = self.distance_filter(pc, high_limit_index)
+        return pc
+
+    def power_alarms(self, data, power_curves, time_filter=True, over=False):
+        """
+        flag timestamps that match wanted power alarm criteria.
+
+        For each measurement in data, search the proper value from the power curves
+        If the power at any moment is below the previously calculated P10 value AND temperature is below a
+        threshold, flag the timestamp.
+
+
+        after all the data is processed do an additional time-based filtering step where all cases where there are not
+        enough consecutive alarms are discarded.
+        default idea is to demand that the power should remain below the P10 value for at least half an hour before
+        the incident is considered a confirmed icing event
+
+        Another considered ice class is cases where iced anemometer results in apparent overproduction.
+        These cases are seen in the data as appearing above the P90 line. They are flagged in a similar way and
+        same time filtering applies here as well
+
+        The specification lists these as ice case A (production loss) and ice case C (overproduction)
+        These are marked in the output as 1 for case A and 3 for case C in the alarm variable
+
+        TODO:
+            assumes ten minute data, should probably be a parameter
+
+
+        :param data: input data
+        :param power_curves: calculated power curves, binned based on wind speed and direction
+        :param time_filter: if True, an additional time filter is applied to the data
+        :param time_filter_length: number of consecutive values below the alarm limit required to trigger the icing alarm
+        :param over: if True, flags the timestamps where the power is above P90 instead
+        :return: an array of the format [timestamp, alarm, wind speed, reference power, temperature, power, limit]
+        """
+        pow_alarms = []
+        timed = datetime.timedelta(seconds=601)
+        for index,line in enumerate(data):
+            # integrity check for the data
+            if (index != 0) and (index != len(data)-1):
+                continuous = (line[self.ts_index] - data[index-1,self.ts_index]) < timed and (data[index+1,self.ts_index] - line[self.ts_index]) < timed
+            else:
+                continuous = False
+            # pick index of active direction bin
+            dirbin = np.argmin(np.abs(line[self.wd_index]-self.direction_bins))
+            # pick the active wind speed bin
+            windbin = np.argmin(np.abs(line[self.ws_index]-self.wind_bins))
+            #wind and power at active bin
+
+            # interpolate the value from power and limit (P10) curve to matches the current wind speed
+            # np.interp does piecewise linear interpolation that can be assumed to be good enough in this
+            # case. The power curve is close to linear between any two bins
+            if over:
+                int_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 4])
+            else:
+                int_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 3])
+            int_pow = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 2])
+
+            if continuous:
+                if over:
+                    if (line[self.pow_index] >= int_lim) and (line[self.temp_index] <= self.icing_temperature_limit):
+                        pow_alrm = 3.0
+                    else:
+                        pow_alrm = 0.0
+                else:
+                    if (line[self.pow_index] <= int_lim) and (line[self.temp_index] <= self.icing_temperature_limit):
+                        pow_alrm = 1.0
+                    else:
+                        pow_alrm = 0.0
+            else:
+                pow_alrm = 0.0
+            pow_alarms.append((line[self.ts_index], pow_alrm, line[self.ws_index], int_pow, line[self.temp_index], line[self.pow_index], int_lim))
+        alarms = np.array(pow_alarms)
+        if time_filter:
+            filtered_alarms = self.timefilter_ice_alarms(alarms, self.icing_time)
+            return filtered_alarms
+        else:
+            return alarms
+
+    def power_loss_during_alarm(self, data, ips_alarm=False):
+        """
+        Collect the start and stop times of icing alarms and calculate the total
+        power/production loss during the icing event
+
+        counts the production loss by calculating the approximate area between
+        the estimated production curve and the actual production curve as calculated by power_alarms
+
+        :param data: data produced by the power_alarms function
+        :param ips_alarm: set to True if alarm was caused by IPS system
+        :return: a structure containing the starts and stops and losses formatted as [starttime stoptime powerloss]
+        """
+
+        datalen = np.shape(data)[0]
+        alarm_stats = []
+        if datalen > 0:
+            # calculate the times when the alarm changes on and off
+            # numpy.diff calculates array[n+1] - array[n]
+            alarm_diff = np.diff(data[:, 1])
+            # pad a zero to the beginning, unless data[0] is an alarm
+            if data[0,1] != 0.0:
+                alarm_diff = np.hstack((np.array(1), alarm_diff))
+            else:
+                alarm_diff = np.hstack((np.array(0), alarm_diff))
+
+
+            # now icing starts at times when diff == 1 and stops when diff == -1
+            starts = data[alarm_diff > 0, 0]
+            stops = data[alarm_diff < 0, 0]
+
+            num_starts = len(starts)
+            num_stops = len(stops)
+
+            max_index = min((num_starts, num_stops))
+            index = 0
+
+            # sort starts and stops into an array
+            try:
+                while (index < max_index) and (datalen > 0):
+                    try:
+                        starttime = starts[index]
+                        stoptime = stops[index]
+                        if starttime > stoptime:
+                            raise TimingError(starttime,stoptime,index)
+
+                        # pull thecorresponding start and stoptimes from real data
+                        start_index = np.argmin(np.abs(data[:, 0]-starttime))
+                        stop_index = np.argmin(np.abs(data[:, 0]-stoptime))
+
+                        loss_sum = 0
+                        ips_sum = 0
+                        for i in range(start_index, stop_index, 1):
+                            # step duration in hours
+                            step_duration = (data[i+1, 0]-data[i, 0]).total_seconds()/60.0/60.0
+                            loss_at_start = data[i, 3]-data[i, 5]
+                            loss_at_stop = data[i+1, 3]-data[i+1, 5]
+                            # if either of these is np.nan add a zero to the loss sum
+                            if np.isnan(loss_at_start) or np.isnan(loss_at_stop):
+                                loss_sum += 0.0
+                                if ips_alarm:
+                                    ips_sum += 0
+                            else:
+                                # integrate the losses using trapezoidal rule
+                                loss_sum += step_duration * ((loss_at_start + loss_at_stop)/2.0)
+                                if ips_alarm:
+                                    ips_sum += step_duration * ((data[i,7] + data[i+1,7])/2.0)
+                        mean_power_drop = np.nanmean(data[start_index:stop_index,3].astype(np.float32)-data[start_index:stop_index,5].astype(np.float32))
+                        mean_power = np.nanmean(data[start_index:stop_index,5].astype(np.float32))
+                        mean_reference_power = np.nanmean(data[start_index:stop_index,3].astype(np.float32))
+                        mean_wind_speed = np.nanmean(data[start_index:stop_index,2].astype(np.float32))
+                        mean_temperature = np.nanmean(data[start_index:stop_index,4].astype(np.float32))
+                        event_length = (data[stop_index,0]- data[start_index,0]).total_seconds()/60.0/60.0
+                        #alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature))
+                        if ips_alarm:
+                            if self.heating_power_index < 0:
+                                alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature ,0.0))
+                            else:
+                                alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature,ips_sum))
+                        else:
+                            alarm_stats.append((starttime, stoptime, loss_sum, event_length , mean_power_drop, mean_power, mean_reference_power, mean_wind_speed, mean_temperature))
+                    except TimingError as e:
+                        print("Start after stop at index {0} in {1}".format(e.index, self.id))
+                        print("start: {0}; stop: {1}".format(e.start.strftime(e.dateformat), e.stop.strftime(e.dateformat)))
+                    index += 1
+            except IndexError:
+                print("out of bounds at index: {0}".format(index))
+                print("num starts: {0}; num stops: {1}".format(num_starts, num_stops))
+
+
+        return np.array(alarm_stats, dtype=object)
+
+    def find_icing_related_stops(self, data, power_curve):
+        """
+        Finds timestamps from the data, when the turbine has stopped for whatever reason
+
+        uses filtering requirements defined in the specification document: pwr_mean< 0.005*P_rated
+
+        ToDo:
+            Should we add minimum wind speed here, if turbine stops during an icing event it's either caused by icing or low wind
+            Should we only mark the points here where wind speed is above cut-in
+
+        :param data: timeseries data of output
+        :param power_curve: power curve array used
+        :return: filtered data with stops flagged
+        """
+        filtered_data = []
+        stop_limit = self.stop_level * self.rated_power
+        # [timestamp, alarm, wind speed, reference power, temperature, power]
+        pow_alarms = self.power_alarms(data, power_curve, False) # do time filtering only once
+        for index, line in enumerate(pow_alarms):
+            # if (line[1] == 1) and (line[5] <= stop_limit) and (line[3] >= stop_limit):
+            #     line[1] = 2.0
+            # power level filter is here to avoid double classifying points to two different classes
+            if (line[1] == 1) and (line[5] <= (self.rated_power * self.power_level_filter_limit)):
+            # change this to look forward so tha tif the turbine will stop within a window of mark also the points where we
+            # are above the stop limit to belonging into the stop
+                stops = 0
+                for i in range(index, min(len(pow_alarms), index+self.stop_time)):
+                    templine = pow_alarms[i, :]
+                    if (templine[5] <= stop_limit) and (templine[3] >= stop_limit):
+                        stops += 1
+                if stops > 0:
+                    line[1] = 2.0
+                else:
+                    line[1] = 0
+            else:
+                line[1] = 0
+            filtered_data.append(line)
+
+        time_filtered_data = self.timefilter_ice_alarms(np.array(filtered_data), self.stop_time)
+        return time_filtered_data
+
+    def status_code_stops(self, data, power_curves, filter_type="stop"):
+        """
+        Flag the moments in data where the turbine status code indicates icing
+        The statuscode is defined in self.stopcodes
+
+        :param data: input data to be processed
+        :return [timestamp, alarm, wind speed, reference power, temperature, power, limit]:
+        """
+        output = []
+        for line in data:
+            flag = False
+            # for item in self.ice_stop_index:
+            #     if line[item] in self.stopcodes:
+            #         flag = True
+            if filter_type == 'stop':
+                # if (self.stop_filter_type == 2 and line[self.status_stop_index] not in self.stopcodes) or \
+                #         (self.stop_filter_type == 1 and line[self.status_stop_index] in self.stopcodes):
+                #     flag = True
+                if self.stop_filter_type == 2:
+                    flag = any([line[i] not in self.stopcodes for i in self.status_stop_index])
+                elif self.stop_filter_type == 1:
+                    flag = any([line[i] in self.stopcodes for i in self.status_stop_index])
+                else:
+                    pass
+            elif filter_type == 'ips':
+                # if (self.heating_status_type == 2 and line[self.heating_status_index] != self.heating_status_value) or \
+                #         (self.heating_status_type == 1 and line[self.heating_status_index] == self.heating_status_value):
+                #     flag=True
+                if self.heating_status_type == 2:
+                    flag = any([line[i] not in self.heating_status_value for i in self.heating_status_index])
+                elif self.heating_status_type == 1:
+                    flag = any([line[i] in self.heating_status_value for i in self.heating_status_index])
+                else:
+                    pass
+            elif filter_type == 'icing':
+                if line[self.ice_alarm_index] == self.ice_alarm_value:
+                    flag = True
+            output_line =[]
+            output_line.append(line[self.ts_index]) # 0
+            if flag:
+                if filter_type == 'stop':
+                    output_line.append(4.0)
+                elif filter_type == 'ips':
+                    output_line.append(5.0)
+                elif filter_type == 'icing':
+                    output_line.append(6.0)
+            else:
+                output_line.append(0.0) # 1
+            output_line.append(line[self.ws_index]) # 2
+            # pick index of active direction bin
+            dirbin = np.argmin(np.abs(line[self.wd_index] - self.direction_bins))
+            int_lim = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 3])
+            int_pow = np.interp(line[self.ws_index], power_curves[:, dirbin, 0], power_curves[:, dirbin, 2])
+            output_line.append(int_pow) # 3
+            output_line.append(line[self.temp_index]) # 4
+            output_line.append(line[self.pow_index]) # 5
+            output_line.append(int_lim) # 6
+            if filter_type == 'ips':
+                if self.heating_power_index < 0:
+                    output_line.append(0.0)
+                else:
+                    output_line.append(line[self.heating_power_index]) # 7
+            output.append(np.array(output_line))
+        return np.array(output)
+
+    def combine_timeseries(self, pow_alms1,stops,pow_alms2):
+        """
+        combine all different types of alarms into one big timeseries
+
+        Timeseries file combines the alarm files into one timeseries that classifies the ice cases according ot the naming convention in the documentation
+
+        1 = power loss
+        2 = stop
+        3 = overproduction
+
+        :param pow_alms1:
+        :param stops:
+        :param pow_alms2:
+        :return:
+        """
+
+        # stops timeseries longer because it uses different source data
+
+        common_indexes1 = [index1 for index1, line1 in enumerate(stops) if line1[0] in pow_alms1[:,0]]
+        common_indexes2 = [index2 for index2, line2 in enumerate(stops) if line2[0] in pow_alms2[:,0]]
+        combined_ts = stops
+        combined_ts[common_indexes1,1] += pow_alms1[:,1]
+        combined_ts[common_indexes2,1] += pow_alms2[:,1]
+        return combined_ts
+
+    def calculate_production_stats(self, data, pc, ice_alarms, ice_stops, status_stops, ips_on, ice_detection):
+        """
+        Calculates month-by-month statistics from the data.
+
+        :param data: input data used to asses production
+        :param pc: power curve used to calculate theoretical production
+        :param ice_alarms: time series of icing alarms
+        :param ice_stops: time series of icing induced stops
+        :param status_stops: time series of stops as indicated by a statuscode in the scada
+        :param ips_on: toggle if IPS is available or not
+        :param ice_detection: timeseries of icing events as detected by an ice detector
+        :return:
+        """
+
+        power_reference = self.theoretical_output_power(data,pc)
+        theoretical_production = self.calculate_production(power_reference,1)
+        actual_production = self.calculate_production(power_reference,2)
+        #pow_alarms.append((line[0], pow_alrm, line[self.ws_index], int_pow, line[self.temp_index], line[self.pow_index], int_lim))
+        iced_power_drop_events = ice_alarms[ice_alarms[:,1] == 1.0, :]
+        # iced_power_drops = np.hstack((iced_power_drop_events[:,0], iced_power_drop_events[:,3]-iced_power_drop_events[:,5]))
+        iced_power_drops_power = np.c_[iced_power_drop_events[:,0], iced_power_drop_events[:,3]-iced_power_drop_events[:,5]]
+        iced_power_drops = self.calculate_production(iced_power_drops_power,1)
+        ice_stop_events = ice_stops[ice_stops[:,1] == 2.0]
+        # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
+        iced_stops_power = np.c_[ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]]
+        iced_stops = self.calculate_production(iced_stops_power,1)
+        # status
+        if status_stops is not None:
+            status_stop_events = status_stops[status_stops[:, 1] == 4.0]
+            # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
+            status_stops_power = np.c_[status_stop_events[:,0], status_stop_events[:,3]-status_stop_events[:,5]]
+            status_stops_prod = self.calculate_production(status_stops_power,1)
+        else:
+            status_stop_events = None
+            status_stops_power = None
+            status_stops_prod = None
+
+        ##############
+        # IPS section
+        ##############
+        if ips_on is not None: # If there is no icing section IPS statistics are not calculated
+            ips_stop_events = ips_on[ips_on[:, 1] == 5.0]
+            # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
+            ips_on_power = np.c_[ips_stop_events[:,0], ips_stop_events[:,3]-ips_stop_events[:,5]]
+            ips_on_prod = self.calculate_production(ips_on_power,1)
+            ice_detection_events = ice_detection[ice_detection[:, 1] == 6.0]
+
+            #ips consumption
+            if self.heating_power_index < 0:
+                ips_self_consumption = 0.0
+            else:
+                ips_self_consumption = self.calculate_production(data,self.heating_power_index)
+
+            # iced_stops = np.hstack((ice_stop_events[:,0], ice_stop_events[:,3]-ice_stop_events[:,5]))
+            ice_detection_power = np.c_[ice_detection_events[:, 0], ice_detection_events[:, 3] - ice_detection_events[:, 5]]
+            ice_detection_prod = self.calculate_production(ice_detection_power, 1)
+
+        # print(iced_power_drops)
+        years = set([point[0].year for point in data])
+        production_statistics = []
+        for year in years:
+            theoretical_production_sums = self.one_year_month_sums(theoretical_production,year,1)
+            actual_production_sums = self.one_year_month_sums(actual_production,year,1)
+            iced_power_sums = self.one_year_month_sums(iced_power_drops,year,1)
+            ice_stop_sums = self.one_year_month_sums(iced_stops,year,1)
+            if status_stops is not None:
+                status_stop_sums = self.one_year_month_sums(status_stops_prod,year,1)
+            else:
+                status_stop_sums = np.copy(theoretical_production_sums)
+                status_stop_sums[:, 1] = 0.0
+
+            if ips_on is not None:
+                ips_on_sums = self.one_year_month_sums(ips_on_prod,year,1)
+                ice_detection_sums = self.one_year_month_sums(ice_detection_prod, year,1)
+                # the original crashed here without a heating power column, zero consumption as in the fast version
+                if self.heating_power_index < 0:
+                    ips_consumption_sums = np.copy(theoretical_production_sums)
+                    ips_consumption_sums[:, 1] = 0.0
+                else:
+                    ips_consumption_sums = self.one_year_month_sums(ips_self_consumption,year,1)
+            else:
+                print("Dummy IPS Values")
+                ips_on_sums = np.copy(theoretical_production_sums)
+                ips_on_sums[:,1] = 0.0
+                ice_detection_sums = ips_on_sums
+                ips_self_consumption = 0.0
+                ips_consumption_sums = ips_on_sums
+            for index, stat_month in enumerate(theoretical_production_sums):
+                # if theoretical_production_sums[index,0] == actual_production_sums[index,0]:
+                ice_loss = iced_power_sums[index,1] + ice_stop_sums[index,1] + ips_on_sums[index,1] + ice_detection_sums[index,1]
+                if theoretical_production_sums[index,1] == 0.0:
+                    reldiff = 0.0
+                    total_icediff = 0.0
+                    icediff = 0.0
+                    stopdiff = 0.0
+                    statusdiff = 0.0
+                    ipsdiff = 0.0
+                    iddiff = 0.0
+                else:
+                    reldiff = (theoretical_production_sums[index, 1] - actual_production_sums[index,1])/theoretical_production_sums[index, 1]
+                    icediff = (theoretical_production_sums[index, 1] - iced_power_sums[index,1])/theoretical_production_sums[index, 1]
+                    stopdiff = (theoretical_production_sums[index, 1] - ice_stop_sums[index,1])/theoretical_production_sums[index, 1]
+                    statusdiff = (theoretical_production_sums[index, 1] - status_stop_sums[index,1])/theoretical_production_sums[index, 1]
+                    ipsdiff = (theoretical_production_sums[index, 1] - ips_on_sums[index,1])/theoretical_production_sums[index, 1]
+                    iddiff = (theoretical_production_sums[index, 1] - ice_detection_sums[index,1])/theoretical_production_sums[index, 1]
+                    total_icediff = (theoretical_production_sums[index, 1] - ice_loss)/theoretical_production_sums[index, 1]
+                production_statistics.append(
+                    [theoretical_production_sums[index, 0], theoretical_production_sums[index, 1],
+                     actual_production_sums[index, 1],
+                     theoretical_production_sums[index, 1] - actual_production_sums[index, 1], reldiff,
+                     iced_power_sums[index, 1], icediff, ice_stop_sums[index, 1], stopdiff, status_stop_sums[index, 1],
+                     statusdiff, ips_on_sums[index,1], ipsdiff, ice_detection_sums[index, 1], iddiff,ice_loss, total_icediff, ips_consumption_sums[index,1]])
+        return np.array(production_statistics)
+
+
+class LegacyResultWriter(Result_file_writer):
+    """
+    Result_file_writer with the original summary and monthly statistics writers
+    """
+    def summary_statistics(self, aepc, data, reference_data, pc, alarm_timings, stop_timings, over_timings, status_timings, ice_timings, ips_timings, data_sizes):
+        """
+        Calculate summary statistics for the dataset. contains:
+            availability
+            data loss due to filtering
+            size of the reference dataset
+            hour counts for different ice classes
+            production losses due to different causes
+            Theoretical maximum production
+            observed production
+            losses due to all reasons
+            Written to a file
+    
+        :param aepc: the active aeoc object
+        :param data: data used to calculate statistics
+        :param reference_data: the reference dataset used to calculate power curve
+        :param pc: power curve structure
+        :param alarm_timings: reduced power incidents
+        :param stop_timings: icing induced stops
+        :param over_timings: overproduction incidents
+        :param data_sizes: sizes after each filtering step
+        :return: status of the write operation, full filename ,possible error
+        
+        """
+        if aepc.starttimestamp == datetime.datetime.min:
+            start_time = data[0,aepc.ts_index]
+        else:
+            start_time = aepc.starttimestamp
+        if aepc.stoptimestamp == datetime.datetime.max:
+            stop_time = data[-1,aepc.ts_index]
+        else:
+            stop_time = aepc.stoptimestamp
+        data_period = (stop_time-start_time).total_seconds()/60.0/60.0
+        reference_start = reference_data[0,aepc.ts_index]
+        reference_stop = reference_data[-1,aepc.ts_index]
+        reference_data_period = (reference_stop-reference_start).total_seconds()/60.0/60.0
+        step_size = data[1, aepc.ts_index] - data[0, aepc.ts_index]
+        #check for empty array (no stops)
+        if np.shape(stop_timings) == (0,):
+            stop_losses = 0.0
+            stop_duration = 0.0
+        else:
+            stop_losses  = np.nansum(stop_timings[:, 2])
+            stop_duration = np.nansum(stop_timings[:, 3])        
+        # check for empty
+        if np.shape(alarm_timings) == (0,):
+            icing_loss_production = 0.0
+            icing_duration = 0.0
+        else:
+            icing_loss_production = np.nansum(alarm_timings[:, 2])
+            icing_duration = np.nansum(alarm_timings[:, 3])        
+        # check for empty
+        if np.shape(over_timings) == (0,):
+            over_prod_duration = 0.0
+        else:
+            over_prod_duration = np.nansum(over_timings[:, 3])        
+        # check for empty
+        if (np.shape(status_timings) == (0,)) or (status_timings is None):
+            status_stop_duration = 0.0
+            status_stop_loss = 0.0
+        else:
+            status_stop_loss = np.nansum(status_timings[:, 2])
+            status_stop_duration = np.nansum(status_timings[:, 3])
+        if (np.shape(ice_timings) == (0,)) or (ice_timings is None):
+            ice_detection_duration = 0.0
+            ice_detection_loss = 0.0
+        else:
+            ice_detection_loss = np.nansum(ice_timings[:, 2])
+            ice_detection_duration = np.nansum(ice_timings[:, 3])
+        if (np.shape(ips_timings) == (0,)) or (ips_timings is None):
+            ips_on_duration = 0.0
+            ips_on_production_loss = 0.0
+            ips_self_consumption = 0.0
+        else:
+            ips_on_production_loss = np.nansum(ips_timings[:,2])
+            ips_on_duration = np.nansum(ips_timings[:,3])
+            ips_self_consumption = np.nansum(ips_timings[:,4])
+
+        uncertainty = aepc.power_curve_uncertainty_average(pc)
+        
+        tmax_power = aepc.theoretical_output_power(data, pc)
+        if np.shape(tmax_power) == (0,):
+            theoretical_production_sum = 0.0
+            actual_production_sum = 0.0
+            min_production_sum = 0.0
+            max_production_sum = 0.0
+            total_losses = 0.0
+            energy_based_avail = 0.0
+            icing_loss_perc = 0.0
+            stop_loss_perc = 0.0
+            icing_duration_perc = 0.0
+            stop_duration_perc = 0.0
+            over_prod_duration_perc = 0.0
+            technical_availability = 0.0
+            status_stop_loss_perc = 0.0
+            ice_detection_duration_perc = 0.0
+            ice_detection_loss_perc = 0.0
+            ips_on_duration_perc = 0.0
+            ips_on_loss_perc = 0.0
+        else:
+            theoretical_production = aepc.calculate_production(tmax_power, 1)
+            actual_production = aepc.calculate_production(tmax_power, 2)
+            production_p10 = aepc.calculate_production(tmax_power, 3)
+            production_p90 = aepc.calculate_production(tmax_power, 4)
+            min_production = aepc.calculate_production(tmax_power, 5)
+            max_production = aepc.calculate_production(tmax_power, 6)
+            theoretical_production_sum = np.nansum(theoretical_production[:, 1])
+            actual_production_sum = np.nansum(actual_production[:, 1])
+            min_production_sum = np.nansum(min_production[:, 1])
+            max_production_sum = np.nansum(max_production[:, 1])
+            production_sum_p10 = np.nansum(production_p10[:, 1])
+            production_sum_p90 = np.nansum(production_p90[:, 1])
+            production_upper_limit = max_production_sum / theoretical_production_sum * 100.0
+            production_lower_limit = min_production_sum / theoretical_production_sum * 100.0
+            production_p10_limit = production_sum_p10 / theoretical_production_sum * 100.0
+            production_p90_limit = production_sum_p90 / theoretical_production_sum * 100.0
+            total_losses = theoretical_production_sum - actual_production_sum
+            energy_based_avail = 100.0 - ((total_losses/theoretical_production_sum) * 100.0)
+            icing_loss_perc = (icing_loss_production/actual_production_sum) * 100.0
+            stop_loss_perc = (stop_losses/actual_production_sum) * 100.0
+            status_stop_loss_perc = (status_stop_loss/actual_production_sum) * 100.0
+            icing_duration_perc = (icing_duration / data_period) * 100.0
+            stop_duration_perc = (stop_duration / data_period) * 100.0
+            over_prod_duration_perc = (over_prod_duration / data_period) * 100.0
+            technical_availability = ((data_period - status_stop_duration) / data_period) * 100.0
+            ice_detection_duration_perc = (ice_detection_duration / data_period) * 100.0
+            ice_detection_loss_perc = (ice_detection_loss / actual_production_sum) * 100.0
+            ips_on_duration_perc = (ips_on_duration / data_period) * 100.0
+            ips_on_loss_perc = (ips_on_production_loss / actual_production_sum) * 100.0
+            ips_self_consumption_perc = (ips_self_consumption / actual_production_sum) * 100.0
+        # availability = aepc.count_availability(data) * 100.0
+        availability = data_sizes[0] / ((stop_time - start_time) / step_size) * 100.0
+    
+        filtered_data_size = (data_sizes[1]/data_sizes[0]) * 100.0
+        reference_data_size = (data_sizes[2]/data_sizes[0]) * 100.0
+    
+        filename_trunk = '_summary.txt'
+        full_filename = aepc.result_dir + aepc.id + filename_trunk
+        try:
+            with open(full_filename,'w') as f:
+                # f.write("Statistics from the dataset: {} \n".format(aepc.id))
+                # f.write("\n")
+                # f.write("[Generic statistics] \n")
+                # f.write("Data start: {0}, stop {1}; total: {2:.1f} hours \n"
+                        # .format(start_time.strftime("%Y-%m-%d %H:%M:%S"),stop_time.strftime("%Y-%m-%d %H:%M:%S"),data_period))
+                # f.write("Data availability: {:.1f} % \n".format(availability))
+                # f.write("Sample count in original data: {0}, after filtering: {1}, loss due to filtering: {2:.1f} % \n"
+                        # .format(data_sizes[0],data_sizes[1], data_loss))
+                # f.write("Sample count in reference data {0}, size of raw data {1:.1f} \n"
+                        # .format(data_sizes[2],reference_loss))
+                # f.write("\n")
+                # f.write("[Production] \n")
+                # f.write("Theoretical maximum production: {0:.1f}, observed power production: {1:.1f} \n"
+                        # .format(theoretical_production_sum, actual_production_sum))
+                # f.write("Total losses {0:.1f}, {1:.1f} % \n".format(total_losses, total_losses_perc))
+                # f.write("\n")
+                # f.write("[Icing] \n")
+                # f.write("Icing during production: {0:.1f} hours, {1:.1f} % of total data \n"
+                        # .format(icing_duration,icing_duration_perc))
+                # f.write("Icing induced stops: {0:.1f} hours, {1:.1f} % of total data \n"
+                        # .format(stop_duration,stop_duration_perc))
+                # f.write("Overproduction: {0:.1f} hours, {1:.1f} % of total data \n"
+                        # .format(over_prod_duration,over_prod_duration_perc))
+                # f.write("Production losses due to icing: {0:.1f}, {1:.1f} % \n"
+                        # .format(icing_loss_production, icing_loss_perc))
+                # f.write("Production losses during icing induced stops: {0:.1f}, {1:.1f} % \n"
+                             # .format(stop_losses, stop_loss_perc))
+                f.write("{heading: <{fill1}}\t {value: >{fill2}} \t{unit}\n".format(heading='Field',fill1=50,value='Value', fill2=20, unit='unit'))
+                f.write("{heading: <{fill1}}\t {value: >{fill2}} \t{unit}\n".format(heading='Dataset name',fill1=50,value=aepc.id, fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production losses due to icing',fill1=50, value=icing_loss_production, fill2=20, unit='kWh'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative production losses due to icing',fill1=50, value=icing_loss_perc, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Losses due to icing related stops',fill1=50, value=stop_losses, fill2=20, unit='kWh'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses due to icing related stops',fill1=50, value=stop_loss_perc, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Icing during production',fill1=50, value=icing_duration, fill2=20, unit='h'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Icing during production (% of total data)',fill1=50, value=icing_duration_perc, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Turbine stopped during production',fill1=50, value=stop_duration, fill2=20, unit='h'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Turbine stopped production (% of total data)',fill1=50, value=stop_duration_perc, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Over production hours',fill1=50, value=over_prod_duration, fill2=20, unit='h'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Over production hours (% of total)',fill1=50, value=over_prod_duration_perc, fill2=20, unit='%'))
+                if aepc.heated_site:
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS on hours', fill1=50, value=ips_on_duration,fill2=20, unit='h'))
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS on hours (% of total)', fill1=50, value=ips_on_duration_perc, fill2=20,unit='%'))
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Losses during IPS operation', fill1=50, value=ips_on_production_loss,fill2=20, unit='kWh'))
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses during IPS operation', fill1=50, value=ips_on_loss_perc, fill2=20,unit='%'))
+                if aepc.ice_detection:
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Ice detector icing hours',fill1=50, value=ice_detection_duration, fill2=20, unit='h'))
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Ice detector icing hours (% of total data)',fill1=50, value=ice_detection_duration_perc, fill2=20, unit='%'))
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Losses during ice detector alarms',fill1=50, value=ice_detection_loss, fill2=20, unit='h'))
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses during ice detector alarm (% of total data)',fill1=50, value=ice_detection_loss_perc, fill2=20, unit='h'))
+                if aepc.heating_power_index >= 0:
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS self consumption',fill1=50, value=ips_self_consumption, fill2=20, unit='kWh'))
+                    f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='IPS self consumption (% of total)',fill1=50, value=ips_self_consumption_perc, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='SCADA forced stops',fill1=50, value=status_stop_duration, fill2=20, unit='h'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Time Based Availability (TBA)',fill1=50, value=technical_availability, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Loss during SCADA stops',fill1=50, value=status_stop_loss, fill2=20, unit='kWh'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Relative losses during SCADA stops (% of total)',fill1=50, value=status_stop_loss_perc, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Power curve uncertainty',fill1=50, value=uncertainty, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production upper limit (std.dev)',fill1=50, value=production_upper_limit, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production lower limit (std.dev)',fill1=50, value=production_lower_limit, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production P90', fill1=50, value=production_p90_limit, fill2=20,unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Production P10', fill1=50, value=production_p10_limit, fill2=20,unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Theoretical mean production', fill1=50, value=theoretical_production_sum,fill2=20, unit='kWh'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Observed power production',fill1=50, value=actual_production_sum, fill2=20, unit='kWh'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Total Losses',fill1=50, value=total_losses, fill2=20, unit='kWh'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Energy Based Availability (EBA)',fill1=50, value=energy_based_avail, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Data start time',fill1=50, value=start_time.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Data stop time',fill1=50, value=stop_time.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Total amount of data',fill1=50, value=data_period, fill2=20, unit='h'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Reference data start time',fill1=50, value=reference_start.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}} \t{unit}\n".format(heading='Reference data stop time',fill1=50, value=reference_stop.strftime("%Y-%m-%d %H:%M:%S"), fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Total amount of data in reference dataset',fill1=50, value=reference_data_period, fill2=20, unit='h'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Data availability',fill1=50, value=availability, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}d} \t{unit}\n".format(heading='Sample count in original data',fill1=50, value=data_sizes[0], fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}d} \t{unit}\n".format(heading='Sample count in after filtering',fill1=50, value=data_sizes[1], fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Data size after filtering',fill1=50, value=filtered_data_size, fill2=20, unit='%'))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}d} \t{unit}\n".format(heading='Sample count in reference data',fill1=50, value=data_sizes[2], fill2=20, unit=' '))
+                f.write("{heading: <{fill1}}\t {value:>{fill2}.1f} \t{unit}\n".format(heading='Reference dataset as % of original data',fill1=50, value=reference_data_size, fill2=20, unit='%'))
+                f.write(" \t \t \n")
+                f.write(" \t \t \n")
+                
+                
+                
+            return True, full_filename , ''
+        except IOError as e:
+            return False, full_filename, e
+
+    def write_monthly_stats(self, data, pc, aepc, ice_events, ice_stops, status_stops, ips_on_flags, ice_detected):
+        """
+        write production loss statistics to file
+        
+        :param data: input data
+        :param pc: calculated power curve
+        :param aepc: aep counter used to calculate the stats
+        :return: status of the write operation, filename, error
+        """
+        production_statistics = aepc.calculate_production_stats(data, pc,ice_events, ice_stops, status_stops, ips_on_flags, ice_detected)
+        filename_trunk = '_production_stats.txt'
+        filename = aepc.result_dir + aepc.id + filename_trunk
+        headers = ['month', 'Theoretical production', 'Actual production', 'Total losses', 'Total losses (%)',
+                   'Production losses due to icing', 'Relative icing production loss',
+                   'Losses due to icing induced stops', 'Relative losses due to iced stops',
+                   'Losses during SCADA stops', 'Relative losses during SCADA stops',
+                   'Losses during IPS operation', 'Relative losses during IPS operation',
+                   'Losses during ice detection', 'Relative losses during ice detection',
+                   'Total icing losses', 'Relative icing losses', 'IPS consumption']
+        try:
+            with open(filename,'w') as f:
+                for item in headers:
+                    f.write(item)
+                    f.write('\t')
+                f.write('\n')
+                for line in production_statistics:
+                    for item in line:
+                        if type(item) == datetime.datetime:
+                            f.write(item.strftime('%Y-%m'))
+                            f.write('\t')
+                        else:
+                            f.write(str(item))
+                            f.write('\t')
+                    f.write('\n')
+            return True, filename, ''
+        except IOError as e:
+            return False, filename, e
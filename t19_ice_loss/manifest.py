@@ -0,0 +1,169 @@
+"""
+Manifest of farm runs, used to skip the turbines whose results are up to date
+
+For every turbine the manifest stores the fingerprints of the data file, the .ini file and the code, together with
+the result files written and the summary values. A turbine is up to date when all three fingerprints match the
+ones of its last successful run and all of its result files still exist ::
+
+    manifest = RunManifest('./results/_farm_manifest.json')
+    fingerprint = manifest.fingerprint('T1.ini')
+    if not manifest.is_current('T1.ini', fingerprint):
+        ...
+        manifest.record('T1.ini', fingerprint, outputs, summary)
+
+The data file is hashed only when its size or modification time differs from the last run, so checking an
+unchanged farm does not read the data files.
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+from .run_config import RunConfig
+
+# bytes read at a time when hashing data files
+HASH_BLOCK_SIZE = 1 << 20
+
+# scripts next to the package that the turbines are run through, part of the code version
+RUNNER_SCRIPTS = ['t19_counter.py']
+
+
+def file_digest(filename):
+    """
+    :return: hex digest of the contents of a file
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            fingerprint.update(block)
+    return fingerprint.hexdigest()
+
+
+def code_files():
+    """
+    :return: source files of the t19_ice_loss package and the runner scripts next to it that exist
+    """
+    package = os.path.dirname(os.path.abspath(__file__))
+    runners = [os.path.join(os.path.dirname(package), script) for script in RUNNER_SCRIPTS]
+    return sorted(glob.glob(os.path.join(package, '*.py'))) + [filename for filename in runners if os.path.exists(filename)]
+
+
+def code_version():
+    """
+    fingerprint of the source code of the t19_ice_loss package and of t19_counter.py, changes with any change to
+    the calculations or the result files
+    """
+    fingerprint = hashlib.blake2b(digest_size=16)
+    for filename in code_files():
+        fingerprint.update(os.path.basename(filename).encode())
+        with open(filename, 'rb') as f:
+            fingerprint.update(f.read())
+    return fingerprint.hexdigest()
+
+
+class RunManifest:
+    """
+    fingerprints and result files of the turbines of a farm, saved into a json file after every change
+    """
+    def __init__(self, filename):
+        """
+        :param filename: manifest file, read if it exists
+        """
+        self.filename = filename
+        self.entries = {}
+        self._code_version = None
+        if os.path.exists(filename):
+            try:
+                with open(filename, 'r') as f:
+                    self.entries = json.load(f)
+            except ValueError as e:
+                # a broken manifest only means that every turbine is run again
+                print("Ignoring unreadable manifest {0}: {1}".format(filename, e))
+
+    @staticmethod
+    def key(configfile):
+        return os.path.abspath(configfile)
+
+    def code_version(self):
+        if self._code_version is None:
+            self._code_version = code_version()
+        return self._code_version
+
+    def fingerprint(self, configfile, result_directory=None):
+        """
+        fingerprints of the inputs of a turbine
+
+        :param configfile: .ini file of the turbine
+        :param result_directory: result directory replacing the one of the .ini file, part of the configuration
+        :return: dict with the input, config and code fingerprints, None if the .ini file or the data file can't be read
+        """
+        try:
+            run_config = RunConfig.from_file(configfile)
+            stat = os.stat(run_config.filename)
+            with open(configfile, 'rb') as f:
+                config = hashlib.blake2b(f.read(), digest_size=16)
+        except (OSError, SystemExit):
+            return None
+        config.update(repr(result_directory).encode())
+        data_file = {'filename': os.path.abspath(run_config.filename), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        previous = self.entries.get(self.key(configfile), {}).get('input')
+        if previous is not None and all(previous.get(name) == value for name, value in data_file.items()):
+            data_file['digest'] = previous['digest']
+        else:
+            data_file['digest'] = file_digest(run_config.filename)
+        return {'input': data_file, 'config': config.hexdigest(), 'code': self.code_version()}
+
+    def is_current(self, configfile, fingerprint):
+        """
+        :return: True if the turbine was run successfully with the same inputs and all its result files exist
+        """
+        entry = self.entries.get(self.key(configfile))
+        if (entry is None) or (fingerprint is None):
+            return False
+        if (entry['input']['digest'] != fingerprint['input']['digest']) or (entry['config'] != fingerprint['config']) or \
+                (entry['code'] != fingerprint['code']):
+            return False
+        return all(os.path.exists(filename) for filename in entry['outputs'])
+
+    def record(self, configfile, fingerprint, outputs, summary=None):
+        """
+        store the result of a successful run and save the manifest
+
+        :param fingerprint: fingerprints taken before the run, see fingerprint
+        :param outputs: result files written
+        :param summary: summary record of the turbine, list of (field, value, unit)
+        """
+        if fingerprint is None:
+            return
+        entry = dict(fingerprint)
+        entry['outputs'] = list(outputs)
+        entry['summary'] = summary
+        self.entries[self.key(configfile)] = entry
+        self.save()
+
+    def forget(self, configfile):
+        """
+        remove a turbine whose run failed, so that it is run again next time
+        """
+        if self.entries.pop(self.key(configfile), None) is not None:
+            self.save()
+
+    def summary(self, configfile):
+        """
+        :return: summary record stored for the turbine, None if there is none
+        """
+        summary = self.entries.get(self.key(configfile), {}).get('summary')
+        if summary is None:
+            return None
+        return [tuple(line) for line in summary]
+
+    def save(self):
+        # written into a temporary file first so that an interrupted run does not leave a broken manifest
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        temporary = self.filename + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.entries, f, indent=4, sort_keys=True)
+        os.replace(temporary, self.filename)
@@ -0,0 +1,89 @@
+"""
+Run the result file writers of a pipeline concurrently
+
+All the calculation stages the writers depend on are evaluated first on the calling thread. After that the
+writers only read shared results and write their own files, so they can overlap: file writers run in a thread
+pool and the plots are rendered in a separate process, since matplotlib is not thread safe and the 300 dpi
+savefig easily takes longer than the rest of the outputs together.
+"""
+
+import collections
+import concurrent.futures
+import multiprocessing
+
+
+class OutputScheduler:
+    """
+    runs the output stages of a Pipeline with a limited number of concurrent writers
+    """
+    def __init__(self, max_workers=1, process_stages=('plot',)):
+        """
+        :param max_workers: maximum number of writers running at the same time, 1 runs everything in order on the calling thread
+        :param process_stages: names of the stages that are run in a separate process
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.process_stages = tuple(process_stages)
+
+    def run(self, pipeline, targets):
+        """
+        evaluate the output stages targets
+
+        writers that raise an exception when run concurrently are reported as (False, stage name, exception),
+        the other writers are not affected
+
+        :param pipeline: Pipeline containing the output stages
+        :param targets: names of the output stages
+        :return: OrderedDict of stage name: list of (status of the write operation, filename, possible error)
+        """
+        # shared inputs are calculated first, the writers only read them
+        inputs = []
+        for target in targets:
+            inputs.extend(dependency for dependency in pipeline.stages[target][1] if dependency not in inputs)
+        pipeline.run(inputs)
+        pending = [target for target in targets if target not in pipeline.results]
+        if (self.max_workers == 1) or (len(pending) < 2):
+            return pipeline.run(targets)
+
+        # daemonic processes (e.g. multiprocessing.Pool workers) can't start new processes, plot on this thread after the rest
+        process_targets = [target for target in pending if target in self.process_stages]
+        if multiprocessing.current_process().daemon:
+            process_targets = []
+        local_targets = [target for target in pending if (target in self.process_stages) and (target not in process_targets)]
+        thread_targets = [target for target in pending if target not in self.process_stages]
+
+        futures = collections.OrderedDict()
+        process_pool = None
+        if process_targets:
+            # started before the thread pool, so that the worker process is not forked while writer threads are running
+            process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=min(self.max_workers, len(process_targets)))
+            for target in process_targets:
+                futures[target] = self._submit(process_pool, pipeline, target)
+        thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+        finished = False
+        try:
+            for target in thread_targets:
+                futures[target] = self._submit(thread_pool, pipeline, target)
+            for target in local_targets:
+                pipeline.get(target)
+            for target, future in futures.items():
+                try:
+                    pipeline.results[target] = future.result()
+                except Exception as e:
+                    print("Output {0} failed: {1}".format(target, e))
+                    pipeline.results[target] = [(False, target, e)]
+                pipeline.executed.append(target)
+            finished = True
+        finally:
+            # interrupted e.g. by the time limit of a farm run: the writers not yet started are cancelled and the
+            # running ones are not waited for, so the interruption is not held up by a slow writer
+            if not finished:
+                for future in futures.values():
+                    future.cancel()
+            thread_pool.shutdown(wait=finished)
+            if process_pool is not None:
+                process_pool.shutdown(wait=finished)
+        return collections.OrderedDict((target, pipeline.results[target]) for target in targets)
+
+    def _submit(self, executor, pipeline, target):
+        function, dependencies = pipeline.stages[target]
+        return executor.submit(function, *[pipeline.results[dependency] for dependency in dependencies])
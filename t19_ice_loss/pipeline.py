@@ -0,0 +1,357 @@
+"""
+Lazy evaluation graph for the processing steps of one turbine
+
+Every intermediate result (filtered datasets, power curve, alarm time series, event lists) is a named stage
+with declared dependencies. Stages are only evaluated when something asks for them and each one is evaluated
+at most once per run, so the outputs that are switched off in the .ini file do not cost anything.
+"""
+
+import collections
+import datetime as dt
+import functools
+import time
+
+
+class Pipeline:
+    """
+    named stages with dependencies, evaluated lazily and memoized
+    """
+    def __init__(self):
+        self.stages = collections.OrderedDict()
+        self.results = {}
+        self.executed = []
+        # optional StageProfiler, records every stage evaluated through get
+        self.profiler = None
+
+    def add_stage(self, name, function, dependencies=()):
+        """
+        add a new stage into the pipeline
+
+        :param name: name of the stage
+        :param function: function that calculates the stage, called with the results of the dependencies as positional arguments
+        :param dependencies: names of the stages this one needs, in the order of the function arguments
+        """
+        if name in self.stages:
+            raise ValueError("Stage {0} defined twice".format(name))
+        self.stages[name] = (function, tuple(dependencies))
+
+    def replace_stage(self, name, function, dependencies=()):
+        """
+        replace the function of an existing stage, e.g. with a result calculated elsewhere
+
+        :param name: name of the stage
+        :param function: new function of the stage
+        :param dependencies: names of the stages the new function needs
+        """
+        if name not in self.stages:
+            raise KeyError("Unknown stage: {0}".format(name))
+        if name in self.results:
+            raise ValueError("Stage {0} has already been evaluated".format(name))
+        self.stages[name] = (function, tuple(dependencies))
+
+    def plan(self, targets):
+        """
+        list the stages that need to be evaluated to get targets, in execution order
+
+        stages that already have a result are not included.
+
+        :param targets: names of the wanted stages
+        :return: list of stage names
+        """
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if (name in order) or (name in self.results):
+                return
+            if name not in self.stages:
+                raise KeyError("Unknown stage: {0}".format(name))
+            if name in visiting:
+                raise ValueError("Circular dependency at stage {0}".format(name))
+            visiting.add(name)
+            for dependency in self.stages[name][1]:
+                visit(dependency)
+            visiting.remove(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def get(self, name):
+        """
+        result of a stage, evaluates the stage and its dependencies if needed
+
+        :param name: name of the stage
+        :return: result of the stage function
+        """
+        for stage in self.plan([name]):
+            function, dependencies = self.stages[stage]
+            args = [self.results[dependency] for dependency in dependencies]
+            if self.profiler is None:
+                self.results[stage] = function(*args)
+            else:
+                self.results[stage] = self.profiler.call(stage, function, args)
+            self.executed.append(stage)
+        return self.results[name]
+
+    def run(self, targets):
+        """
+        evaluate all targets in the given order
+
+        :param targets: names of the wanted stages
+        :return: OrderedDict of target name: result
+        """
+        return collections.OrderedDict((target, self.get(target)) for target in targets)
+
+    def describe(self, targets):
+        """
+        human readable listing of what evaluating targets would execute
+
+        :param targets: names of the wanted stages
+        :return: list of lines
+        """
+        plan = self.plan(targets)
+        lines = []
+        for number, name in enumerate(plan, 1):
+            dependencies = self.stages[name][1]
+            lines.append("{0:3d} {1:<25s} <- {2}".format(number, name, ', '.join(dependencies) if dependencies else '-'))
+        skipped = [name for name in self.stages if (name not in plan) and (name not in self.results)]
+        if skipped:
+            lines.append("    not needed: {0}".format(', '.join(skipped)))
+        return lines
+
+
+def turbine_pipeline(reader, aepc, data=None):
+    """
+    build the stages of the standard icing loss analysis of one turbine
+
+    reader and aepc need to have their options set already. Reading the data is a stage too, so nothing is
+    read from disk until some stage is evaluated.
+
+    :param reader: CSVimporter with the source file options set
+    :param aepc: AEPcounter with its options set
+    :param data: data already in memory, in the same format as CSVimporter.full_data. If given, the file is not read
+    :return: Pipeline
+    """
+    pipeline = Pipeline()
+
+    def read_data():
+        if data is not None:
+            return data
+        reader.read_data()
+        return reader.full_data
+
+    def reference(candidate, pc, power_level_filtered_data, state_filtered_data):
+        # re-do the reference dataset, include all non-iced data regardless of temperature
+        refinement_start = time.perf_counter()
+        refined_reference, refined_pc, iterations, converged = aepc.refine_reference_dataset(candidate, power_level_filtered_data, state_filtered_data, pc)
+        print("{0} : Reference dataset refined in {1} iterations ({2}) in {3:.1f} s, {4} samples".format(
+            dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), iterations, 'converged' if converged else 'not converged',
+            time.perf_counter() - refinement_start, len(refined_reference)))
+        return refined_reference, refined_pc
+
+    def icing_stops(state_filtered_data, pc):
+        if aepc.stop_filter_type in (0, 1, 2):
+            return aepc.find_icing_related_stops(state_filtered_data, pc)
+        return None
+
+    def status_stops(time_limited_data, pc):
+        if aepc.stop_filter_type in (1, 2):
+            return aepc.status_code_stops(time_limited_data, pc)
+        return None
+
+    def ips_on_flags(time_limited_data, pc):
+        if aepc.heated_site:
+            return aepc.status_code_stops(time_limited_data, pc, filter_type='ips')
+        return None
+
+    def ice_detected(time_limited_data, pc):
+        if aepc.ice_detection:
+            return aepc.status_code_stops(time_limited_data, pc, filter_type='icing')
+        return None
+
+    def timings(alarms, **kwargs):
+        if alarms is None:
+            return None
+        return aepc.power_loss_during_alarm(alarms, **kwargs)
+
+    pipeline.add_stage('data', read_data)
+    # calculate air density correction based on site height using the formula from the spec
+    pipeline.add_stage('corrected data', aepc.air_density_correction, ['data'])
+    pipeline.add_stage('time limited data', aepc.time_filter_data, ['corrected data'])
+    pipeline.add_stage('state filtered data', aepc.state_filter_data, ['time limited data'])
+    # remove datapoints where output power is below the power level filter
+    pipeline.add_stage('power level filtered data', aepc.power_level_filter, ['state filtered data'])
+    # only use the part of data where temperature is above the reference temperature for the power curve
+    # use the full dataset for reference, time limited for loss calculation
+    pipeline.add_stage('state reference data', aepc.state_filter_data, ['corrected data'])
+    pipeline.add_stage('initial reference data', lambda data: aepc.power_level_filter(aepc.temperature_filter_data(data)), ['state reference data'])
+    pipeline.add_stage('initial power curve', aepc.count_power_curves, ['initial reference data'])
+    if aepc.reference_iterations > 0:
+        pipeline.add_stage('reference candidate', aepc.power_level_filter, ['state reference data'])
+        pipeline.add_stage('reference', reference, ['reference candidate', 'initial power curve', 'power level filtered data', 'state filtered data'])
+    else:
+        pipeline.add_stage('reference', lambda data, pc: (data, pc), ['initial reference data', 'initial power curve'])
+    pipeline.add_stage('reference data', lambda result: result[0], ['reference'])
+    pipeline.add_stage('power curve', lambda result: result[1], ['reference'])
+    # save data sizes into a list in order, original, filtered, reference
+    pipeline.add_stage('data sizes', lambda data, filtered, ref: [len(data), len(filtered), len(ref)], ['data', 'state filtered data', 'reference data'])
+    # find power drops, over production and stoppages as defined in the specification
+    pipeline.add_stage('power alarms', aepc.power_alarms, ['power level filtered data', 'power curve'])
+    pipeline.add_stage('over production alarms', lambda data, pc: aepc.power_alarms(data, pc, over=True), ['power level filtered data', 'power curve'])
+    pipeline.add_stage('stops', icing_stops, ['state filtered data', 'power curve'])
+    pipeline.add_stage('status stops', status_stops, ['time limited data', 'power curve'])
+    pipeline.add_stage('ips on flags', ips_on_flags, ['time limited data', 'power curve'])
+    pipeline.add_stage('ice detected', ice_detected, ['time limited data', 'power curve'])
+    # start and stop times of the alarms and the production losses during them
+    pipeline.add_stage('alarm timings', timings, ['power alarms'])
+    pipeline.add_stage('over timings', timings, ['over production alarms'])
+    pipeline.add_stage('stop timings', timings, ['stops'])
+    pipeline.add_stage('status timings', timings, ['status stops'])
+    pipeline.add_stage('ice timings', timings, ['ice detected'])
+    pipeline.add_stage('ips timings', lambda alarms: timings(alarms, ips_alarm=True), ['ips on flags'])
+    # summary and calendar statistics
+    pipeline.add_stage('summary values', aepc.summary_values, ['time limited data', 'reference data', 'power curve', 'alarm timings', 'stop timings',
+                                                               'over timings', 'status timings', 'ice timings', 'ips timings', 'data sizes'])
+    pipeline.add_stage('production series', aepc.production_step_series, ['time limited data', 'power curve', 'power alarms', 'stops',
+                                                                          'status stops', 'ips on flags', 'ice detected'])
+    return pipeline
+
+
+def timestamp():
+    return dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def render_standard_plots(rfw, aepc, temperature_corrected_data, pc, pow_alms1, pow_alms2, stops, data_sizes, alarm_timings, over_timings, stop_timings, ips_on_flags):
+    """
+    draw and save the standard plots, module level so that it can be run in a separate process
+
+    :return: list with one (status of the write operation, filename, possible error)
+    """
+    pc_filename = aepc.result_dir + aepc.id + '_pc.png'
+    try:
+        rfw.generate_standard_plots(temperature_corrected_data, pc, aepc, pow_alms1, pow_alms2, stops, data_sizes,
+                                    alarm_timings, over_timings, stop_timings, ips_on_flags if aepc.heated_site else None, True)
+        return [(True, pc_filename, '')]
+    except (IOError, ValueError) as e:
+        print('{0} : Error drawing plots: {1}'.format(timestamp(), e))
+        return [(False, pc_filename, e)]
+
+
+def add_output_stages(pipeline, reader, aepc, rfw):
+    """
+    add the result file writers as stages of the pipeline, one stage for each option of the Output section
+    each writer stage returns a list of (status of the write operation, filename, possible error)
+
+    :param pipeline: pipeline created with turbine_pipeline
+    :param reader: active CSVimporter
+    :param aepc: active AEPcounter
+    :param rfw: active Result_file_writer
+    """
+    def write_summary(values):
+        summary_status, summary_filename, summary_error = rfw.write_summary(aepc, values)
+        if summary_status:
+            print("{0} : Summary written successfully into: {1}".format(timestamp(), summary_filename))
+        else:
+            print("{0} : Problem writing summary: {1}".format(timestamp(), summary_error))
+        return [(summary_status, summary_filename, summary_error)]
+
+    def write_power_curve(pc):
+        power_curve_status, pc_filename, pc_error = rfw.write_power_curve(aepc, pc)
+        if power_curve_status:
+            print('{0} : Power curve written successfully into: {1}'.format(timestamp(), pc_filename))
+        else:
+            print('{0} : Problem writing power curve: {1}'.format(timestamp(), pc_error))
+        return [(power_curve_status, pc_filename, pc_error)]
+
+    def write_icing_events(alarm_timings, stop_timings, status_timings, ips_timings, ice_timings):
+        # TODO: write these to one file
+        event_files = [('_losses.csv', alarm_timings, 'Icing loss statistics', 'icing loss statistics'),
+                       ('_stops.csv', stop_timings, 'Icing stops statistics', 'icing stop statistics')]
+        if aepc.status_stop_index[0] > 0:
+            event_files.append(('_status.csv', status_timings, 'Status Code statistics', 'Status Code statistics'))
+        if aepc.heated_site:
+            event_files.append(('_ips.csv', ips_timings, 'Status Code statistics', 'Status Code statistics'))
+        if aepc.ice_detection:
+            event_files.append(('_ice_det.csv', ice_timings, 'Status Code statistics', 'Status Code statistics'))
+        results = []
+        for trunk, event_timings, description, error_description in event_files:
+            filename = aepc.result_dir + aepc.id + trunk
+            write_status, write_error = rfw.write_alarm_timings(filename, event_timings)
+            if write_status:
+                print('{0} : {1} written successfully into: {2}'.format(timestamp(), description, filename))
+            else:
+                print('{0} : Error writing {1}: {2}'.format(timestamp(), error_description, write_error))
+            results.append((write_status, filename, write_error))
+        return results
+
+    def write_production_stats(time_limited_data, pc, pow_alms1, stops, status_stops, ips_on_flags, ice_detected, series):
+        #TODO: make ice detector and IPS OPTIONAL, Now the code inserts dummy values for IPS. Not a clean solution
+        stat_results = rfw.write_production_stats(time_limited_data, pc, aepc, pow_alms1, stops, status_stops, ips_on_flags, ice_detected,
+                                                  rfw.production_stats_granularities(), series)
+        for stat_status, stat_filename, stat_write_error in stat_results:
+            if stat_status:
+                print('{0} : Icing loss statistics written into: {1}'.format(timestamp(), stat_filename))
+            else:
+                print('{0} : Error writing loss timeseries: {1}'.format(timestamp(), stat_write_error))
+        return stat_results
+
+    def write_event_index(alarm_timings, stop_timings, over_timings, status_timings, ice_timings, ips_timings):
+        event_indexes = aepc.event_indexes(alarm_timings, stop_timings, over_timings, status_timings, ice_timings, ips_timings)
+        index_status, index_filename, index_error = rfw.write_event_indexes(aepc, event_indexes)
+        if index_status:
+            print('{0} : Event index written into: {1}'.format(timestamp(), index_filename))
+        else:
+            print('{0} : Error writing event index: {1}'.format(timestamp(), index_error))
+        return [(index_status, index_filename, index_error)]
+
+    def write_alarm_time_series(pow_alms1, stops, pow_alms2):
+        combined_ts = aepc.combine_timeseries(pow_alms1, stops, pow_alms2)
+        alarm_timeseries_filename = aepc.result_dir + aepc.id + '_alarms.csv'
+        ts_write_status, ts_write_error = rfw.write_alarm_file(alarm_timeseries_filename, combined_ts)
+        if ts_write_status:
+            print('{0} : Time series written successfully into: {1}'.format(timestamp(), alarm_timeseries_filename))
+        else:
+            print('{0} : Error writing time series file: {1}'.format(timestamp(), ts_write_error))
+        return [(ts_write_status, alarm_timeseries_filename, ts_write_error)]
+
+    def write_filtered_raw_data(time_limited_data, pc):
+        filtered_data_filename = aepc.result_dir + aepc.id + '_filtered.csv'
+        # insert_fault_codes edits the data in place, work on a copy so the shared stage result stays intact
+        new_data = rfw.insert_fault_codes(time_limited_data.copy(), aepc, reader)
+        raw_write_status, raw_write_error = rfw.write_time_series_file(filtered_data_filename, new_data, reader.headers, aepc, pc)
+        if raw_write_status:
+            print('{0} : Filtered data written succesfully to: {1}'.format(timestamp(), filtered_data_filename))
+        else:
+            print('{0} : Error writeing raw data: {1}'.format(timestamp(), raw_write_error))
+        return [(raw_write_status, filtered_data_filename, raw_write_error)]
+
+    pipeline.add_stage('summary', write_summary, ['summary values'])
+    pipeline.add_stage('power curve file', write_power_curve, ['power curve'])
+    pipeline.add_stage('icing events', write_icing_events, ['alarm timings', 'stop timings', 'status timings', 'ips timings', 'ice timings'])
+    pipeline.add_stage('production stats', write_production_stats, ['time limited data', 'power curve', 'power alarms', 'stops', 'status stops',
+                                                                    'ips on flags', 'ice detected', 'production series'])
+    pipeline.add_stage('event index', write_event_index, ['alarm timings', 'stop timings', 'over timings', 'status timings', 'ice timings', 'ips timings'])
+    pipeline.add_stage('alarm time series', write_alarm_time_series, ['power alarms', 'stops', 'over production alarms'])
+    pipeline.add_stage('filtered raw data', write_filtered_raw_data, ['time limited data', 'power curve'])
+    pipeline.add_stage('plot', functools.partial(render_standard_plots, rfw, aepc), ['corrected data', 'power curve', 'power alarms', 'over production alarms', 'stops', 'data sizes',
+                                      'alarm timings', 'over timings', 'stop timings', 'ips on flags'])
+
+
+def output_targets(rfw):
+    """
+    output stages that are switched on in the Output section of the .ini file, in the order they are written
+
+    :param rfw: Result_file_writer with the output options set
+    :return: list of stage names
+    """
+    flags = [('summary', rfw.summaryfile_write),
+             ('power curve file', rfw.power_curve_write),
+             ('icing events', rfw.icing_events_write),
+             ('production stats', rfw.icing_events_write),
+             ('event index', rfw.event_index_write),
+             ('alarm time series', rfw.alarm_time_series_file_write),
+             ('filtered raw data', rfw.filtered_raw_data_write),
+             ('plot', rfw.pc_plot_picture)]
+    return [name for name, enabled in flags if enabled]
@@ -0,0 +1,127 @@
+"""
+Per stage timing and memory profile of a pipeline run
+"""
+
+import collections
+import json
+import time
+import tracemalloc
+
+import numpy as np
+
+
+def row_count(value):
+    """
+    number of rows in a stage argument or result, None for values that are not arrays
+
+    :param value: any stage argument or result
+    :return: row count or None
+    """
+    if isinstance(value, np.ndarray):
+        return int(value.shape[0]) if value.ndim > 0 else None
+    return None
+
+
+class StageProfiler:
+    """
+    records wall time, CPU time, rows in and out and optionally peak traced memory of every evaluated pipeline stage
+
+    the memory is traced with tracemalloc, which slows down numpy heavy stages many times over, so it is only traced
+    on request and the times of such a run are not representative. Take the times from a run without memory tracing.
+    Time spent in a stage includes everything its function calls, but not the stages it depends on.
+    """
+    def __init__(self, memory=False):
+        """
+        :param memory: if True, trace the peak memory of every stage, peak_memory is None otherwise
+        """
+        self.memory = memory
+        self.records = []
+        self.started_tracing = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def call(self, name, function, args):
+        """
+        run one stage function and record its profile
+
+        :param name: stage name
+        :param function: stage function
+        :param args: results of the dependencies
+        :return: result of function
+        """
+        self.start()
+        if self.memory:
+            # reset_peak is new in python 3.9, on older versions the peak can include earlier stages
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = function(*args)
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+        peak_memory = None
+        if self.memory:
+            peak_memory = max(0, tracemalloc.get_traced_memory()[1] - memory_start)
+        rows_in = [row_count(arg) for arg in args]
+        rows_in = [rows for rows in rows_in if rows is not None]
+        self.records.append(collections.OrderedDict([('stage', name),
+                                                     ('wall_time', wall_time),
+                                                     ('cpu_time', cpu_time),
+                                                     ('rows_in', max(rows_in) if rows_in else None),
+                                                     ('rows_out', row_count(result)),
+                                                     ('peak_memory', peak_memory)]))
+        return result
+
+    def report(self, run_id=''):
+        """
+        :param run_id: dataset id
+        :return: profile as a dictionary that can be dumped as json
+        """
+        return collections.OrderedDict([('id', run_id),
+                                        ('memory_traced', self.memory),
+                                        ('total_wall_time', sum(record['wall_time'] for record in self.records)),
+                                        ('total_cpu_time', sum(record['cpu_time'] for record in self.records)),
+                                        ('stages', self.records)])
+
+    def table(self):
+        """
+        human readable profile table, one line per stage
+
+        :return: list of lines
+        """
+        lines = ["{0:<26s} {1:>10s} {2:>10s} {3:>10s} {4:>10s} {5:>12s}".format('stage', 'wall [s]', 'cpu [s]', 'rows_in', 'rows_out', 'peak [MiB]')]
+        for record in self.records:
+            lines.append("{0:<26s} {1:>10.3f} {2:>10.3f} {3:>10s} {4:>10s} {5:>12s}".format(
+                record['stage'], record['wall_time'], record['cpu_time'],
+                '-' if record['rows_in'] is None else str(record['rows_in']),
+                '-' if record['rows_out'] is None else str(record['rows_out']),
+                '-' if record['peak_memory'] is None else '{0:.1f}'.format(record['peak_memory'] / 2.0 ** 20)))
+        report = self.report()
+        lines.append("{0:<26s} {1:>10.3f} {2:>10.3f}".format('total', report['total_wall_time'], report['total_cpu_time']))
+        if self.memory:
+            lines.append("times include the memory tracing overhead")
+        return lines
+
+    def write(self, filename, run_id=''):
+        """
+        save the profile as json
+
+        :param filename: output filename
+        :param run_id: dataset id
+        :return: status of the write operation, filename, possible error
+        """
+        try:
+            with open(filename, 'w') as f:
+                json.dump(self.report(run_id), f, indent=2)
+            return True, filename, ''
+        except IOError as e:
+            return False, filename, e
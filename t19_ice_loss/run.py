@@ -0,0 +1,302 @@
+"""
+Programmatic entry point: run the icing loss analysis on data in memory and get the results back as python objects
+
+    run_config = RunConfig.from_dict({...})
+    result = analyse(data, run_config)
+    result.summary['Production losses due to icing']
+    result.production_stats('month')
+    result.write()  # optional, writes the outputs enabled in the config
+
+Results are calculated on first access, so only what is asked for gets calculated.
+"""
+
+import collections
+import os
+
+from .aep_counter import AEPcounter
+from .data_file_handler import CSVimporter
+from .data_file_handler import Result_file_writer
+from .output_scheduler import OutputScheduler
+from .pipeline import add_output_stages
+from .pipeline import output_targets
+from .pipeline import turbine_pipeline
+from .profiler import StageProfiler
+
+
+class RunResult:
+    """
+    results of one turbine run
+
+    Arrays are in the same formats as the return values of the corresponding AEPcounter methods.
+    """
+    def __init__(self, run_config, reader, aepc, pipeline):
+        """
+        :param run_config: RunConfig used for the run
+        :param reader: CSVimporter holding the source options and headers
+        :param aepc: AEPcounter with its options set
+        :param pipeline: pipeline created with turbine_pipeline for reader and aepc
+        """
+        self.run_config = run_config
+        self.reader = reader
+        self.aepc = aepc
+        self.pipeline = pipeline
+        self.rfw = Result_file_writer()
+        self.rfw.set_output_file_options_from_config(run_config)
+        add_output_stages(self.pipeline, reader, aepc, self.rfw)
+        if self.rfw.profile_write or self.rfw.profile_memory:
+            self.enable_profile(self.rfw.profile_memory)
+
+    @property
+    def id(self):
+        return self.aepc.id
+
+    @property
+    def data(self):
+        return self.pipeline.get('corrected data')
+
+    @property
+    def time_limited_data(self):
+        return self.pipeline.get('time limited data')
+
+    @property
+    def reference_data(self):
+        return self.pipeline.get('reference data')
+
+    @property
+    def power_curve(self):
+        return self.pipeline.get('power curve')
+
+    @property
+    def data_sizes(self):
+        return self.pipeline.get('data sizes')
+
+    @property
+    def power_alarms(self):
+        return self.pipeline.get('power alarms')
+
+    @property
+    def over_production_alarms(self):
+        return self.pipeline.get('over production alarms')
+
+    @property
+    def stops(self):
+        return self.pipeline.get('stops')
+
+    @property
+    def status_stops(self):
+        return self.pipeline.get('status stops')
+
+    @property
+    def ips_on_flags(self):
+        return self.pipeline.get('ips on flags')
+
+    @property
+    def ice_detected(self):
+        return self.pipeline.get('ice detected')
+
+    @property
+    def alarm_timings(self):
+        return self.pipeline.get('alarm timings')
+
+    @property
+    def stop_timings(self):
+        return self.pipeline.get('stop timings')
+
+    @property
+    def over_timings(self):
+        return self.pipeline.get('over timings')
+
+    @property
+    def status_timings(self):
+        return self.pipeline.get('status timings')
+
+    @property
+    def ice_timings(self):
+        return self.pipeline.get('ice timings')
+
+    @property
+    def ips_timings(self):
+        return self.pipeline.get('ips timings')
+
+    @property
+    def events(self):
+        """
+        event tables by category, same categories as in AEPcounter.event_indexes, None for categories that are not in use
+
+        :return: OrderedDict of category: event array formatted as [starttime, stoptime, loss, duration, ...]
+        """
+        return collections.OrderedDict([('losses', self.alarm_timings), ('stops', self.stop_timings), ('over', self.over_timings),
+                                        ('status', self.status_timings), ('ice_det', self.ice_timings), ('ips', self.ips_timings)])
+
+    @property
+    def event_indexes(self):
+        return self.aepc.event_indexes(self.alarm_timings, self.stop_timings, self.over_timings, self.status_timings, self.ice_timings, self.ips_timings)
+
+    @property
+    def summary(self):
+        """
+        summary statistics, same fields as in the summary file
+
+        :return: OrderedDict of field name: value
+        """
+        return collections.OrderedDict((heading, value) for heading, (value, unit) in self.summary_with_units.items())
+
+    @property
+    def summary_with_units(self):
+        """
+        :return: OrderedDict of field name: (value, unit)
+        """
+        return self.pipeline.get('summary values')
+
+    def production_stats(self, granularity='month'):
+        """
+        production and loss statistics per calendar period, see AEPcounter.calculate_production_stats
+
+        :param granularity: 'month', 'day', 'week' or 'season'
+        :return: array of statistics, one row per period
+        """
+        return self.aepc.calculate_production_stats(self.time_limited_data, self.power_curve, self.power_alarms, self.stops, self.status_stops,
+                                                    self.ips_on_flags, self.ice_detected, granularity, self.pipeline.get('production series'))
+
+    @property
+    def monthly_stats(self):
+        return self.production_stats('month')
+
+    @property
+    def alarm_time_series(self):
+        """
+        combined time series of power alarms, stops and over production, as written into the alarm time series file
+        """
+        return self.aepc.combine_timeseries(self.power_alarms, self.stops, self.over_production_alarms)
+
+    @property
+    def alarm_classification(self):
+        """
+        one ice case per sample of the alarm time series, see AEPcounter.classify_timeseries
+        """
+        return self.aepc.classify_timeseries(self.power_alarms, self.stops, self.over_production_alarms)
+
+    def enable_profile(self, memory=False):
+        """
+        record time and optionally memory use of every stage evaluated from now on, see StageProfiler
+
+        :param memory: if True, also trace the peak memory of the stages, which makes the recorded times much longer
+        """
+        if self.pipeline.profiler is None:
+            self.pipeline.profiler = StageProfiler(memory)
+
+    @property
+    def profile(self):
+        """
+        :return: StageProfiler of the run, None if profiling is not enabled
+        """
+        return self.pipeline.profiler
+
+    def write_profile(self):
+        """
+        save the stage profile into <id>_profile.json in the result directory
+
+        :return: status of the write operation, filename, possible error
+        """
+        self.pipeline.profiler.stop()
+        return self.pipeline.profiler.write(os.path.join(self.aepc.result_dir, self.id + '_profile.json'), self.id)
+
+    def output_targets(self):
+        """
+        :return: names of the output stages enabled in the Output section of the configuration
+        """
+        return output_targets(self.rfw)
+
+    def describe(self, targets=None):
+        """
+        list the stages that writing targets would still execute
+
+        :param targets: output stage names, enabled outputs by default
+        :return: list of lines
+        """
+        if targets is None:
+            targets = self.output_targets()
+        return self.pipeline.describe(targets)
+
+    def write(self, targets=None, max_workers=None):
+        """
+        write result files into the result directory of the configuration
+
+        :param targets: output stage names, enabled outputs by default
+        :param max_workers: number of outputs written concurrently, 'output workers' of the configuration by default, always 1 when profiling
+        :return: OrderedDict of output name: list of (status of the write operation, filename, possible error)
+        """
+        if targets is None:
+            targets = self.output_targets()
+        if max_workers is None:
+            max_workers = self.rfw.output_workers
+        if self.pipeline.profiler is not None:
+            # concurrent writers would bypass the profiler and mix up each others memory peaks
+            max_workers = 1
+        if not os.path.exists(self.aepc.result_dir):
+            os.makedirs(self.aepc.result_dir)
+        return OutputScheduler(max_workers).run(self.pipeline, targets)
+
+
+def setup_counter(run_config, reader):
+    # textual fault codes in the config are translated with the codes found in the data, if those are not known yet
+    # the codes are numbered provisionally and translated again once the data is read, see analyse_file
+    aepc = AEPcounter()
+    if reader.replace_faults:
+        aepc.fault_dict = reader.fault_dict
+    aepc.set_options_from_config(run_config)
+    return aepc
+
+
+def analyse(data, run_config, headers=None, fault_dict=None):
+    """
+    analyse a dataset that is already in memory
+
+    :param data: numpy object array in the same format as CSVimporter.full_data, timestamps as datetime.datetime
+    :param run_config: RunConfig, the Source file options that concern reading the file are not used
+    :param headers: column names, used when writing the filtered raw data
+    :param fault_dict: textual fault code: number used in data, needed if replace fault codes is set in the config
+    :return: RunResult
+    """
+    reader = CSVimporter()
+    reader.read_file_options_from_config(run_config)
+    if reader.replace_faults:
+        if fault_dict is None:
+            raise ValueError("replace fault codes is set, fault_dict with the codes used in data is needed")
+        reader.fault_dict = fault_dict
+    reader.full_data = data
+    reader.headers = list(headers) if headers is not None else []
+    aepc = setup_counter(run_config, reader)
+    return RunResult(run_config, reader, aepc, turbine_pipeline(reader, aepc, data))
+
+
+def analyse_file(run_config):
+    """
+    analyse the data file given in the configuration, the file is read when the first result is needed
+
+    with replace fault codes set, the fault codes are also processed and saved only then, and the textual codes in
+    the options of the AEPcounter are final once the data stage has been evaluated
+
+    :param run_config: RunConfig
+    :return: RunResult
+    """
+    reader = CSVimporter()
+    reader.read_file_options_from_config(run_config)
+    aepc = setup_counter(run_config, reader)
+    pipeline = turbine_pipeline(reader, aepc)
+    if reader.replace_faults:
+        def read_data():
+            # the fault codes found in the data are also saved into the result directory
+            if not os.path.exists(reader.result_dir):
+                os.makedirs(reader.result_dir)
+            reader.process_fault_codes()
+            # the textual codes of the configuration were translated before the codes of the data were known
+            aepc.fault_dict = reader.fault_dict
+            aepc.set_data_options_from_config(run_config)
+            if run_config.has_icing:
+                aepc.set_ips_options_from_config(run_config)
+            reader.read_data()
+            return reader.full_data
+
+        pipeline.replace_stage('data', read_data)
+    return RunResult(run_config, reader, aepc, pipeline)
@@ -0,0 +1,261 @@
+"""
+Parsed and validated run configuration
+
+The .ini file (or a dictionary with the same sections and options) is read and type checked once. The
+resulting RunConfig is then handed to CSVimporter, AEPcounter and Result_file_writer, so none of them
+need to open the file again. See the documentation for the full listing of options.
+"""
+
+import configparser
+import datetime
+import sys
+
+
+class RunConfig:
+    """
+    typed settings of one turbine run, attribute names follow the names used in the classes that use them
+    """
+    # default values of the optional settings, same as listed in the documentation
+    fallbacks = {
+        'Source file': {'delimiter': ',',
+                        'quotechar': 'NONE',
+                        'datetime format': '%Y-%m-%d %H:%M:%S',
+                        'datetime extra char': '0',
+                        'replace fault codes': 'False',
+                        'farm columns': 'NONE'},
+        'Output': {'result directory': '.',
+                   'summary': 'True',
+                   'plot': 'True',
+                   'alarm time series': 'False',
+                   'filtered raw data': 'False',
+                   'icing events': 'False',
+                   'power curve': 'True',
+                   'daily stats': 'False',
+                   'weekly stats': 'False',
+                   'seasonal stats': 'False',
+                   'event index': 'False',
+                   'output workers': '1',
+                   'plot mode': 'scatter',
+                   'plot point budget': '20000',
+                   'profile': 'False',
+                   'profile memory': 'False'},
+        'Data Structure': {'status code stop value': '0',
+                           'status index': '-1',
+                           'maximum wind speed': '20'},
+        'Binning': {'minimum wind speed': '0',
+                    'maximum wind speed': '20',
+                    'wind speed bin size': '1',
+                    'wind direction bin size': '360',
+                    'lookup table resolution': '0'},
+        'Filtering': {'power drop limit': '10',
+                      'overproduction limit': '90',
+                      'power level filter': '0.01',
+                      'temperature filter': '1',
+                      'reference temperature': '3',
+                      'icing time': '3',
+                      'stop filter type': '0',
+                      'stop limit multiplier': '0.005',
+                      'stop time filter': '6',
+                      'statefilter type': '1',
+                      'min bin size': '36',
+                      'distance filter': 'True',
+                      'start time': 'None',
+                      'stop time': 'None',
+                      'reference iterations': '0'},
+    }
+
+    def __init__(self, config, source='configuration'):
+        """
+        parse a ConfigParser into typed values, exits on missing mandatory options or values of wrong type
+
+        :param config: configparser.ConfigParser with the settings read in
+        :param source: name of the settings source used in error messages, usually the filename
+        """
+        self.source = source
+        self.config = config
+        try:
+            self._parse_source_file(config)
+            self._parse_data_structure(config)
+            self._parse_output(config)
+            self._parse_binning(config)
+            self._parse_filtering(config)
+            self._parse_icing(config)
+        except configparser.NoOptionError as missing_value:
+            print("missing config option in {0}: {1}".format(source, missing_value))
+            sys.exit(1)
+        except configparser.NoSectionError as missing_section:
+            print("missing config section in {0}: {1}".format(source, missing_section))
+            sys.exit(1)
+        except ValueError as wrong_value:
+            print("Wrong type of value in {0}: {1}".format(source, wrong_value))
+            sys.exit(1)
+
+    @classmethod
+    def from_file(cls, filename):
+        """
+        read and validate an .ini file
+
+        :param filename: name and path of the .ini file
+        :return: RunConfig
+        """
+        config = configparser.ConfigParser()
+        if not config.read(filename):
+            print("config file {0} not found".format(filename))
+            sys.exit(1)
+        return cls(config, filename)
+
+    @classmethod
+    def from_dict(cls, options, source='dictionary'):
+        """
+        validate settings given as a dictionary of sections, e.g. {'Source file': {'id': 'T1', ...}, 'Data Structure': {...}}
+
+        the sections and option names are the same as in the .ini file, values can be strings or python values
+        values are taken as they are, without the %-interpolation done for .ini files
+
+        :param options: dictionary of section name: dictionary of option name: value
+        :param source: name of the settings source used in error messages
+        :return: RunConfig
+        """
+        config = configparser.ConfigParser(interpolation=None)
+        config.read_dict({section: {option: str(value) for option, value in section_options.items()}
+                          for section, section_options in options.items()})
+        return cls(config, source)
+
+    def _get(self, config, section, option, **kwargs):
+        if (section in self.fallbacks) and (option in self.fallbacks[section]):
+            return config.get(section, option, fallback=self.fallbacks[section][option], **kwargs)
+        return config.get(section, option, **kwargs)
+
+    def _getboolean(self, config, section, option):
+        return config.getboolean(section, option, fallback=config.BOOLEAN_STATES[self.fallbacks[section][option].lower()])
+
+    def _parse_source_file(self, config):
+        self.id = self._get(config, 'Source file', 'id')
+        self.filename = self._get(config, 'Source file', 'filename')
+        delimiter = self._get(config, 'Source file', 'delimiter')
+        if delimiter == 'TAB':
+            self.delim = '\t'
+        else:
+            self.delim = delimiter
+        quot_char = self._get(config, 'Source file', 'quotechar')
+        if quot_char.upper() == 'NONE':
+            self.quote_char = None
+        else:
+            self.quote_char = quot_char
+        self.dt_format = self._get(config, 'Source file', 'datetime format', raw=True)
+        self.dt_extra_char = int(self._get(config, 'Source file', 'datetime extra char'))
+        self.fault_columns = [int(column_index) for column_index in self._get(config, 'Source file', 'fault columns').split(',')]
+        self.replace_faults = self._getboolean(config, 'Source file', 'replace fault codes')
+        skip_column_string = self._get(config, 'Source file', 'skip columns')
+        if skip_column_string == "NONE":
+            self.skip_columns = []
+        else:
+            self.skip_columns = [int(column_index) for column_index in skip_column_string.split(',')]
+        # columns of a wide farm file in the order of the turbine's own columns, see t19_ice_loss.farm
+        farm_column_string = self._get(config, 'Source file', 'farm columns')
+        if farm_column_string.upper() == 'NONE':
+            self.farm_columns = None
+        else:
+            self.farm_columns = [int(column_index) for column_index in farm_column_string.split(',')]
+
+    def _codes(self, raw, textual):
+        # status codes stay as text when they are replaced with the fault codes found in the data
+        if textual:
+            return raw.split(',')
+        return [int(code) for code in raw.split(',')]
+
+    def _parse_data_structure(self, config):
+        self.ts_index = int(self._get(config, 'Data Structure', 'timestamp index'))
+        self.ws_index = int(self._get(config, 'Data Structure', 'wind speed index'))
+        self.wd_index = int(self._get(config, 'Data Structure', 'wind direction index'))
+        self.temp_index = int(self._get(config, 'Data Structure', 'temperature index'))
+        self.pow_index = int(self._get(config, 'Data Structure', 'power index'))
+        self.rated_power = float(self._get(config, 'Data Structure', 'rated power'))
+        self.state_index = [int(column_index) for column_index in self._get(config, 'Data Structure', 'state index').split(',')]
+        self.site_elevation = float(self._get(config, 'Data Structure', 'site elevation'))
+        # normal state can be given as text or as a list of codes
+        self.normal_state = self._codes(self._get(config, 'Data Structure', 'normal state'), self.replace_faults)
+        self.stopcodes = self._codes(self._get(config, 'Data Structure', 'status code stop value'), self.replace_faults)
+        self.status_stop_index = [int(code) for code in self._get(config, 'Data Structure', 'status index').split(',')]
+        self.power_curve_plot_max = int(self._get(config, 'Data Structure', 'maximum wind speed'))
+
+    def _parse_output(self, config):
+        self.result_dir = self._get(config, 'Output', 'result directory')
+        self.summaryfile_write = self._getboolean(config, 'Output', 'summary')
+        self.pc_plot_picture = self._getboolean(config, 'Output', 'plot')
+        self.alarm_time_series_file_write = self._getboolean(config, 'Output', 'alarm time series')
+        self.filtered_raw_data_write = self._getboolean(config, 'Output', 'filtered raw data')
+        self.icing_events_write = self._getboolean(config, 'Output', 'icing events')
+        self.power_curve_write = self._getboolean(config, 'Output', 'power curve')
+        self.daily_stats_write = self._getboolean(config, 'Output', 'daily stats')
+        self.weekly_stats_write = self._getboolean(config, 'Output', 'weekly stats')
+        self.seasonal_stats_write = self._getboolean(config, 'Output', 'seasonal stats')
+        self.event_index_write = self._getboolean(config, 'Output', 'event index')
+        self.output_workers = int(self._get(config, 'Output', 'output workers'))
+        if self.output_workers < 1:
+            raise ValueError("output workers must be at least 1, got {0}".format(self.output_workers))
+        self.plot_mode = self._get(config, 'Output', 'plot mode').lower()
+        if self.plot_mode not in ('scatter', 'density', 'auto'):
+            raise ValueError("plot mode must be scatter, density or auto, got {0}".format(self.plot_mode))
+        self.plot_point_budget = int(self._get(config, 'Output', 'plot point budget'))
+        self.profile_write = self._getboolean(config, 'Output', 'profile')
+        self.profile_memory = self._getboolean(config, 'Output', 'profile memory')
+
+    def _parse_binning(self, config):
+        self.has_binning = config.has_section('Binning')
+        self.min_windbin = float(self._get(config, 'Binning', 'minimum wind speed'))
+        self.max_windbin = float(self._get(config, 'Binning', 'maximum wind speed'))
+        self.windbin_width = float(self._get(config, 'Binning', 'wind speed bin size'))
+        self.directionbin_width = float(self._get(config, 'Binning', 'wind direction bin size'))
+        self.lookup_table_resolution = float(self._get(config, 'Binning', 'lookup table resolution'))
+
+    def _parse_filtering(self, config):
+        self.has_filtering = config.has_section('Filtering')
+        self.pc_low_limit = int(self._get(config, 'Filtering', 'power drop limit'))
+        self.pc_high_limit = int(self._get(config, 'Filtering', 'overproduction limit'))
+        self.icing_time = int(self._get(config, 'Filtering', 'icing time'))
+        self.stop_level = float(self._get(config, 'Filtering', 'stop limit multiplier'))
+        self.stop_time = int(self._get(config, 'Filtering', 'stop time filter'))
+        self.state_filter_type = int(self._get(config, 'Filtering', 'statefilter type'))
+        self.pc_binsize = int(self._get(config, 'Filtering', 'min bin size'))
+        self.pc_dist_filter = self._getboolean(config, 'Filtering', 'distance filter')
+        self.power_level_filter_limit = float(self._get(config, 'Filtering', 'power level filter'))
+        self.icing_temperature_limit = float(self._get(config, 'Filtering', 'temperature filter'))
+        self.reference_temperature_limit = float(self._get(config, 'Filtering', 'reference temperature'))
+        self.stop_filter_type = int(self._get(config, 'Filtering', 'stop filter type'))
+        self.reference_iterations = int(self._get(config, 'Filtering', 'reference iterations'))
+        self.starttimestamp = datetime.datetime.min
+        self.stoptimestamp = datetime.datetime.max
+        starttime_str = self._get(config, 'Filtering', 'start time')
+        if starttime_str.upper() != 'NONE':
+            self.starttimestamp = datetime.datetime.strptime(starttime_str, self.dt_format)
+        stoptime_str = self._get(config, 'Filtering', 'stop time')
+        if stoptime_str.upper() != 'NONE':
+            self.stoptimestamp = datetime.datetime.strptime(stoptime_str, self.dt_format)
+
+    def _parse_icing(self, config):
+        # if the "Icing" section does not exist, IPS and ice detection are off
+        self.has_icing = config.has_section('Icing')
+        self.heated_site = False
+        self.ice_detection = False
+        self.ice_alarm_index = 0
+        self.ice_alarm_value = 0
+        self.heating_status_index = 0
+        self.heating_status_value = 0
+        self.heating_status_type = 0
+        self.heating_power_index = 0
+        if not self.has_icing:
+            return
+        self.heated_site = config.getboolean('Icing', 'heating')
+        self.ice_detection = config.getboolean('Icing', 'ice detection')
+        self.ice_alarm_index = int(config.get('Icing', 'icing alarm index'))
+        ice_alarm_raw = config.get('Icing', 'icing alarm code')
+        if self.replace_faults and (self.ice_alarm_index in self.fault_columns):
+            self.ice_alarm_value = ice_alarm_raw
+        else:
+            self.ice_alarm_value = int(ice_alarm_raw)
+        self.heating_status_index = [int(code) for code in config.get('Icing', 'ips status index').split(',')]
+        textual_status = self.replace_faults and any({*self.heating_status_index} & {*self.fault_columns})
+        self.heating_status_value = self._codes(config.get('Icing', 'ips status code'), textual_status)
+        self.heating_status_type = int(config.get('Icing', 'ips status type'))
+        self.heating_power_index = int(config.get('Icing', 'ips power consumption index'))
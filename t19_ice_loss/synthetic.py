@@ -0,0 +1,389 @@
+"""
+Seeded synthetic SCADA data with known icing events
+
+The generated file uses the column layout, codes and datetime format of a RunConfig, so it can be read and
+analysed with the same .ini file. Data is written in chunks, the memory use does not depend on the length
+of the file. Icing episodes (power losses, stops and overproduction) are injected at random times when it
+is cold enough, and the true events are written into a sidecar file for checking the detection results.
+
+    python -m t19_ice_loss.synthetic site.ini synthetic.csv --years 20 --step 600 --seed 1
+
+Same settings and seed always give the same files.
+"""
+
+import argparse
+import csv
+import datetime
+import os
+
+import numpy as np
+
+from .run_config import RunConfig
+
+EVENT_HEADERS = ['start', 'stop', 'type', 'severity', 'ice detector', 'ips']
+ICING_TYPES = ('loss', 'stop', 'over')
+
+
+def ar1(random_state, length, phi, state):
+    """
+    unit variance first order autoregressive series continuing from state
+
+    :param random_state: numpy RandomState
+    :param length: number of values
+    :param phi: correlation between consecutive values
+    :param state: last value of the previous chunk
+    :return: series, last value
+    """
+    from scipy.signal import lfilter
+    innovations = random_state.standard_normal(length) * np.sqrt(1.0 - phi ** 2)
+    series, _ = lfilter([1.0], [1.0, -phi], innovations, zi=[phi * state])
+    return series, series[-1]
+
+
+def other_code(codes, textual, candidates):
+    """
+    a code that is not in codes, used as the inactive value of status columns
+
+    :param codes: list of active codes
+    :param textual: True if the codes are text
+    :param candidates: textual codes to choose from, in order of preference
+    :return: code
+    """
+    if textual:
+        return next(candidate for candidate in candidates if candidate not in codes)
+    return max(int(float(code)) for code in codes) + 1
+
+
+class SyntheticScada:
+    """
+    generator of 10 minute or 1 second SCADA time series in the column layout of a RunConfig
+
+    Wind is a Rayleigh distributed AR(1) process, its direction follows from the same two components.
+    Temperature has a seasonal cycle (coldest in January), a daily cycle and AR(1) noise. Power follows a
+    generic power curve scaled to the rated power, with noise.
+
+    Icing episodes start at random, with icing_rate episodes per 30 days on average, when the temperature
+    is below the temperature filter of the configuration. During an episode the temperature is kept below
+    the filter and, depending on the type, power is reduced ('loss'), the turbine is stopped while the state
+    stays normal ('stop') or power is above the power curve ('over'). The ice detector and IPS columns are
+    set during some of the episodes. Maintenance breaks with a non-normal state are added too, they are
+    listed in the sidecar file as type 'maintenance'.
+    """
+    def __init__(self, run_config, seed=0, step=600, icing_rate=3.0, maintenance_rate=1.0, chunk_rows=10000):
+        """
+        :param run_config: RunConfig describing the file layout
+        :param seed: random seed
+        :param step: time step in seconds
+        :param icing_rate: average number of icing episodes in 30 days of cold weather
+        :param maintenance_rate: average number of maintenance breaks in 30 days
+        :param chunk_rows: number of rows generated and written at a time
+        """
+        self.config = run_config
+        self.seed = seed
+        self.step = int(step)
+        self.icing_rate = icing_rate
+        self.maintenance_rate = maintenance_rate
+        self.chunk_rows = int(chunk_rows)
+        self.textual = run_config.replace_faults
+        self.column_count = self._column_count()
+        self._set_codes()
+
+    def _column_count(self):
+        config = self.config
+        indexes = [config.ts_index, config.ws_index, config.wd_index, config.temp_index, config.pow_index]
+        indexes += config.state_index + config.status_stop_index + config.skip_columns
+        if config.ice_detection:
+            indexes.append(config.ice_alarm_index)
+        if config.heated_site:
+            indexes += config.heating_status_index + [config.heating_power_index]
+        return max(indexes) + 1
+
+    def _is_textual(self, column):
+        return self.textual and (column in self.config.fault_columns)
+
+    def _set_codes(self):
+        config = self.config
+        # (column, active code, inactive code) of the coded columns, later ones win if a column has several roles
+        self.state_codes = [(column, other_code(config.normal_state, self._is_textual(column), ('FAULT', 'SERVICE')), config.normal_state[0])
+                            for column in config.state_index]
+        self.stop_codes = []
+        if config.stop_filter_type in (1, 2):
+            for column in config.status_stop_index:
+                if column < 0:
+                    continue
+                stop_code, running_code = config.stopcodes[0], other_code(config.stopcodes, self._is_textual(column), ('OK', 'RUN', 'IDLE'))
+                if config.stop_filter_type == 2:
+                    # stop codes list the running states
+                    stop_code, running_code = running_code, stop_code
+                self.stop_codes.append((column, stop_code, running_code))
+        self.ice_codes = []
+        if config.ice_detection:
+            self.ice_codes.append((config.ice_alarm_index, config.ice_alarm_value,
+                                   other_code([config.ice_alarm_value], self._is_textual(config.ice_alarm_index), ('NO', 'OK', 'CLEAR'))))
+        self.ips_codes = []
+        if config.heated_site:
+            for column in config.heating_status_index:
+                on_code, off_code = config.heating_status_value[0], other_code(config.heating_status_value, self._is_textual(column), ('OFF', 'OK', 'IDLE'))
+                if config.heating_status_type == 2:
+                    on_code, off_code = off_code, on_code
+                self.ips_codes.append((column, on_code, off_code))
+
+    def headers(self):
+        """
+        :return: column names of the generated file
+        """
+        config = self.config
+        names = ['column {0}'.format(column) for column in range(self.column_count)]
+        roles = [(config.ts_index, 'Timestamp'), (config.ws_index, 'Wind speed [m/s]'), (config.wd_index, 'Wind direction [deg]'),
+                 (config.temp_index, 'Ambient temperature [C]'), (config.pow_index, 'Output power [kW]')]
+        roles += [(column, 'State') for column, _, _ in self.state_codes]
+        roles += [(column, 'Status') for column, _, _ in self.stop_codes]
+        roles += [(column, 'Ice detected') for column, _, _ in self.ice_codes]
+        roles += [(column, 'IPS') for column, _, _ in self.ips_codes]
+        if config.heated_site and config.heating_power_index >= 0:
+            roles.append((config.heating_power_index, 'IPS power [kW]'))
+        for column, name in roles:
+            names[column] = name
+        return names
+
+    def power_curve(self, wind_speed):
+        """
+        generic pitch regulated power curve, cut-in 3 m/s, rated at 12.5 m/s, cut-out 25 m/s
+
+        :param wind_speed: array of wind speeds
+        :return: array of power in kW
+        """
+        rated = self.config.rated_power
+        power = rated * np.clip((wind_speed ** 3 - 27.0) / (12.5 ** 3 - 27.0), 0.0, 1.0)
+        return np.where(wind_speed < 25.0, power, 0.0)
+
+    def _schedule(self, random_state, rate):
+        # time to the next episode in seconds, rate is per 30 days
+        return random_state.exponential(30 * 86400.0 / rate) if rate > 0 else np.inf
+
+    def _new_event(self, random_state, kind, start):
+        if kind == 'maintenance':
+            duration = random_state.uniform(2, 24) * 3600
+            severity = 0.0
+        else:
+            # median 8 h, at least an hour
+            duration = max(3600.0, random_state.lognormal(np.log(8 * 3600), 0.8))
+            severity = {'loss': random_state.uniform(0.2, 0.7), 'stop': 1.0, 'over': random_state.uniform(1.15, 1.4)}[kind]
+        # whole time steps, the stop time is the first row after the event
+        duration = np.ceil(duration / self.step) * self.step
+        event = {'start': start, 'stop': start + duration, 'type': kind, 'severity': severity,
+                 'ice detector': (kind != 'maintenance') and bool(self.ice_codes) and (random_state.uniform() < 0.7),
+                 'ips': (kind in ('loss', 'stop')) and bool(self.ips_codes) and (random_state.uniform() < 0.5),
+                 'temperature': self.config.icing_temperature_limit - random_state.uniform(0.5, 4.0)}
+        return event
+
+    def chunks(self, start, rows):
+        """
+        generate the data chunk by chunk
+
+        :param start: datetime.datetime of the first row
+        :param rows: number of rows
+        :return: generator of (timestamps as datetime64 array, dictionary of column index: value array, list of events started in the chunk)
+        """
+        random_state = np.random.RandomState(self.seed)
+        step = self.step
+        rated = self.config.rated_power
+        wind_phi = np.exp(-step / (12 * 3600.0))
+        temperature_phi = np.exp(-step / (6 * 3600.0))
+        wind_state = random_state.standard_normal(2)
+        temperature_state = random_state.standard_normal()
+        start64 = np.datetime64(start, 's')
+        next_icing = self._schedule(random_state, self.icing_rate)
+        next_maintenance = self._schedule(random_state, self.maintenance_rate)
+        active = []
+        busy_until = 0.0
+        for first in range(0, rows, self.chunk_rows):
+            length = min(self.chunk_rows, rows - first)
+            seconds = (first + np.arange(length)) * float(step)
+            timestamps = start64 + (seconds.astype(np.int64) * np.timedelta64(1, 's'))
+
+            x, wind_state[0] = ar1(random_state, length, wind_phi, wind_state[0])
+            y, wind_state[1] = ar1(random_state, length, wind_phi, wind_state[1])
+            wind_speed = 5.6 * np.sqrt(x ** 2 + y ** 2) * (1.0 + 0.05 * random_state.standard_normal(length))
+            wind_speed = np.maximum(wind_speed, 0.0)
+            wind_direction = np.mod(np.degrees(np.arctan2(y, x)) + 225.0, 360.0)
+            noise, temperature_state = ar1(random_state, length, temperature_phi, temperature_state)
+            day_of_year = (timestamps - timestamps.astype('datetime64[Y]')).astype('timedelta64[s]').astype(float) / 86400.0
+            temperature = 2.0 - 10.0 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25) - 3.0 * np.cos(2 * np.pi * (day_of_year % 1.0)) + 2.5 * noise
+            power = self.power_curve(wind_speed)
+            # scatter mostly relative to the power, so that low wind does not look like stops
+            power = power * (1.0 + 0.06 * random_state.standard_normal(length)) + 0.005 * rated * random_state.standard_normal(length)
+            power = np.clip(power, 0.0, rated * 1.02)
+            power = np.where(wind_speed < 3.0, -0.005 * rated, power)
+
+            # start new episodes, one at a time
+            chunk_end = seconds[-1] + step
+            started = []
+            while min(next_icing, next_maintenance) < chunk_end:
+                if next_icing <= next_maintenance:
+                    candidate, next_icing = next_icing, next_icing + self._schedule(random_state, self.icing_rate)
+                    index = int((candidate - seconds[0]) // step)
+                    kind = ICING_TYPES[random_state.randint(len(ICING_TYPES))]
+                    if temperature[index] >= self.config.icing_temperature_limit:
+                        continue
+                else:
+                    candidate, next_maintenance = next_maintenance, next_maintenance + self._schedule(random_state, self.maintenance_rate)
+                    kind = 'maintenance'
+                # align to the time step, so the first affected row is the event start
+                candidate = np.ceil(candidate / step) * step
+                if candidate < busy_until:
+                    continue
+                event = self._new_event(random_state, kind, candidate)
+                busy_until = event['stop']
+                active.append(event)
+                started.append(event)
+
+            columns = {}
+            codes = {}
+            for column, active_code, inactive_code in self.state_codes + self.stop_codes + self.ice_codes + self.ips_codes:
+                codes[column] = np.full(length, inactive_code, dtype=object)
+            ips_power = np.zeros(length)
+            for event in active:
+                mask = (seconds >= event['start']) & (seconds < event['stop'])
+                if not mask.any():
+                    continue
+                if event['type'] == 'maintenance':
+                    power[mask] = np.minimum(power[mask], 0.0)
+                    for column, active_code, _ in self.state_codes:
+                        codes[column][mask] = active_code
+                    continue
+                temperature[mask] = np.minimum(temperature[mask], event['temperature'] + 0.3 * noise[mask])
+                if event['type'] == 'loss':
+                    power[mask] = power[mask] * event['severity']
+                elif event['type'] == 'stop':
+                    power[mask] = -0.005 * rated
+                    for column, active_code, _ in self.stop_codes:
+                        codes[column][mask] = active_code
+                else:
+                    power[mask] = np.minimum(power[mask] * event['severity'] + 0.05 * rated, rated)
+                if event['ice detector']:
+                    for column, active_code, _ in self.ice_codes:
+                        codes[column][mask] = active_code
+                if event['ips']:
+                    # heating is on during the second half of the episode
+                    ips_mask = mask & (seconds >= (event['start'] + event['stop']) / 2)
+                    for column, active_code, _ in self.ips_codes:
+                        codes[column][ips_mask] = active_code
+                    ips_power[ips_mask] = 0.03 * rated
+            active = [event for event in active if event['stop'] > chunk_end]
+
+            columns[self.config.ws_index] = wind_speed
+            columns[self.config.wd_index] = wind_direction
+            columns[self.config.temp_index] = temperature
+            columns[self.config.pow_index] = power
+            if self.config.heated_site and self.config.heating_power_index >= 0:
+                columns[self.config.heating_power_index] = ips_power
+            columns.update(codes)
+            yield timestamps, columns, started
+
+    def _format_timestamps(self, timestamps):
+        extra = '0' * self.config.dt_extra_char
+        return [timestamp.strftime(self.config.dt_format) + extra for timestamp in timestamps.astype(datetime.datetime)]
+
+    def _format_event_time(self, start, offset):
+        return (start + datetime.timedelta(seconds=float(offset))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def write(self, filename, start, end, events_filename=None):
+        """
+        write the data file and the sidecar file of the true events
+
+        :param filename: name of the data file
+        :param start: datetime.datetime of the first row
+        :param end: datetime.datetime, rows are written up to but not including end
+        :param events_filename: name of the events file, <filename without extension>_events.csv by default
+        :return: number of rows written, number of events
+        """
+        if events_filename is None:
+            events_filename = os.path.splitext(filename)[0] + '_events.csv'
+        rows = int((end - start).total_seconds() // self.step)
+        if (self.step % 60) and ('%S' not in self.config.dt_format):
+            print("datetime format {0} has no seconds, timestamps of a {1} s time step will repeat".format(self.config.dt_format, self.step))
+        quote_char = self.config.quote_char if self.config.quote_char else '"'
+        row_count = 0
+        event_count = 0
+        with open(filename, 'w', newline='') as data_file, open(events_filename, 'w', newline='') as events_file:
+            writer = csv.writer(data_file, delimiter=self.config.delim, quotechar=quote_char)
+            events_writer = csv.writer(events_file, delimiter=';')
+            writer.writerow(self.headers())
+            events_writer.writerow(EVENT_HEADERS)
+            for timestamps, columns, started in self.chunks(start, rows):
+                output = [['NA'] * len(timestamps)] * self.column_count
+                output[self.config.ts_index] = self._format_timestamps(timestamps)
+                for column, values in columns.items():
+                    if values.dtype == object:
+                        output[column] = values
+                    else:
+                        output[column] = np.char.mod('%.1f', values)
+                writer.writerows(zip(*output))
+                row_count += len(timestamps)
+                for event in started:
+                    events_writer.writerow([self._format_event_time(start, event['start']), self._format_event_time(start, event['stop']),
+                                            event['type'], '{0:.2f}'.format(event['severity']), event['ice detector'], event['ips']])
+                    event_count += 1
+        return row_count, event_count
+
+
+def read_events(events_filename):
+    """
+    read the events written by SyntheticScada.write
+
+    :param events_filename: name of the events file
+    :return: list of dictionaries with the keys of EVENT_HEADERS, times as datetime.datetime
+    """
+    events = []
+    with open(events_filename, newline='') as events_file:
+        reader = csv.reader(events_file, delimiter=';')
+        headers = next(reader)
+        for line in reader:
+            event = dict(zip(headers, line))
+            event['start'] = datetime.datetime.strptime(event['start'], '%Y-%m-%d %H:%M:%S')
+            event['stop'] = datetime.datetime.strptime(event['stop'], '%Y-%m-%d %H:%M:%S')
+            event['severity'] = float(event['severity'])
+            event['ice detector'] = event['ice detector'] == 'True'
+            event['ips'] = event['ips'] == 'True'
+            events.append(event)
+    return events
+
+
+
+def detection_rates(events, indexes):
+    """
+    share of the true icing events that overlap a detected event of the same kind
+
+    :param events: true events, as returned by read_events
+    :param indexes: dictionary of category: EventIndex, e.g. RunResult.event_indexes or load_event_indexes
+    :return: dictionary of event type: (number of detected events, number of true events)
+    """
+    categories = {'loss': 'losses', 'stop': 'stops', 'over': 'over'}
+    rates = {}
+    for kind, category in categories.items():
+        true_events = [event for event in events if event['type'] == kind]
+        index = indexes.get(category)
+        found = 0
+        if index is not None:
+            found = sum(1 for event in true_events if len(index.overlapping(event['start'], event['stop'])) > 0)
+        rates[kind] = (found, len(true_events))
+    return rates
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='write a synthetic SCADA file in the layout of an .ini file, with known icing events')
+    parser.add_argument('configfile', help='.ini file describing the columns and codes')
+    parser.add_argument('output', help='name of the generated data file')
+    parser.add_argument('--events', default=None, help='name of the true events file, <output>_events.csv by default')
+    parser.add_argument('--start', default='2003-01-01', help='first timestamp as YYYY-MM-DD')
+    parser.add_argument('--years', type=float, default=1.0, help='length of the data in years of 365 days')
+    parser.add_argument('--step', type=int, default=600, help='time step in seconds, e.g. 600 or 1')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    parser.add_argument('--icing-rate', type=float, default=3.0, help='icing episodes per 30 days of cold weather')
+    parser.add_argument('--maintenance-rate', type=float, default=1.0, help='maintenance breaks per 30 days')
+    args = parser.parse_args()
+    first = datetime.datetime.strptime(args.start, '%Y-%m-%d')
+    generator = SyntheticScada(RunConfig.from_file(args.configfile), args.seed, args.step, args.icing_rate, args.maintenance_rate)
+    written, events = generator.write(args.output, first, first + datetime.timedelta(days=365 * args.years), args.events)
+    print("{0} rows and {1} events written into {2}".format(written, events, args.output))
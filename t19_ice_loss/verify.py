@@ -0,0 +1,278 @@
+"""
+Check that the fast stage implementations give the same results as the original ones
+
+The stages of a run are calculated a second time with LegacyAEPcounter, starting from the same data, and
+every stage result is compared within the given tolerances. The summary and monthly production statistics
+files are also written with both implementations and compared field by field. For each stage that differs
+the first differing row, its timestamp and the column are reported.
+
+    python -m t19_ice_loss.verify site.ini
+    python -m t19_ice_loss.verify site.ini --synthetic 2 --seed 1
+
+exit code is 1 if any stage differs. The same check runs after a normal run with t19_counter.py --verify.
+"""
+
+import argparse
+import copy
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from .legacy import LegacyAEPcounter
+from .legacy import LegacyResultWriter
+from .pipeline import turbine_pipeline
+
+DEFAULT_RTOL = 1e-9
+DEFAULT_ATOL = 1e-6
+# stages compared in order, so the first reported stage is where the results start to differ
+COMPARED_STAGES = ['corrected data', 'time limited data', 'state filtered data', 'power level filtered data', 'state reference data',
+                   'initial reference data', 'initial power curve', 'reference data', 'power curve', 'power alarms',
+                   'over production alarms', 'stops', 'status stops', 'ips on flags', 'ice detected', 'alarm timings',
+                   'over timings', 'stop timings', 'status timings', 'ice timings', 'ips timings']
+
+
+class Mismatch:
+    """
+    first difference found in one stage or output
+    """
+    def __init__(self, stage, message, row=None, timestamp=None, column=None, fast=None, reference=None):
+        """
+        :param stage: name of the stage or output file
+        :param message: what differs
+        :param row: index of the first differing row, if known
+        :param timestamp: timestamp or label of that row
+        :param column: index or name of the first differing column
+        :param fast: value from the fast implementation
+        :param reference: value from the original implementation
+        """
+        self.stage = stage
+        self.message = message
+        self.row = row
+        self.timestamp = timestamp
+        self.column = column
+        self.fast = fast
+        self.reference = reference
+
+    def __str__(self):
+        text = "{0}: {1}".format(self.stage, self.message)
+        if self.row is not None:
+            text += ", first at row {0} ({1}), column {2}: {3!r} != {4!r} (reference)".format(
+                self.row, self.timestamp, self.column, self.fast, self.reference)
+        return text
+
+
+def _as_floats(values):
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        return None
+
+
+def _equal(fast, reference, rtol, atol):
+    fast_floats = _as_floats(fast)
+    reference_floats = _as_floats(reference)
+    if (fast_floats is not None) and (reference_floats is not None):
+        return np.isclose(fast_floats, reference_floats, rtol=rtol, atol=atol, equal_nan=True)
+    return np.array([a == b for a, b in zip(fast, reference)], dtype=bool)
+
+
+def compare_arrays(stage, fast, reference, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL, ts_column=0, column_tolerances=None):
+    """
+    compare two stage results element by element
+
+    numeric values are compared with numpy.isclose, NaNs are equal to each other, other values have to be equal
+
+    :param stage: name of the stage, used in the report
+    :param fast: result of the fast implementation
+    :param reference: result of the original implementation
+    :param rtol: relative tolerance
+    :param atol: absolute tolerance
+    :param ts_column: timestamp column of two dimensional results
+    :param column_tolerances: dict of column: (rtol, atol) for columns of two dimensional results compared with other tolerances
+    :return: Mismatch, None if the results are the same
+    """
+    if (fast is None) or (reference is None):
+        if (fast is None) and (reference is None):
+            return None
+        return Mismatch(stage, "only one of the results is None")
+    fast = np.asarray(fast)
+    reference = np.asarray(reference)
+    if (fast.ndim != 2) or (reference.ndim != 2):
+        if fast.shape != reference.shape:
+            return Mismatch(stage, "shapes {0} and {1} differ".format(fast.shape, reference.shape))
+        equal = _equal(fast.ravel(), reference.ravel(), rtol, atol)
+        if equal.all():
+            return None
+        first = int(np.argmin(equal))
+        position = np.unravel_index(first, fast.shape)
+        return Mismatch(stage, "values differ", position[0], '-', position[1:], fast.ravel()[first], reference.ravel()[first])
+    message = "values differ"
+    if fast.shape != reference.shape:
+        message = "shapes {0} and {1} differ".format(fast.shape, reference.shape)
+    rows = min(len(fast), len(reference))
+    columns = min(fast.shape[1], reference.shape[1])
+    if column_tolerances is None:
+        column_tolerances = {}
+    first_row, first_column = rows, None
+    for column in range(columns):
+        column_rtol, column_atol = column_tolerances.get(column, (rtol, atol))
+        equal = _equal(fast[:rows, column], reference[:rows, column], column_rtol, column_atol)
+        if not equal.all():
+            row = int(np.argmin(equal))
+            if row < first_row:
+                first_row, first_column = row, column
+    if first_column is None:
+        if fast.shape == reference.shape:
+            return None
+        return Mismatch(stage, message)
+    timestamp = fast[first_row, ts_column] if ts_column < columns else '-'
+    return Mismatch(stage, message, first_row, timestamp, first_column,
+                    fast[first_row, first_column], reference[first_row, first_column])
+
+
+def compare_tables(name, fast_filename, reference_filename, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL, delimiter='\t'):
+    """
+    compare two tab separated result files, numbers within the tolerances and text exactly
+
+    the first field of each line is used as the row label and the first line as the column names
+
+    :param name: name of the output, used in the report
+    :return: Mismatch, None if the files are the same
+    """
+    with open(fast_filename) as f:
+        fast_lines = [[field.strip() for field in line.rstrip('\n').split(delimiter)] for line in f]
+    with open(reference_filename) as f:
+        reference_lines = [[field.strip() for field in line.rstrip('\n').split(delimiter)] for line in f]
+    headers = reference_lines[0] if reference_lines else []
+    for row, (fast_fields, reference_fields) in enumerate(zip(fast_lines, reference_lines)):
+        for column, (fast_field, reference_field) in enumerate(zip(fast_fields, reference_fields)):
+            if fast_field == reference_field:
+                continue
+            fast_value, reference_value = _as_floats(fast_field), _as_floats(reference_field)
+            if (fast_value is not None) and (reference_value is not None) and \
+                    np.isclose(fast_value, reference_value, rtol=rtol, atol=atol, equal_nan=True):
+                continue
+            column_name = headers[column] if (row > 0) and (column < len(headers)) else column
+            return Mismatch(name, "values differ", row, fast_fields[0], column_name, fast_field, reference_field)
+        if len(fast_fields) != len(reference_fields):
+            return Mismatch(name, "line {0} has {1} fields, reference {2}".format(row, len(fast_fields), len(reference_fields)))
+    if len(fast_lines) != len(reference_lines):
+        return Mismatch(name, "{0} lines, reference {1}".format(len(fast_lines), len(reference_lines)))
+    return None
+
+
+def _result_copy(aepc, result_dir):
+    # same settings and caches, result files into result_dir
+    counter = copy.copy(aepc)
+    counter.result_dir = result_dir
+    os.makedirs(result_dir)
+    return counter
+
+
+def verify_result(result, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL):
+    """
+    recalculate the stages of a run with the original implementations and compare
+
+    :param result: RunResult
+    :param rtol: relative tolerance
+    :param atol: absolute tolerance
+    :return: list of Mismatch, first difference of each stage that differs, empty if all results are the same
+    """
+    pipeline = result.pipeline
+    # the data is read first, the textual fault codes of the settings are final only after that
+    data = pipeline.get('data')
+    legacy = LegacyAEPcounter()
+    legacy.__dict__.update(result.aepc.__dict__)
+    legacy_pipeline = turbine_pipeline(result.reader, legacy, data)
+
+    mismatches = []
+    for stage in COMPARED_STAGES:
+        if (stage not in pipeline.stages) or (stage not in legacy_pipeline.stages):
+            continue
+        mismatch = compare_arrays(stage, pipeline.get(stage), legacy_pipeline.get(stage), rtol, atol)
+        if mismatch is not None:
+            mismatches.append(mismatch)
+
+    fast_series = result.aepc.combine_timeseries(pipeline.get('power alarms'), pipeline.get('stops'), pipeline.get('over production alarms'))
+    legacy_series = legacy.combine_timeseries(legacy_pipeline.get('power alarms'), legacy_pipeline.get('stops'),
+                                              legacy_pipeline.get('over production alarms'))
+    mismatch = compare_arrays('alarm time series', fast_series, legacy_series, rtol, atol)
+    if mismatch is not None:
+        mismatches.append(mismatch)
+
+    # the summary and production statistics are compared as written, the original versions only write files
+    work_dir = tempfile.mkdtemp(prefix='t19_verify_')
+    try:
+        fast_aepc = _result_copy(result.aepc, os.path.join(work_dir, 'fast') + os.sep)
+        legacy_aepc = _result_copy(legacy, os.path.join(work_dir, 'legacy') + os.sep)
+        legacy_rfw = LegacyResultWriter()
+
+        _, fast_summary, _ = result.rfw.write_summary(fast_aepc, result.summary_with_units)
+        _, legacy_summary, _ = legacy_rfw.summary_statistics(legacy_aepc, legacy_pipeline.get('time limited data'), legacy_pipeline.get('reference data'),
+                                                             legacy_pipeline.get('power curve'), legacy_pipeline.get('alarm timings'),
+                                                             legacy_pipeline.get('stop timings'), legacy_pipeline.get('over timings'),
+                                                             legacy_pipeline.get('status timings'), legacy_pipeline.get('ice timings'),
+                                                             legacy_pipeline.get('ips timings'), legacy_pipeline.get('data sizes'))
+        mismatch = compare_tables('summary', fast_summary, legacy_summary, rtol, atol)
+        if mismatch is not None:
+            mismatches.append(mismatch)
+
+        fast_stats = result.rfw.write_production_stats(pipeline.get('time limited data'), pipeline.get('power curve'), fast_aepc,
+                                                       pipeline.get('power alarms'), pipeline.get('stops'), pipeline.get('status stops'),
+                                                       pipeline.get('ips on flags'), pipeline.get('ice detected'), ('month',),
+                                                       pipeline.get('production series'))
+        _, legacy_stats, _ = legacy_rfw.write_monthly_stats(legacy_pipeline.get('time limited data'), legacy_pipeline.get('power curve'), legacy_aepc,
+                                                            legacy_pipeline.get('power alarms'), legacy_pipeline.get('stops'),
+                                                            legacy_pipeline.get('status stops'), legacy_pipeline.get('ips on flags'),
+                                                            legacy_pipeline.get('ice detected'))
+        mismatch = compare_tables('production stats', fast_stats[0][1], legacy_stats, rtol, atol)
+        if mismatch is not None:
+            mismatches.append(mismatch)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return mismatches
+
+
+def report(mismatches, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL):
+    """
+    :return: list of lines describing the verification result
+    """
+    if not mismatches:
+        return ["Verification passed: fast and reference implementations agree (rtol {0}, atol {1})".format(rtol, atol)]
+    lines = ["Verification FAILED (rtol {0}, atol {1}), {2} stages differ:".format(rtol, atol, len(mismatches))]
+    lines.extend("  " + str(mismatch) for mismatch in mismatches)
+    return lines
+
+
+if __name__ == '__main__':
+    from .run import analyse_file
+    from .run_config import RunConfig
+    from .synthetic import SyntheticScada
+
+    parser = argparse.ArgumentParser(description='compare the fast stage implementations to the original ones')
+    parser.add_argument('configfile', help='.ini file of the dataset')
+    parser.add_argument('--rtol', type=float, default=DEFAULT_RTOL, help='relative tolerance')
+    parser.add_argument('--atol', type=float, default=DEFAULT_ATOL, help='absolute tolerance')
+    parser.add_argument('--synthetic', type=float, default=0, help='use this many years of synthetic data in the layout of the .ini file instead of its data file')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the synthetic data')
+    args = parser.parse_args()
+
+    run_config = RunConfig.from_file(args.configfile)
+    data_dir = None
+    if args.synthetic > 0:
+        data_dir = tempfile.mkdtemp(prefix='t19_verify_data_')
+        run_config.filename = os.path.join(data_dir, 'synthetic.csv')
+        start = datetime.datetime(2003, 1, 1)
+        SyntheticScada(run_config, args.seed).write(run_config.filename, start, start + datetime.timedelta(days=365 * args.synthetic))
+    try:
+        found = verify_result(analyse_file(run_config), args.rtol, args.atol)
+    finally:
+        if data_dir is not None:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    for line in report(found, args.rtol, args.atol):
+        print(line)
+    sys.exit(1 if found else 0)
@@ -0,0 +1,256 @@
+"""
+Work queue in a shared directory, for spreading jobs over processes on hosts that share a file system
+
+Every job is a json file that moves between the subdirectories of the queue ::
+
+    pending/   jobs waiting for a worker, <job>.json
+    claimed/   jobs being processed, <job>@<worker>.json touched regularly by the worker as a heartbeat
+    done/      result markers of finished jobs, one per job
+
+A job is claimed by renaming it from pending/ into claimed/ under the name of the worker. The rename is atomic, so
+only one worker gets each job however many are trying at the same time. A claim whose heartbeat has stopped, because
+the worker died or its host went down, is renamed back into pending/ by any other worker, so workers can join and
+leave at any time. A worker only heartbeats and completes its own claim, so a worker that was taken for stale but is
+still running notices that its claim is gone and does not touch the claim of the worker that took the job over.
+The modification times of the files are compared with the time of the shared file system itself, so the clocks of
+the hosts do not need to agree.
+
+A job can be run twice if a worker stops heartbeating for longer than the stale limit but still finishes, so jobs
+should write their results in a way that can be repeated.
+"""
+
+import json
+import os
+import socket
+import threading
+
+PENDING = 'pending'
+CLAIMED = 'claimed'
+DONE = 'done'
+
+
+# separates the job from the worker in the names of the claims, host names can't contain it
+OWNER_SEPARATOR = '@'
+
+
+def worker_name():
+    """
+    :return: name of this process, unique over the hosts sharing the queue
+    """
+    return '{0}-{1}'.format(socket.gethostname(), os.getpid())
+
+
+class FileQueue:
+    """
+    work queue in a directory, see the module documentation
+    """
+    def __init__(self, directory, worker=None):
+        """
+        :param directory: queue directory, created if it does not exist
+        :param worker: name of this worker, used for the claims and the clock file, worker_name() by default
+        """
+        self.directory = directory
+        self.worker = worker if worker is not None else worker_name()
+        for state in (PENDING, CLAIMED, DONE):
+            os.makedirs(os.path.join(directory, state), exist_ok=True)
+
+    def _path(self, state, job_id=''):
+        if job_id:
+            return os.path.join(self.directory, state, job_id + '.json')
+        return os.path.join(self.directory, state)
+
+    def _write(self, filename, content):
+        # the file appears complete or not at all
+        temporary = '{0}.{1}.tmp'.format(filename, self.worker)
+        with open(temporary, 'w') as f:
+            json.dump(content, f, indent=4)
+        os.replace(temporary, filename)
+
+    def _job_ids(self, state):
+        return sorted(name[:-len('.json')] for name in os.listdir(self._path(state)) if name.endswith('.json'))
+
+    def _claim_path(self, job_id, worker=None):
+        return self._path(CLAIMED, '{0}{1}{2}'.format(job_id, OWNER_SEPARATOR, self.worker if worker is None else worker))
+
+    def _claims(self):
+        """
+        :return: list of (job_id, worker) of the claimed jobs
+        """
+        return [tuple(name.rsplit(OWNER_SEPARATOR, 1)) for name in self._job_ids(CLAIMED) if OWNER_SEPARATOR in name]
+
+    def put(self, job_id, payload):
+        """
+        add a job, any earlier result marker of the same job is removed
+
+        :param job_id: name of the job, usable as a filename. Jobs are claimed in the order of their names
+        :param payload: json serializable description of the job
+        """
+        try:
+            os.remove(self._path(DONE, job_id))
+        except FileNotFoundError:
+            pass
+        self._write(self._path(PENDING, job_id), payload)
+
+    def clear_results(self):
+        """
+        remove the result markers of all finished jobs, before queueing a new round of jobs
+        """
+        for job_id in self._job_ids(DONE):
+            self._remove(self._path(DONE, job_id))
+
+    def claim(self):
+        """
+        take the first pending job
+
+        :return: (job_id, payload), None if there are no pending jobs
+        """
+        for job_id in self._job_ids(PENDING):
+            source = self._path(PENDING, job_id)
+            target = self._claim_path(job_id)
+            try:
+                # the rename keeps the modification time, so the file is touched first to not look stale once claimed
+                os.utime(source)
+                os.rename(source, target)
+            except FileNotFoundError:
+                # taken by another worker
+                continue
+            if os.path.exists(self._path(DONE, job_id)):
+                # finished by a worker whose claim was taken for stale
+                self._remove(target)
+                continue
+            with open(target, 'r') as f:
+                return job_id, json.load(f)
+        return None
+
+    def heartbeat(self, job_id):
+        """
+        mark a job claimed by this worker as still being processed
+
+        :return: False if the claim has been taken away as stale
+        """
+        try:
+            os.utime(self._claim_path(job_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def complete(self, job_id, result):
+        """
+        write the result marker of a job claimed by this worker and release the claim
+
+        nothing is written if the claim has been taken away as stale, the job is then run by another worker
+
+        :param result: json serializable result of the job
+        :return: False if the claim has been taken away
+        """
+        claim = self._claim_path(job_id)
+        if not os.path.exists(claim):
+            return False
+        self._write(self._path(DONE, job_id), result)
+        self._remove(claim)
+        return True
+
+    def skip(self, job_id, result):
+        """
+        write the result marker of a job that is not run at all, e.g. because its results are up to date
+
+        :param result: json serializable result of the job
+        """
+        self._write(self._path(DONE, job_id), result)
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def clock(self):
+        """
+        current time of the shared file system, as a modification time
+        """
+        filename = os.path.join(self.directory, '.clock-{0}'.format(self.worker))
+        with open(filename, 'w'):
+            pass
+        try:
+            return os.stat(filename).st_mtime
+        finally:
+            self._remove(filename)
+
+    def recover_stale(self, stale_after):
+        """
+        put the claimed jobs without a heartbeat for stale_after seconds back into pending
+
+        :return: ids of the recovered jobs
+        """
+        now = self.clock()
+        recovered = []
+        for job_id, worker in self._claims():
+            claim = self._claim_path(job_id, worker)
+            try:
+                if now - os.stat(claim).st_mtime <= stale_after:
+                    continue
+                if os.path.exists(self._path(DONE, job_id)):
+                    self._remove(claim)
+                    continue
+                os.rename(claim, self._path(PENDING, job_id))
+            except FileNotFoundError:
+                # finished or recovered by another worker meanwhile
+                continue
+            recovered.append(job_id)
+        return recovered
+
+    def counts(self):
+        """
+        :return: number of pending, claimed and done jobs
+        """
+        return len(self._job_ids(PENDING)), len(self._claims()), len(self._job_ids(DONE))
+
+    def results(self):
+        """
+        :return: list of (job_id, result) of the finished jobs, in the order of the job names
+        """
+        results = []
+        for job_id in self._job_ids(DONE):
+            with open(self._path(DONE, job_id), 'r') as f:
+                results.append((job_id, json.load(f)))
+        return results
+
+
+class Heartbeat:
+    """
+    touch the claim of a job from a background thread while the job is processed ::
+
+        with Heartbeat(queue, job_id, 30) as heartbeat:
+            process(payload)
+        if not heartbeat.lost.is_set():
+            queue.complete(job_id, result)
+
+    once the claim has been taken away as stale the heartbeat stops and lost is set, the job should then be given up
+    """
+    def __init__(self, queue, job_id, interval):
+        """
+        :param queue: FileQueue holding the claim
+        :param job_id: claimed job
+        :param interval: seconds between heartbeats, well below the stale limit of the queue
+        """
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.queue.heartbeat(self.job_id):
+                self.lost.set()
+                break
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        return False
@@ -0,0 +1,69 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+from t19_ice_loss.aep_counter import AEPcounter
+from t19_ice_loss.legacy import LegacyAEPcounter
+from t19_ice_loss.run import analyse_file
+from t19_ice_loss.run_config import RunConfig
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the original join is quadratic, so the comparison uses the first weeks of the example data
+PERIOD_END = datetime.datetime(2003, 2, 15)
+
+
+def first_weeks(series):
+    return series[series[:, 0] < PERIOD_END]
+
+
+@pytest.fixture(scope='module')
+def alarm_series(tmp_path_factory):
+    run_config = RunConfig.from_file(os.path.join(REPOSITORY, 'example.ini'))
+    run_config.filename = os.path.join(REPOSITORY, run_config.filename)
+    run_config.result_dir = str(tmp_path_factory.mktemp('results')) + os.sep
+    result = analyse_file(run_config)
+    series = (first_weeks(result.power_alarms), first_weeks(result.stops), first_weeks(result.over_production_alarms))
+    return result.aepc, series
+
+
+def test_combined_series_matches_original(alarm_series):
+    aepc, (power_alarms, stops, over_alarms) = alarm_series
+    combined = aepc.combine_timeseries(power_alarms, stops, over_alarms)
+    # the original implementation adds into the stops array in place
+    original = LegacyAEPcounter().combine_timeseries(power_alarms, stops.copy(), over_alarms)
+    assert combined.shape == original.shape
+    assert (combined[:, 0] == original[:, 0]).all()
+    assert np.array_equal(combined[:, 1:].astype(float), original[:, 1:].astype(float), equal_nan=True)
+    assert set(combined[:, 1].astype(float)) > {0.0, 1.0, 2.0}
+
+
+def test_classification(alarm_series):
+    aepc, (power_alarms, stops, over_alarms) = alarm_series
+    classification = aepc.classify_timeseries(power_alarms, stops, over_alarms)
+    losses = dict((line[0], float(line[1])) for line in power_alarms)
+    overs = dict((line[0], float(line[1])) for line in over_alarms)
+    expected = []
+    for line in stops:
+        if float(line[1]) == 2.0:
+            expected.append(2)
+        elif losses.get(line[0]) == 1.0:
+            expected.append(1)
+        elif overs.get(line[0]) == 3.0:
+            expected.append(3)
+        else:
+            expected.append(0)
+    assert (classification[:, 0] == stops[:, 0]).all()
+    assert list(classification[:, 1]) == expected
+    assert {1, 2, 3} <= set(expected)
+
+
+def test_join_timestamps_unsorted():
+    aepc = AEPcounter()
+    times = [datetime.datetime(2003, 1, 1) + datetime.timedelta(minutes=10 * i) for i in range(5)]
+    series = np.array([[times[3], 0], [times[0], 0], [times[1], 0]], dtype=object)
+    other = np.array([[times[1], 1.0], [times[2], 1.0], [times[3], 3.0]], dtype=object)
+    rows, matched = aepc.join_timestamps(series, other)
+    assert list(matched) == [True, False, True]
+    assert list(rows) == [2, 0]
@@ -0,0 +1,19 @@
+import multifile_t19_counter
+
+SUMMARY = '''Field\tValue\tunit
+Dataset name\t0042\t 
+Production losses due to icing\t42929.4\tkWh
+Data start time\t2003-01-01 00:00:00\t 
+Sample count in original data\t52560\t 
+'''
+
+
+def test_text_fields_keep_their_text(tmp_path):
+    (tmp_path / '0042_summary.txt').write_text(SUMMARY)
+    record = multifile_t19_counter.read_summary_file(str(tmp_path / '0042_summary.txt'))
+    assert record == [('Dataset name', '0042', ''), ('Production losses due to icing', 42929.4, 'kWh'),
+                      ('Data start time', '2003-01-01 00:00:00', ''), ('Sample count in original data', 52560, '')]
+    multifile_t19_counter.combined_summary(str(tmp_path))
+    combined = (tmp_path / multifile_t19_counter.COMBINED_SUMMARY).read_text().splitlines()
+    assert combined == ['Dataset name\t0042', 'Production losses due to icing\t42929.4', 'Data start time\t2003-01-01 00:00:00',
+                        'Sample count in original data\t52560']
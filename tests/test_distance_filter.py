@@ -0,0 +1,39 @@
+import warnings
+
+import numpy as np
+
+from t19_ice_loss.aep_counter import AEPcounter
+from t19_ice_loss.legacy import LegacyAEPcounter
+
+TARGETS = [2, 3, 4]
+
+
+def random_power_curves(rng):
+    speed_bins, direction_bins = rng.integers(1, 40), rng.integers(1, 13)
+    pc = np.full((speed_bins, direction_bins, 10), np.nan)
+    speeds = np.arange(speed_bins) * 0.5 + 0.25
+    power = 2000.0 * np.clip((speeds - 3.0) / 9.0, 0.0, 1.0) ** 3
+    pc[:, :, 0] = speeds[:, np.newaxis]
+    for target, scale in zip(TARGETS, (1.0, 0.8, 1.1)):
+        pc[:, :, target] = scale * power[:, np.newaxis] + rng.normal(0.0, 20.0, (speed_bins, direction_bins))
+    # outliers, direction bins without data and speed bins without any data
+    outliers = rng.random((speed_bins, direction_bins, len(TARGETS))) < 0.1
+    pc[:, :, TARGETS] = np.where(outliers, pc[:, :, TARGETS] * rng.uniform(2.0, 10.0) + 500.0, pc[:, :, TARGETS])
+    pc[rng.random((speed_bins, direction_bins)) < 0.15, :] = np.nan
+    pc[rng.random(speed_bins) < 0.1, :, :] = np.nan
+    return pc
+
+
+def test_same_as_legacy_loop():
+    rng = np.random.default_rng(33)
+    fast, legacy = AEPcounter(), LegacyAEPcounter()
+    for _ in range(200):
+        pc = random_power_curves(rng)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            expected = pc.copy()
+            for target in TARGETS:
+                expected = legacy.distance_filter(expected, target)
+            single = legacy.distance_filter(pc.copy(), TARGETS[0])
+        np.testing.assert_allclose(fast.distance_filter(pc.copy(), TARGETS), expected, rtol=1e-12, atol=1e-9)
+        np.testing.assert_allclose(fast.distance_filter(pc.copy(), TARGETS[0]), single, rtol=1e-12, atol=1e-9)
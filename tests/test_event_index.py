@@ -0,0 +1,78 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from t19_ice_loss.event_index import EventIndex, load_event_indexes, save_event_indexes
+
+START = datetime.datetime(2003, 1, 1)
+
+
+def random_events(seed, count=200):
+    # non-overlapping events on a 10 minute grid, some of them touching
+    rng = np.random.default_rng(seed)
+    gaps = rng.integers(0, 20, count)
+    lengths = rng.integers(1, 30, count)
+    starts = np.cumsum(gaps + np.r_[0, lengths[:-1]])
+    stops = starts + lengths
+    to_time = lambda steps: [START + datetime.timedelta(minutes=10 * int(step)) for step in steps]
+    losses = rng.uniform(0.0, 500.0, count)
+    losses[rng.integers(0, count, 5)] = np.nan
+    return to_time(starts), to_time(stops), losses
+
+
+def plain_duration(starts, stops, starttime, stoptime):
+    total = datetime.timedelta(0)
+    for start, stop in zip(starts, stops):
+        overlap = min(stop, stoptime) - max(start, starttime)
+        if overlap > datetime.timedelta(0):
+            total += overlap
+    return total.total_seconds() / 3600.0
+
+
+def plain_loss(starts, stops, losses, starttime, stoptime):
+    total = 0.0
+    for start, stop, loss in zip(starts, stops, losses):
+        overlap = min(stop, stoptime) - max(start, starttime)
+        if (overlap > datetime.timedelta(0)) and not np.isnan(loss):
+            total += loss * (overlap / (stop - start))
+    return total
+
+
+@pytest.mark.parametrize('seed', [1, 2, 3])
+def test_duration_and_loss_between(seed):
+    starts, stops, losses = random_events(seed)
+    index = EventIndex(starts, stops, losses)
+    rng = np.random.default_rng(seed + 100)
+    end = (stops[-1] - START).total_seconds() / 60.0
+    for window in range(300):
+        first, second = sorted(rng.uniform(-100.0, end + 100.0, 2))
+        starttime = START + datetime.timedelta(minutes=first)
+        stoptime = START + datetime.timedelta(minutes=second)
+        assert index.duration_between(starttime, stoptime) == pytest.approx(plain_duration(starts, stops, starttime, stoptime), abs=1e-9)
+        assert index.loss_between(starttime, stoptime) == pytest.approx(plain_loss(starts, stops, losses, starttime, stoptime), rel=1e-9, abs=1e-6)
+
+
+def test_duration_on_event_edges():
+    starts, stops, losses = random_events(4, 20)
+    index = EventIndex(starts, stops, losses)
+    total = sum((stop - start).total_seconds() for start, stop in zip(starts, stops)) / 3600.0
+    assert index.duration_between(starts[0], stops[-1]) == total
+    assert index.duration_between(starts[3], stops[3]) == (stops[3] - starts[3]).total_seconds() / 3600.0
+    # a window inside one event
+    assert index.duration_between(starts[5] + datetime.timedelta(minutes=1), starts[5] + datetime.timedelta(minutes=4)) == 0.05
+    assert index.duration_between(stops[-1], stops[-1] + datetime.timedelta(days=1)) == 0.0
+    assert EventIndex().duration_between(starts[0], stops[-1]) == 0.0
+
+
+def test_point_queries_and_persistence(tmp_path):
+    starts, stops, losses = random_events(5, 50)
+    index = EventIndex(starts, stops, losses)
+    assert index.event_at(starts[7]) == 7
+    assert index.event_at(stops[7] - datetime.timedelta(seconds=1)) == 7
+    assert list(index.overlapping(starts[2], stops[4])) == [2, 3, 4]
+    filename = str(tmp_path / 'events.npz')
+    save_event_indexes(filename, {'losses': index})
+    loaded = load_event_indexes(filename)['losses']
+    assert loaded.duration_between(starts[0], stops[-1]) == index.duration_between(starts[0], stops[-1])
+    assert np.array_equal(loaded.cumulative_durations, index.cumulative_durations)
@@ -0,0 +1,104 @@
+import csv
+import datetime
+import os
+import pickle
+
+import pytest
+
+from t19_ice_loss.batch import analyse_batch, farm_block
+from t19_ice_loss.farm import analyse_farm_turbine, share_farm_file
+from t19_ice_loss.run import analyse_file
+from t19_ice_loss.run_config import RunConfig
+from t19_ice_loss.synthetic import SyntheticScada
+from t19_ice_loss.verify import COMPARED_STAGES, compare_arrays
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TURBINES = 3
+
+
+def turbine_config(directory, number, filename, farm_columns=None):
+    with open(os.path.join(REPOSITORY, 'example.ini'), 'r') as f:
+        config = f.read()
+    config = config.replace('id = ExampleDataset', 'id = T{0}'.format(number))
+    config = config.replace('filename = ./fake_data2.csv', 'filename = {0}'.format(filename))
+    config = config.replace('result directory = ./results/example/', 'result directory = {0}'.format(os.path.join(str(directory), 'results', '')))
+    if farm_columns is not None:
+        config = config.replace('replace fault codes = True', 'replace fault codes = True\nfarm columns = {0}'.format(
+            ','.join(str(column) for column in farm_columns)))
+    configfile = os.path.join(str(directory), '{0}.ini'.format(os.path.splitext(os.path.basename(filename))[0]))
+    with open(configfile, 'w') as f:
+        f.write(config)
+    return RunConfig.from_file(configfile)
+
+
+@pytest.fixture(scope='module')
+def farm(tmp_path_factory):
+    """
+    synthetic turbines, each in a file of its own and all of them in one farm file
+    """
+    directory = tmp_path_factory.mktemp('farm')
+    layout = RunConfig.from_file(os.path.join(REPOSITORY, 'example.ini'))
+    rows = []
+    for number in range(1, TURBINES + 1):
+        filename = str(directory / 'T{0}.csv'.format(number))
+        SyntheticScada(layout, seed=number).write(filename, datetime.datetime(2003, 10, 1), datetime.datetime(2004, 1, 15))
+        with open(filename, 'r', newline='') as f:
+            lines = list(csv.reader(f))
+        rows = lines if not rows else [row + line[1:] for row, line in zip(rows, lines)]
+    farm_file = str(directory / 'farm.csv')
+    with open(farm_file, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+    columns = len(rows[0][1:]) // TURBINES
+    single = [turbine_config(directory, number, str(directory / 'T{0}.csv'.format(number))) for number in range(1, TURBINES + 1)]
+    os.makedirs(str(directory / 'farm'))
+    farm_configs = [turbine_config(directory / 'farm', number, farm_file, [0] + list(range(1 + columns * (number - 1), 1 + columns * number)))
+                    for number in range(1, TURBINES + 1)]
+    return single, farm_configs
+
+
+def textual_codes(stage, values, result):
+    """
+    the fault codes of the data stages back as text, the numbers of a farm file differ from those of a single file
+    """
+    if not stage.endswith('data'):
+        return values
+    codes = dict((number, code) for code, number in result.aepc.fault_dict.items())
+    values = values.copy()
+    for column in result.run_config.fault_columns:
+        values[:, column] = [codes.get(number, number) for number in values[:, column]]
+    return values
+
+
+def test_batch_and_farm_runs_match_single_files(farm):
+    single_configs, farm_configs = farm
+    single = [analyse_file(run_config) for run_config in single_configs]
+    timestamps, values, headers, fault_dict = farm_block(farm_configs)
+    batch = analyse_batch(timestamps, values, farm_configs, headers, fault_dict)
+    shared = share_farm_file(farm_configs)
+    try:
+        farm_turbines = [analyse_farm_turbine(run_config, shared) for run_config in farm_configs]
+        for run_config, result in zip(farm_configs, farm_turbines):
+            assert result.data.shape == shared.turbine_data(run_config).shape
+    finally:
+        shared.unlink()
+    for reference, batch_result, farm_result in zip(single, batch, farm_turbines):
+        assert batch_result.id == farm_result.id == reference.id
+        reference.pipeline.get('data')
+        for stage in COMPARED_STAGES:
+            if stage not in reference.pipeline.stages:
+                continue
+            expected = textual_codes(stage, reference.pipeline.get(stage), reference)
+            for result in (batch_result, farm_result):
+                assert compare_arrays(stage, textual_codes(stage, result.pipeline.get(stage), result), expected) is None, (reference.id, stage)
+        assert batch_result.summary == farm_result.summary == reference.summary
+
+
+def test_batch_counter_is_pickled_without_its_arrays(farm):
+    farm_configs = farm[1]
+    timestamps, values, headers, fault_dict = farm_block(farm_configs)
+    result = analyse_batch(timestamps, values, farm_configs, headers, fault_dict)[0]
+    result.pipeline.get('alarm timings')
+    assert result.aepc.known_timestamps
+    counter = pickle.loads(pickle.dumps(result.aepc))
+    assert counter.known_timestamps == {}
+    assert counter.fault_dict == result.aepc.fault_dict
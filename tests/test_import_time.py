@@ -0,0 +1,19 @@
+import importlib.util
+import os
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_benchmark():
+    # the benchmarks are scripts, not a package
+    spec = importlib.util.spec_from_file_location('import_time', os.path.join(REPOSITORY, 'benchmarks', 'import_time.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_import_within_budget_without_heavy_modules():
+    import_time = load_benchmark()
+    best, heavy = import_time.measure_import_time(repeats=3)
+    assert heavy == []
+    assert best <= import_time.BUDGET
@@ -0,0 +1,68 @@
+import os
+
+import multifile_t19_counter
+from t19_ice_loss import manifest as run_manifest
+from t19_ice_loss.manifest import RunManifest
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def turbine(tmp_path):
+    data_file = tmp_path / 'T1.csv'
+    data_file.write_text('timestamp,wind speed\n2003-01-01 00:00:00,5.0\n')
+    with open(os.path.join(REPOSITORY, 'example.ini'), 'r') as f:
+        config = f.read().replace('filename = ./fake_data2.csv', 'filename = {0}'.format(data_file))
+    configfile = tmp_path / 'T1.ini'
+    configfile.write_text(config)
+    output = tmp_path / 'T1_summary.txt'
+    output.write_text('Field\tValue\tunit\n')
+    return str(configfile), data_file, output
+
+
+def run(tmp_path, configfile, output):
+    manifest = RunManifest(str(tmp_path / 'manifest.json'))
+    to_run, skipped = multifile_t19_counter.skip_current([configfile], manifest)
+    manifest.record(configfile, manifest.fingerprint(configfile), [str(output)], [('Dataset name', 'T1', '')])
+    return to_run, skipped
+
+
+def test_unchanged_turbine_is_skipped(tmp_path):
+    configfile, data_file, output = turbine(tmp_path)
+    assert run(tmp_path, configfile, output)[0] == [configfile]
+    to_run, skipped = run(tmp_path, configfile, output)
+    assert to_run == []
+    assert [record['summary'] for record in skipped] == [[('Dataset name', 'T1', '')]]
+
+
+def test_force_runs_everything(tmp_path):
+    configfile, data_file, output = turbine(tmp_path)
+    run(tmp_path, configfile, output)
+    manifest = RunManifest(str(tmp_path / 'manifest.json'))
+    assert multifile_t19_counter.skip_current([configfile], manifest, force=True) == ([configfile], [])
+
+
+def test_changed_inputs_are_run(tmp_path):
+    configfile, data_file, output = turbine(tmp_path)
+    run(tmp_path, configfile, output)
+    # same size and modification time, different contents
+    stat = os.stat(str(data_file))
+    data_file.write_text(data_file.read_text().replace('5.0', '6.0'))
+    os.utime(str(data_file), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert run(tmp_path, configfile, output)[0] == [configfile]
+    with open(configfile, 'a') as f:
+        f.write('\n')
+    assert run(tmp_path, configfile, output)[0] == [configfile]
+    assert run(tmp_path, configfile, output)[0] == []
+    os.remove(str(output))
+    assert run(tmp_path, configfile, output)[0] == [configfile]
+
+
+def test_changed_code_is_run(tmp_path, monkeypatch):
+    configfile, data_file, output = turbine(tmp_path)
+    run(tmp_path, configfile, output)
+    monkeypatch.setattr(run_manifest, 'code_version', lambda: 'changed')
+    assert run(tmp_path, configfile, output)[0] == [configfile]
+
+
+def test_code_version_covers_the_runner():
+    assert os.path.join(REPOSITORY, 't19_counter.py') in run_manifest.code_files()
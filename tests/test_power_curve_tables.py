@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from t19_ice_loss.aep_counter import AEPcounter
+
+# step documented in usage.rst for the lookup table resolution
+RESOLUTION = 0.01
+
+
+def power_curves():
+    # two direction bins of a 3 MW turbine, the bin mean wind speeds are not evenly spaced
+    rng = np.random.default_rng(19)
+    speeds = np.arange(0.5, 20.0, 1.0) + rng.uniform(-0.3, 0.3, 20)
+    power_curves = np.full((20, 2, 10), np.nan)
+    for dirbin, rated_speed in enumerate((11.5, 12.5)):
+        power = 3000.0 * np.clip((speeds - 3.0) / (rated_speed - 3.0), 0.0, 1.0) ** 3
+        power_curves[:, dirbin, 0] = speeds
+        power_curves[:, dirbin, 2] = power
+        power_curves[:, dirbin, 3] = 0.8 * power
+        power_curves[:, dirbin, 4] = 1.1 * power
+        power_curves[:, dirbin, 8] = 0.85 * power
+        power_curves[:, dirbin, 9] = 1.05 * power
+    return power_curves
+
+
+def slope_change(power_curves, variable_index):
+    speeds = power_curves[:, :, 0]
+    slopes = np.diff(power_curves[:, :, variable_index], axis=0) / np.diff(speeds, axis=0)
+    return np.max(np.abs(np.diff(slopes, axis=0)))
+
+
+def test_table_error_within_documented_bound():
+    aepc = AEPcounter()
+    pc = power_curves()
+    error = aepc.power_curve_table_error(pc, RESOLUTION)
+    bound = max(slope_change(pc, variable_index) for variable_index in (2, 3, 4, 8, 9)) * RESOLUTION
+    assert 0.0 < error <= bound
+    # below 0.1 % of the rated power
+    assert error < 3.0
+
+
+def test_lookup_matches_interp():
+    aepc = AEPcounter()
+    aepc.lookup_table_resolution = RESOLUTION
+    pc = power_curves()
+    rng = np.random.default_rng(3)
+    wind_speeds = np.r_[rng.uniform(-1.0, 25.0, 5000), np.nan]
+    dirbins = rng.integers(0, 2, len(wind_speeds))
+    error = aepc.power_curve_table_error(pc, RESOLUTION)
+    for variable_index in (2, 3, 4, 8, 9):
+        approx = aepc.interpolate_power_curve(wind_speeds, dirbins, pc, variable_index)
+        exact = np.array([np.interp(speed, pc[:, dirbin, 0], pc[:, dirbin, variable_index])
+                          for speed, dirbin in zip(wind_speeds, dirbins)])
+        assert np.isnan(approx[-1]) and np.isnan(exact[-1])
+        assert np.max(np.abs(approx[:-1] - exact[:-1])) <= error + 1e-9
+
+
+def test_tables_hold_only_interpolated_variables():
+    aepc = AEPcounter()
+    tables = aepc.compile_power_curve_tables(power_curves(), RESOLUTION)
+    assert tables['tables'].shape[2] == len(tables['variables']) == 5
+
+
+@pytest.mark.parametrize('resolution', [0.0, -0.5])
+def test_resolution_has_to_be_positive(resolution):
+    aepc = AEPcounter()
+    with pytest.raises(ValueError):
+        aepc.power_curve_table_error(power_curves(), resolution)
+    with pytest.raises(ValueError):
+        aepc.compile_power_curve_tables(power_curves(), resolution)
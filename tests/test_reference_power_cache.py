@@ -0,0 +1,81 @@
+import datetime
+import pickle
+
+import numpy as np
+
+from t19_ice_loss.aep_counter import AEPcounter
+
+
+def power_curve(rated_speed=12.0):
+    # one direction bin of a 3 MW turbine
+    speeds = np.arange(0.5, 20.0, 1.0)
+    pc = np.full((len(speeds), 1, 10), np.nan)
+    power = 3000.0 * np.clip((speeds - 3.0) / (rated_speed - 3.0), 0.0, 1.0) ** 3
+    pc[:, 0, 0] = speeds
+    for variable_index, factor in ((2, 1.0), (3, 0.8), (4, 1.1), (8, 0.85), (9, 1.05)):
+        pc[:, 0, variable_index] = factor * power
+    return pc
+
+
+def data(rows=500):
+    # [timestamp, wind speed, wind direction, temperature, power, state]
+    rng = np.random.default_rng(26)
+    start = datetime.datetime(2003, 1, 1)
+    output = np.empty((rows, 6), dtype=object)
+    output[:, 0] = [start + datetime.timedelta(minutes=10 * row) for row in range(rows)]
+    output[:, 1] = rng.uniform(3.0, 15.0, rows)
+    output[:, 2] = rng.uniform(0.0, 360.0, rows)
+    output[:, 3] = rng.uniform(-10.0, 10.0, rows)
+    output[:, 4] = rng.uniform(0.0, 3000.0, rows)
+    output[:, 5] = 0
+    return output
+
+
+def uncached(aepc, data, pc):
+    aepc.reference_power_cache = {}
+    return aepc.theoretical_output_power(data, pc)
+
+
+def test_repeated_call_is_shared():
+    aepc = AEPcounter()
+    values, pc = data(), power_curve()
+    assert aepc.theoretical_output_power(values, pc) is aepc.theoretical_output_power(values, pc)
+
+
+def test_in_place_edit_invalidates():
+    aepc = AEPcounter()
+    values, pc = data(), power_curve()
+    first = aepc.theoretical_output_power(values, pc)
+    values[:, aepc.ws_index] = values[:, aepc.ws_index] * 0.8
+    second = aepc.theoretical_output_power(values, pc)
+    assert second is not first
+    assert np.array_equal(second[:, 1:].astype(float), uncached(AEPcounter(), values, pc)[:, 1:].astype(float))
+    assert not np.array_equal(second[:, 1].astype(float), first[:, 1].astype(float))
+
+
+def test_new_power_curve_invalidates():
+    aepc = AEPcounter()
+    values = data()
+    first = aepc.theoretical_output_power(values, power_curve())
+    second = aepc.theoretical_output_power(values, power_curve(rated_speed=10.0))
+    assert np.array_equal(second[:, 1:].astype(float), uncached(AEPcounter(), values, power_curve(rated_speed=10.0))[:, 1:].astype(float))
+    assert not np.array_equal(second[:, 1].astype(float), first[:, 1].astype(float))
+
+
+def test_changed_settings_invalidate():
+    aepc = AEPcounter()
+    values, pc = data(), power_curve()
+    assert len(aepc.theoretical_output_power(values, pc)) == len(values)
+    aepc.starttimestamp = values[100, 0]
+    assert len(aepc.theoretical_output_power(values, pc)) == len(values) - 100
+
+
+def test_cache_not_pickled():
+    # the counter is pickled into the plot process
+    aepc = AEPcounter()
+    values, pc = data(), power_curve()
+    reference = aepc.theoretical_output_power(values, pc)
+    copy = pickle.loads(pickle.dumps(aepc))
+    assert copy.reference_power_cache == {}
+    assert len(aepc.reference_power_cache) == 1
+    assert np.array_equal(copy.theoretical_output_power(values, pc)[:, 1:].astype(float), reference[:, 1:].astype(float))
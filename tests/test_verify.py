@@ -0,0 +1,24 @@
+import datetime
+import os
+
+from t19_ice_loss.run import analyse_file
+from t19_ice_loss.run_config import RunConfig
+from t19_ice_loss.synthetic import SyntheticScada
+from t19_ice_loss.verify import report, verify_result
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_verify_synthetic_autumn(tmp_path):
+    # the original implementations are slow, so an autumn with frequent icing is enough to cover every stage,
+    # the warm weeks give the reference data of the power curve
+    run_config = RunConfig.from_file(os.path.join(REPOSITORY, 'example.ini'))
+    run_config.filename = str(tmp_path / 'synthetic.csv')
+    run_config.result_dir = str(tmp_path) + os.sep
+    start = datetime.datetime(2003, 10, 1)
+    SyntheticScada(run_config, seed=3, icing_rate=60.0).write(run_config.filename, start, start + datetime.timedelta(days=75))
+    result = analyse_file(run_config)
+    assert len(result.alarm_timings) > 0
+    assert len(result.stop_timings) > 0
+    mismatches = verify_result(result)
+    assert mismatches == [], '\n'.join(report(mismatches))
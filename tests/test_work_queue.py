@@ -0,0 +1,52 @@
+import multiprocessing
+import os
+import time
+
+from t19_ice_loss.work_queue import FileQueue, Heartbeat
+
+JOBS = ['job{0:02d}'.format(number) for number in range(40)]
+
+
+def claim_all(directory, worker):
+    queue = FileQueue(directory, worker)
+    claimed = []
+    while True:
+        job = queue.claim()
+        if job is None:
+            return claimed
+        job_id, payload = job
+        assert payload == {'number': JOBS.index(job_id)}
+        claimed.append(job_id)
+        assert queue.complete(job_id, {'worker': worker})
+
+
+def test_each_job_is_claimed_once(tmp_path):
+    queue = FileQueue(str(tmp_path), 'main')
+    for number, job_id in enumerate(JOBS):
+        queue.put(job_id, {'number': number})
+    with multiprocessing.get_context('spawn').Pool(4) as pool:
+        claimed = pool.starmap(claim_all, [(str(tmp_path), 'worker{0}'.format(number)) for number in range(4)])
+    assert sorted(job_id for jobs in claimed for job_id in jobs) == JOBS
+    assert queue.counts() == (0, 0, len(JOBS))
+    workers = dict(queue.results())
+    assert all(workers[job_id] == {'worker': 'worker{0}'.format(number)} for number, jobs in enumerate(claimed) for job_id in jobs)
+
+
+def test_stale_claim_is_taken_over(tmp_path):
+    stopped = FileQueue(str(tmp_path), 'stopped')
+    running = FileQueue(str(tmp_path), 'running')
+    stopped.put('job', {})
+    assert stopped.claim() == ('job', {})
+    assert running.recover_stale(60) == []
+    # the heartbeat of the stopped worker ended two minutes ago
+    then = stopped.clock() - 120
+    os.utime(stopped._claim_path('job'), (then, then))
+    assert running.recover_stale(60) == ['job']
+    assert running.claim() == ('job', {})
+    assert not stopped.heartbeat('job')
+    with Heartbeat(stopped, 'job', 0.01) as heartbeat:
+        time.sleep(0.1)
+    assert heartbeat.lost.is_set()
+    assert not stopped.complete('job', {'worker': 'stopped'})
+    assert running.complete('job', {'worker': 'running'})
+    assert running.results() == [('job', {'worker': 'running'})]